@@ -0,0 +1,230 @@
+"""
+Build fingerprinted, precompressed static assets
+
+    python -m app.build_static
+
+Minifies the CSS and JavaScript under app/static, writes each file to
+app/static/dist with a content hash in its name, plus .gz and (when the
+optional `brotli` package is installed) .br variants, and records the
+mapping in dist/manifest.json for the `static_url` template helper.
+Run it as part of every deploy; templates fall back to the unbuilt files
+when there is no manifest.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from app.utils.static_assets import DIST_DIR, MANIFEST_NAME
+
+STATIC_DIR = Path(__file__).parent / "static"
+ASSET_DIRS = ("css", "js")
+HASH_LENGTH = 10
+
+# Strings are kept verbatim; comments are dropped; whitespace collapses and
+# disappears around punctuation that doesn't need it
+_CSS_TOKENS = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""  # 1: string
+    r"|/\*.*?\*/"                                 # comment
+    r"|\s*;\s*}\s*"                               # trailing semicolon in a block
+    r"|\s*([{};,>])\s*"                           # 2: punctuation
+    r"|(:)\s+"                                    # 3: colon (space before it can matter)
+    r"|\s+",                                      # whitespace
+    re.S
+)
+
+
+def _css_token(match: re.Match) -> str:
+    token = match.group(0)
+    if match.group(1):
+        return match.group(1)
+    if token.startswith("/*"):
+        return ""
+    if match.group(2) or match.group(3):
+        return match.group(2) or match.group(3)
+    if token.strip().startswith(";"):
+        return "}"
+    return " "
+
+
+def minify_css(source: str) -> str:
+    return _CSS_TOKENS.sub(_css_token, source).strip()
+
+
+# Keywords after which a "/" starts a regular expression rather than a division
+_JS_REGEX_KEYWORDS = {
+    "return", "typeof", "case", "do", "else", "in", "of", "new", "delete",
+    "void", "throw", "instanceof", "yield", "await",
+}
+
+
+def _js_breaks_in_literals(source: str) -> list:
+    """
+    For each line break of the source, whether it falls inside a string or
+    template literal, whose text must not be touched
+
+    A small scanner over strings, template literals (with nested ${}),
+    comments and regular expression literals, so quotes and backticks in
+    any of them don't throw it off.
+    """
+    breaks = []
+    mode = "code"
+    quote = ""
+    in_class = False
+    # Unclosed braces of each ${ ... } we are in
+    braces = []
+    regex_allowed = True
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if c == "\n":
+            # Strings and regular expressions can't span lines; a line comment ends
+            if mode in ("string", "regex", "line_comment"):
+                mode = "code"
+            breaks.append(mode == "template")
+            i += 1
+            continue
+
+        if mode in ("string", "template", "regex") and c == "\\":
+            if source.startswith("\n", i + 1):
+                breaks.append(mode in ("string", "template"))
+            i += 2
+            continue
+
+        if mode == "code":
+            if c in "'\"":
+                mode, quote = "string", c
+            elif c == "`":
+                mode = "template"
+            elif source.startswith("//", i):
+                mode = "line_comment"
+            elif source.startswith("/*", i):
+                mode = "block_comment"
+                i += 2
+                continue
+            elif c == "/" and regex_allowed:
+                mode, in_class = "regex", False
+            elif c.isalnum() or c in "_$":
+                end = i
+                while end < n and (source[end].isalnum() or source[end] in "_$"):
+                    end += 1
+                regex_allowed = source[i:end] in _JS_REGEX_KEYWORDS
+                i = end
+                continue
+            elif c == "}" and braces and braces[-1] == 0:
+                braces.pop()
+                mode = "template"
+            elif not c.isspace():
+                if braces and c == "{":
+                    braces[-1] += 1
+                elif braces and c == "}":
+                    braces[-1] -= 1
+                regex_allowed = c not in ")]"
+        elif mode == "string":
+            if c == quote:
+                mode, regex_allowed = "code", False
+        elif mode == "template":
+            if c == "`":
+                mode, regex_allowed = "code", False
+            elif source.startswith("${", i):
+                braces.append(0)
+                mode, regex_allowed = "code", True
+                i += 2
+                continue
+        elif mode == "block_comment":
+            if source.startswith("*/", i):
+                mode = "code"
+                i += 2
+                continue
+        elif mode == "regex":
+            if c == "[":
+                in_class = True
+            elif c == "]":
+                in_class = False
+            elif c == "/" and not in_class:
+                mode, regex_allowed = "code", False
+        i += 1
+    return breaks
+
+
+def minify_js(source: str) -> str:
+    """
+    Conservative JavaScript minification: indentation, blank lines and
+    whole-line // comments are removed, but line breaks are kept so
+    automatic semicolon insertion behaves exactly as before. Lines inside
+    multi-line template literals are kept as they are.
+    """
+    source = source.replace("\r\n", "\n")
+    breaks = _js_breaks_in_literals(source)
+    lines = []
+    for number, line in enumerate(source.split("\n")):
+        starts_inside = number > 0 and breaks[number - 1]
+        ends_inside = number < len(breaks) and breaks[number]
+        if starts_inside:
+            lines.append(line if ends_inside else line.rstrip())
+            continue
+        line = line.lstrip() if ends_inside else line.strip()
+        if line and not line.startswith("//"):
+            lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def _write_variants(path: Path, data: bytes) -> list:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    written = [path]
+
+    gz_path = path.with_name(path.name + ".gz")
+    gz_path.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(gz_path)
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    if brotli is not None:
+        br_path = path.with_name(path.name + ".br")
+        br_path.write_bytes(brotli.compress(data, quality=11))
+        written.append(br_path)
+    return written
+
+
+def build(static_dir: Path = STATIC_DIR) -> dict:
+    """
+    Build every asset and write the manifest
+
+    Returns:
+        The manifest: source path -> hashed path, both relative to static_dir and dist/
+    """
+    dist_dir = static_dir / DIST_DIR
+    shutil.rmtree(dist_dir, ignore_errors=True)
+
+    manifest = {}
+    for asset_dir in ASSET_DIRS:
+        for source in sorted((static_dir / asset_dir).rglob("*")):
+            minify = MINIFIERS.get(source.suffix)
+            if not source.is_file() or minify is None:
+                continue
+            original = source.read_text(encoding="utf-8")
+            data = minify(original).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+            relative = source.relative_to(static_dir).as_posix()
+            hashed = f"{relative[:-len(source.suffix)]}.{digest}{source.suffix}"
+            written = _write_variants(dist_dir / hashed, data)
+            manifest[relative] = hashed
+
+            sizes = ", ".join(f"{p.suffix.lstrip('.')} {p.stat().st_size}" for p in written[1:])
+            print(f"{relative} -> {DIST_DIR}/{hashed} ({len(original.encode())} -> {len(data)} bytes; {sizes})")
+
+    (dist_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+if __name__ == "__main__":
+    build()
@@ -7,6 +7,10 @@ class Settings:
     # MongoDB
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "event_management")
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+    # "background": create indexes after startup without blocking it,
+    # "blocking": create them before serving, "skip": rely on `python -m app.manage create-indexes`
+    INDEX_CREATION: str = os.getenv("INDEX_CREATION", "background")
     
     # JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
@@ -22,9 +26,78 @@ class Settings:
     # App
     APP_NAME: str = "Event Management System"
     APP_VERSION: str = "1.0.0"
-    DEBUG: bool = os.getenv("DEBUG", "True") == "True"
+    DEBUG: bool = os.getenv("DEBUG", "False") == "True"
+    
+    # Server (production launcher, see app/server.py)
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", 8000))
+    WORKERS: int = int(os.getenv("WORKERS", os.cpu_count() or 1))
+    KEEP_ALIVE_SECONDS: int = int(os.getenv("KEEP_ALIVE_SECONDS", 30))
+    BACKLOG: int = int(os.getenv("BACKLOG", 2048))
+    GRACEFUL_SHUTDOWN_SECONDS: int = int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", 30))
+    
+    # Metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True") == "True"
+    
+    # Readiness probe
+    READINESS_CACHE_SECONDS: float = float(os.getenv("READINESS_CACHE_SECONDS", 2))
+    READINESS_DB_TIMEOUT_SECONDS: float = float(os.getenv("READINESS_DB_TIMEOUT_SECONDS", 1))
+    READINESS_MAX_POOL_SATURATION: float = float(os.getenv("READINESS_MAX_POOL_SATURATION", 0.95))
+    READINESS_MAX_EMAIL_BACKLOG: int = int(os.getenv("READINESS_MAX_EMAIL_BACKLOG", 1000))
+    
+    # Seat holds
+    SEAT_HOLD_MINUTES: int = int(os.getenv("SEAT_HOLD_MINUTES", 10))
+    SEAT_HOLD_SWEEP_SECONDS: int = int(os.getenv("SEAT_HOLD_SWEEP_SECONDS", 15))
+    # Released and expired holds are kept this long before the TTL index removes them
+    SEAT_HOLD_RETENTION_MINUTES: int = int(os.getenv("SEAT_HOLD_RETENTION_MINUTES", 60))
+    
+    # Idempotency keys
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 60 * 60 * 24))
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: int = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", 60))
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000))
+    
+    # Party registrations: seats one registration can book (one ticket each)
+    MAX_PARTY_SIZE: int = int(os.getenv("MAX_PARTY_SIZE", 10))
+    
+    # Registration group commit (opt-in): concurrent registrations are written in batches
+    REGISTRATION_BATCHING: bool = os.getenv("REGISTRATION_BATCHING", "False") == "True"
+    REGISTRATION_BATCH_MAX_SIZE: int = int(os.getenv("REGISTRATION_BATCH_MAX_SIZE", 100))
+    REGISTRATION_BATCH_MAX_DELAY_MS: float = float(os.getenv("REGISTRATION_BATCH_MAX_DELAY_MS", 5))
+    
+    # Ticket export
+    TICKET_EXPORT_WORKERS: int = int(os.getenv("TICKET_EXPORT_WORKERS", os.cpu_count() or 1))
+    TICKET_EXPORT_BATCH_SIZE: int = int(os.getenv("TICKET_EXPORT_BATCH_SIZE", 500))
+    
+    # Response compression (brotli is used when the optional package is installed)
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "True") == "True"
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+    COMPRESSION_BROTLI: bool = os.getenv("COMPRESSION_BROTLI", "True") == "True"
+    
+    # Single-flight reads (concurrent identical reads share one query)
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "True") == "True"
+    SINGLE_FLIGHT_STATS_KEYS: int = int(os.getenv("SINGLE_FLIGHT_STATS_KEYS", 1000))
+    
+    # Slow query log: queries taking at least this long are logged with their plan (0 disables)
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", 100))
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: int = int(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", 300))
+    
+    # Request profiling (admins opt in per request with X-Profile: 1 or ?_profile=1)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "True") == "True"
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", 1.0))
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", 1))
+    PROFILING_MAX_STORED: int = int(os.getenv("PROFILING_MAX_STORED", 100))
+    
+    # Archive: events are moved to cold collections this long after they start
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", 30))
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", 100))
+    
+    # Analytics (event sets whose finished buckets are cached per worker)
+    ANALYTICS_CACHE_SIZE: int = int(os.getenv("ANALYTICS_CACHE_SIZE", 1000))
     
     # File paths
     QR_CODE_DIR: str = os.path.join(os.path.dirname(__file__), "static", "qrcodes")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles"))
 
 settings = Settings()
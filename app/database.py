@@ -1,45 +1,134 @@
+import asyncio
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from app.config import settings
+from app.utils.metrics import mongo_listener, pool_listener
+from app.utils.profiling import profile_listener
+from app.utils.query_plans import SlowQueryListener
 
 # Global database instance
 client: AsyncIOMotorClient | None = None
 db: AsyncIOMotorDatabase | None = None
 
+# Index creation running after startup, see settings.INDEX_CREATION
+_index_task: asyncio.Task | None = None
+
+# Logs queries slower than settings.SLOW_QUERY_MS, with their plans
+slow_query_listener = SlowQueryListener(
+    settings.SLOW_QUERY_MS, explain_interval=settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+)
+
 
 async def connect_to_mongo():
     """Connect to MongoDB"""
-    global client, db
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    global client, db, _index_task
+    # The pool listener also feeds the readiness probe, so it is always installed
+    event_listeners = [pool_listener]
+    if settings.METRICS_ENABLED:
+        event_listeners.append(mongo_listener)
+    if settings.PROFILING_ENABLED:
+        event_listeners.append(profile_listener)
+    if settings.SLOW_QUERY_MS > 0:
+        event_listeners.append(slow_query_listener)
+    client = AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        event_listeners=event_listeners
+    )
+    slow_query_listener.client = client.delegate
     db = client[settings.DATABASE_NAME]
 
     # Create indexes
-    await create_indexes()
+    if settings.INDEX_CREATION == "blocking":
+        await create_indexes()
+    elif settings.INDEX_CREATION == "background":
+        _index_task = asyncio.create_task(_create_indexes_in_background())
     print("Connected to MongoDB")
 
 
+async def _create_indexes_in_background():
+    """Create indexes without holding up startup; failures are logged, not raised"""
+    try:
+        await create_indexes()
+        logging.info("Database indexes are up to date")
+    except Exception as e:
+        logging.error(f"Background index creation failed: {e}")
+
+
 async def close_mongo_connection():
     """Close MongoDB connection"""
     global client
+    if _index_task and not _index_task.done():
+        _index_task.cancel()
     if client:
         client.close()
         print("Closed MongoDB connection")
 
 
-async def create_indexes():
-    """Create necessary database indexes"""
+async def create_indexes(target: AsyncIOMotorDatabase | None = None):
+    """Create necessary database indexes on the app database, or on target. Safe to run repeatedly."""
+    target = db if target is None else target
     # Users collection
-    await db["users"].create_index("email", unique=True)
+    await target["users"].create_index("email", unique=True)
+    # Admin directory prefix search, paged by _id within equal values
+    await target["users"].create_index([("name_lower", 1), ("_id", 1)])
+    await target["users"].create_index([("email_lower", 1), ("_id", 1)])
+    # Admin count; regular users are left out of the index
+    await target["users"].create_index("is_admin", partialFilterExpression={"is_admin": True})
 
     # Events collection
-    await db["events"].create_index("created_by")
+    await target["events"].create_index("created_by")
+    await target["events"].create_index([("starts_at", -1)])
 
     # Registrations collection
-    await db["registrations"].create_index("user_id")
-    await db["registrations"].create_index("event_id")
-    await db["registrations"].create_index(
+    await target["registrations"].create_index("user_id")
+    await target["registrations"].create_index("event_id")
+    await target["registrations"].create_index("ticket_number")
+    # Every ticket of a party registration; only parties have the field
+    await target["registrations"].create_index("ticket_numbers", sparse=True)
+    await target["registrations"].create_index([("event_id", 1), ("registration_date", 1)])
+    # Ticket export walks an event's registrations in _id order
+    await target["registrations"].create_index([("event_id", 1), ("_id", 1)])
+    await target["registrations"].create_index(
         [("user_id", 1), ("event_id", 1)], unique=True
     )
 
+    # Waitlist collection (FIFO per event)
+    await target["waitlist"].create_index(
+        [("event_id", 1), ("position", 1)], unique=True
+    )
+    await target["waitlist"].create_index(
+        [("event_id", 1), ("user_id", 1)], unique=True
+    )
+
+    # Seat holds collection: one active hold per user and event, swept by
+    # expires_at and purged by the TTL index once purge_at has passed
+    await target["seat_holds"].create_index(
+        [("user_id", 1), ("event_id", 1)],
+        unique=True,
+        partialFilterExpression={"released": False}
+    )
+    await target["seat_holds"].create_index([("released", 1), ("expires_at", 1)])
+    await target["seat_holds"].create_index("purge_at", expireAfterSeconds=0)
+
+    # Archived events and registrations (see app/utils/archive.py): the
+    # read endpoints' archived=true queries, and batches an interrupted run left
+    await target["events_archive"].create_index([("starts_at", -1)])
+    await target["events_archive"].create_index("created_by")
+    await target["events_archive"].create_index(
+        "registrations_moved", partialFilterExpression={"registrations_moved": False}
+    )
+    await target["registrations_archive"].create_index("user_id")
+    await target["registrations_archive"].create_index([("event_id", 1), ("_id", 1)])
+    # QR code garbage collection keeps the images of archived tickets
+    await target["registrations_archive"].create_index("ticket_number")
+    await target["registrations_archive"].create_index("ticket_numbers", sparse=True)
+
+    # Idempotency keys collection
+    await target["idempotency_keys"].create_index(
+        "created_at", expireAfterSeconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS
+    )
+
 
 def get_database() -> AsyncIOMotorDatabase:
     """Get database instance"""
@@ -1,28 +1,54 @@
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, JSONResponse
 from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
 import os
 
+from app.config import settings
 from app.database import connect_to_mongo, close_mongo_connection
 from app.routers import auth_routes, event_routes, registration_routes, admin_routes, admin_creation_routes
 from app.utils.auth import decode_token
+from app.utils import metrics
+from app.utils.health import readiness_probe
+from app.utils.background import drain as drain_background_tasks
+from app.utils.seats import run_hold_sweeper
+from app.utils.ticket_export import shutdown_export_pool
+from app.utils.static_assets import PrecompressedStaticFiles, make_static_url
+from app.utils.compression import CompressionMiddleware
+from app.utils.bootstrap import user_bootstrap
+from app.utils.profiling import ProfiledJSONResponse, ProfilingMiddleware
+from app.utils.single_flight import single_flight
 
 # Get the base directory
 BASE_DIR = Path(__file__).parent.parent
 
-# Setup templates
+STATIC_DIR = str(Path(__file__).parent / "static")
+
+# Setup templates; static_url() points at the fingerprinted build when there is one
 templates = Jinja2Templates(directory=str(Path(__file__).parent / "templates"))
+templates.env.globals["static_url"] = make_static_url(STATIC_DIR, use_build=not settings.DEBUG)
+# base.html embeds the signed-in user so page scripts don't need /auth/me
+templates.env.globals["user_bootstrap"] = user_bootstrap
+
+def preload_templates():
+    """Compile every template up front so the first page views don't pay for it"""
+    for name in templates.env.list_templates():
+        templates.env.get_template(name)
 
 # Lifespan context manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    preload_templates()
     await connect_to_mongo()
+    hold_sweeper = asyncio.create_task(run_hold_sweeper())
     yield
-    # Shutdown
+    # Shutdown: let queued emails and QR codes finish before the DB goes away
+    hold_sweeper.cancel()
+    await drain_background_tasks(timeout=settings.GRACEFUL_SHUTDOWN_SECONDS)
+    shutdown_export_pool()
     await close_mongo_connection()
 
 # Create FastAPI app
@@ -30,13 +56,38 @@ app = FastAPI(
     title="Event Management System",
     description="A complete event management system with FastAPI and MongoDB",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ProfiledJSONResponse
 )
 
-# Mount static files
+# gzip/brotli for text responses; added first so metrics include compression time
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        use_brotli=settings.COMPRESSION_BROTLI
+    )
+
+# Per-route latency and database metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# On-demand profiling for admins; outermost so it sees the whole request
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        profile_dir=settings.PROFILE_DIR,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        interval=settings.PROFILING_INTERVAL_MS / 1000,
+        max_stored=settings.PROFILING_MAX_STORED
+    )
+
+# Mount static files (built assets are served precompressed and cached forever)
 app.mount(
     "/static",
-    StaticFiles(directory=str(Path(__file__).parent / "static")),
+    PrecompressedStaticFiles(directory=STATIC_DIR),
     name="static"
 )
 
@@ -50,7 +101,9 @@ async def get_user_from_request(request: Request):
             from app.database import get_database
             from bson.objectid import ObjectId
             db = get_database()
-            user = await db["users"].find_one({"_id": ObjectId(payload.get("sub"))})
+            user_oid = ObjectId(payload.get("sub"))
+            # Concurrent page loads by the same user share one query
+            user = await single_flight("user").do(user_oid, lambda: db["users"].find_one({"_id": user_oid}))
             if user:
                 return {
                     "id": str(user["_id"]),
@@ -97,7 +150,8 @@ async def event_detail_page(event_id: str, request: Request):
     return templates.TemplateResponse("event_detail.html", {
         "request": request,
         "user": user,
-        "event_id": event_id
+        "event_id": event_id,
+        "max_party_size": settings.MAX_PARTY_SIZE
     })
 
 @app.get("/dashboard", response_class=HTMLResponse)
@@ -120,12 +174,26 @@ async def create_admin_page(request: Request):
     """Admin creation page - protected with master password"""
     return templates.TemplateResponse("create_admin.html", {"request": request})
 
-# Health check endpoint
+# Health check endpoints
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness probe: the worker is up and serving requests"""
     return {"status": "healthy"}
 
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: MongoDB, QR storage, connection pool and email backlog"""
+    result = await readiness_probe.check()
+    status_code = 200 if result["status"] == "ready" else 503
+    return JSONResponse(content=result, status_code=status_code)
+
+# Prometheus metrics endpoint
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 # Include API routers (AFTER frontend routes so they don't override)
 app.include_router(auth_routes.router)
 app.include_router(event_routes.router)
@@ -140,10 +208,11 @@ async def api_docs(request: Request):
     return RedirectResponse(url="/docs")
 
 if __name__ == "__main__":
+    # Development server; use `python -m app.server` in production
     import uvicorn
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True
+        host=settings.HOST,
+        port=settings.PORT,
+        reload=settings.DEBUG
     )
@@ -0,0 +1,237 @@
+"""
+Maintenance commands
+
+    python -m app.manage create-indexes
+    python -m app.manage gc-qr-codes [--apply] [--batch-size N] [--min-age-minutes N]
+    python -m app.manage purge-orphans [--apply] [--batch-size N]
+    python -m app.manage migrate-event-dates [--timezone TZ] [--batch-size N]
+    python -m app.manage reconcile-organizer-stats
+    python -m app.manage backfill-user-search
+    python -m app.manage check-query-plans [--seed N]
+    python -m app.manage archive-events [--apply] [--older-than-days N] [--batch-size N]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from app.config import settings
+from app import database
+from app.utils.qr_gc import collect_qr_garbage
+from app.utils.cleanup import purge_orphans as purge_orphaned_documents
+from app.utils.qrcode_gen import delete_qr_codes
+from app.utils.schedule import parse_starts_at
+from app.utils.organizer_stats import reconcile_all
+from app.utils.user_directory import backfill_search_fields
+from app.utils.archive import archive_events as move_events_to_archive
+from app.utils.query_plans import (
+    QUERY_PATTERNS, check_query_plans as explain_query_patterns, describe_plan, seed_plan_dataset, unused_indexes
+)
+
+
+async def create_indexes(args):
+    """Create or update all database indexes (idempotent)"""
+    await database.create_indexes()
+    print("Indexes created")
+
+
+async def gc_qr_codes(args):
+    """Delete QR code images of removed registrations or events (dry run unless --apply)"""
+    report = await collect_qr_garbage(
+        database.get_database(),
+        dry_run=not args.apply,
+        batch_size=args.batch_size,
+        min_age_seconds=args.min_age_minutes * 60
+    )
+    action = "Would delete" if report["dry_run"] else "Deleted"
+    print(f"Scanned {report['scanned']} QR code image(s) in {settings.QR_CODE_DIR}")
+    print(f"{action} {report['orphaned']} orphaned image(s), {report['orphaned_bytes'] / 1024:.1f} KiB")
+    for path in report["sample"]:
+        print(f"  {path}")
+    if report["orphaned"] > len(report["sample"]):
+        print(f"  ... and {report['orphaned'] - len(report['sample'])} more")
+    action = "Would move" if report["dry_run"] else "Moved"
+    print(f"{action} {report['relocated']} image(s) into the sharded layout")
+    if report["dry_run"]:
+        print("Dry run: nothing was changed. Re-run with --apply to delete and move files.")
+
+
+async def purge_orphans(args):
+    """Delete registrations, waitlist entries and holds of deleted events (dry run unless --apply)"""
+    report = await purge_orphaned_documents(
+        database.get_database(),
+        dry_run=not args.apply,
+        batch_size=args.batch_size
+    )
+    action = "Would delete" if report["dry_run"] else "Deleted"
+    print(f"Found {len(report['missing_events'])} deleted event(s) still referenced")
+    for collection, count in report["orphans"].items():
+        print(f"{action} {count} orphaned document(s) from {collection}")
+    if report["dry_run"]:
+        print("Dry run: nothing was changed. Re-run with --apply to delete them.")
+    else:
+        delete_qr_codes(report["ticket_numbers"])
+        print(f"Removed QR codes for {len(report['ticket_numbers'])} ticket(s)")
+
+
+async def migrate_event_dates(args):
+    """Set starts_at and timezone on events that only have date and time strings"""
+    db = database.get_database()
+    cursor = db["events"].find(
+        {"starts_at": None},
+        {"date": 1, "time": 1, "timezone": 1}
+    ).batch_size(args.batch_size)
+
+    updates = []
+    migrated = 0
+    unparseable = []
+    async for event in cursor:
+        tz_name = event.get("timezone") or args.timezone
+        try:
+            starts_at = parse_starts_at(event.get("date"), event.get("time"), tz_name)
+        except ValueError as e:
+            unparseable.append((event["_id"], str(e)))
+            continue
+        updates.append(UpdateOne(
+            {"_id": event["_id"]},
+            {"$set": {"starts_at": starts_at, "timezone": tz_name}}
+        ))
+        if len(updates) >= args.batch_size:
+            migrated += (await db["events"].bulk_write(updates, ordered=False)).modified_count
+            updates = []
+    if updates:
+        migrated += (await db["events"].bulk_write(updates, ordered=False)).modified_count
+
+    print(f"Migrated {migrated} event(s)")
+    if unparseable:
+        print(f"Could not parse {len(unparseable)} event(s); fix their date/time and re-run:")
+        for event_id, reason in unparseable:
+            print(f"  {event_id}: {reason}")
+
+
+async def reconcile_organizer_stats(args):
+    """Rebuild every organizer's dashboard summary from events and registrations"""
+    rebuilt = await reconcile_all(database.get_database())
+    print(f"Rebuilt {rebuilt} organizer summary(ies)")
+
+
+async def backfill_user_search(args):
+    """Add the lowercased name and email used by the admin user search to existing users"""
+    updated = await backfill_search_fields(database.get_database())
+    print(f"Updated {updated} user(s)")
+
+
+async def check_query_plans(args):
+    """Explain every registered query pattern; exit with status 1 if one scans a whole collection"""
+    db = database.get_database()
+    scratch = None
+    if args.seed:
+        # A throwaway database with the app's indexes and synthetic data
+        scratch = f"{settings.DATABASE_NAME}_plan_check"
+        await database.client.drop_database(scratch)
+        db = database.client[scratch]
+        await database.create_indexes(db)
+        await seed_plan_dataset(db, args.seed)
+    try:
+        results = await explain_query_patterns(db)
+        unused = [] if scratch else await unused_indexes(db, sorted({p["collection"] for p in QUERY_PATTERNS}))
+    finally:
+        if scratch:
+            await database.client.drop_database(scratch)
+
+    for result in results:
+        if result["failed"]:
+            label = "FAIL"
+        elif result["problem"]:
+            label = "WARN"
+        else:
+            label = "ok"
+        print(f"{label:<5} {result['name']:<32} {describe_plan(result['plan'])}")
+
+    suggestions = [r for r in results if r["suggested_index"]]
+    if suggestions or unused:
+        print("\nIndex advisor:")
+    for result in suggestions:
+        keys = ", ".join(f"{field}: {direction}" for field, direction in result["suggested_index"])
+        print(f"  {result['name']} ({result['problem']}): add {result['collection']} {{{keys}}}")
+    for index in unused:
+        print(f"  {index['collection']}.{index['name']}: unused since {index['since']:%Y-%m-%d %H:%M}; consider dropping it")
+
+    failed = [r["name"] for r in results if r["failed"]]
+    if failed:
+        print(f"\n{len(failed)} query pattern(s) scan a whole collection: {', '.join(failed)}")
+        raise SystemExit(1)
+    print(f"\nAll {len(results)} query patterns use an index")
+
+
+async def archive_events(args):
+    """Move past events and their registrations to the archive collections (dry run unless --apply)"""
+    before = datetime.utcnow() - timedelta(days=args.older_than_days)
+    report = await move_events_to_archive(
+        database.get_database(),
+        before,
+        dry_run=not args.apply,
+        batch_size=args.batch_size
+    )
+    action = "Would move" if report["dry_run"] else "Moved"
+    print(f"{action} {report['events']} event(s) that started before {before:%Y-%m-%d %H:%M} UTC "
+          f"and {report['registrations']} registration(s) to the archive")
+    action = "Would delete" if report["dry_run"] else "Deleted"
+    print(f"{action} {report['waitlist']} waitlist entry(ies) and {report['seat_holds']} seat hold(s)")
+    if report["dry_run"]:
+        print("Dry run: nothing was changed. Re-run with --apply to move them.")
+
+
+COMMANDS = {
+    "create-indexes": create_indexes,
+    "gc-qr-codes": gc_qr_codes,
+    "purge-orphans": purge_orphans,
+    "migrate-event-dates": migrate_event_dates,
+    "reconcile-organizer-stats": reconcile_organizer_stats,
+    "backfill-user-search": backfill_user_search,
+    "check-query-plans": check_query_plans,
+    "archive-events": archive_events,
+}
+
+
+async def _run(args):
+    # Commands manage their own schema work; don't also start it in the background
+    settings.INDEX_CREATION = "skip"
+    await database.connect_to_mongo()
+    try:
+        await COMMANDS[args.command](args)
+    finally:
+        await database.close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event Management maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("create-indexes", help=create_indexes.__doc__)
+    gc_parser = subparsers.add_parser("gc-qr-codes", help=gc_qr_codes.__doc__)
+    gc_parser.add_argument("--apply", action="store_true", help="Delete and move files instead of only reporting")
+    gc_parser.add_argument("--batch-size", type=int, default=1000, help="Files checked against MongoDB per query")
+    gc_parser.add_argument("--min-age-minutes", type=int, default=60, help="Skip images newer than this")
+    purge_parser = subparsers.add_parser("purge-orphans", help=purge_orphans.__doc__)
+    purge_parser.add_argument("--apply", action="store_true", help="Delete instead of only reporting")
+    purge_parser.add_argument("--batch-size", type=int, default=1000, help="Event IDs checked per query")
+    dates_parser = subparsers.add_parser("migrate-event-dates", help=migrate_event_dates.__doc__)
+    dates_parser.add_argument("--timezone", default="UTC", help="IANA timezone of events that don't have one")
+    dates_parser.add_argument("--batch-size", type=int, default=500, help="Events updated per bulk write")
+    subparsers.add_parser("reconcile-organizer-stats", help=reconcile_organizer_stats.__doc__)
+    subparsers.add_parser("backfill-user-search", help=backfill_user_search.__doc__)
+    plans_parser = subparsers.add_parser("check-query-plans", help=check_query_plans.__doc__)
+    plans_parser.add_argument("--seed", type=int, default=0,
+                              help="Check a scratch database seeded with N users and registrations "
+                                   "instead of the configured one")
+    archive_parser = subparsers.add_parser("archive-events", help=archive_events.__doc__)
+    archive_parser.add_argument("--apply", action="store_true", help="Move instead of only reporting")
+    archive_parser.add_argument("--older-than-days", type=float, default=settings.ARCHIVE_AFTER_DAYS,
+                                help="Archive events that started more than this many days ago")
+    archive_parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE,
+                                help="Events moved per batch")
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
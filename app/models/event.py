@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from bson import ObjectId
 
 class Event:
@@ -17,6 +17,9 @@ class Event:
         total_seats: int,
         created_by: ObjectId,
         available_seats: Optional[int] = None,
+        starts_at: Optional[datetime] = None,
+        timezone: str = "UTC",
+        tiers: Optional[List[dict]] = None,
         _id: Optional[ObjectId] = None,
         created_at: Optional[datetime] = None
     ):
@@ -25,9 +28,13 @@ class Event:
         self.description = description
         self.date = date
         self.time = time
+        self.starts_at = starts_at  # UTC instant of date + time in the event's timezone
+        self.timezone = timezone
         self.venue = venue
         self.total_seats = total_seats
         self.available_seats = available_seats if available_seats is not None else total_seats
+        # [{"name", "total_seats", "available_seats"}]; the event's seat counts are their sums
+        self.tiers = tiers
         self.created_by = created_by
         self.created_at = created_at or datetime.utcnow()
     
@@ -38,9 +45,12 @@ class Event:
             "description": self.description,
             "date": self.date,
             "time": self.time,
+            "starts_at": self.starts_at,
+            "timezone": self.timezone,
             "venue": self.venue,
             "total_seats": self.total_seats,
             "available_seats": self.available_seats,
+            "tiers": self.tiers,
             "created_by": self.created_by,
             "created_at": self.created_at
         }
@@ -53,9 +63,12 @@ class Event:
             description=data.get("description"),
             date=data.get("date"),
             time=data.get("time"),
+            starts_at=data.get("starts_at"),
+            timezone=data.get("timezone", "UTC"),
             venue=data.get("venue"),
             total_seats=data.get("total_seats"),
             available_seats=data.get("available_seats"),
+            tiers=data.get("tiers"),
             created_by=data.get("created_by"),
             created_at=data.get("created_at")
         )
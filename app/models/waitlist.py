@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+
+class WaitlistEntry:
+    """Waitlist entry model for MongoDB"""
+    
+    collection_name = "waitlist"
+    
+    def __init__(
+        self,
+        user_id: ObjectId,
+        event_id: ObjectId,
+        user_email: str,
+        user_name: str,
+        position: int,
+        _id: Optional[ObjectId] = None,
+        joined_at: Optional[datetime] = None
+    ):
+        self._id = _id or ObjectId()
+        self.user_id = user_id
+        self.event_id = event_id
+        self.user_email = user_email
+        self.user_name = user_name
+        self.position = position
+        self.joined_at = joined_at or datetime.utcnow()
+    
+    def to_dict(self):
+        return {
+            "_id": self._id,
+            "user_id": self.user_id,
+            "event_id": self.event_id,
+            "user_email": self.user_email,
+            "user_name": self.user_name,
+            "position": self.position,
+            "joined_at": self.joined_at
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            _id=data.get("_id"),
+            user_id=data.get("user_id"),
+            event_id=data.get("event_id"),
+            user_email=data.get("user_email"),
+            user_name=data.get("user_name"),
+            position=data.get("position"),
+            joined_at=data.get("joined_at")
+        )
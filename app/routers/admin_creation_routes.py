@@ -4,6 +4,7 @@ from bson.objectid import ObjectId
 import os
 from app.database import get_database
 from app.utils.auth import hash_password
+from app.utils.user_directory import search_fields
 
 router = APIRouter(tags=["admin-creation"])
 
@@ -69,7 +70,8 @@ async def create_admin(request: AdminCreationRequest):
         "phone": request.phone or "",
         "password_hash": hash_password(request.password),
         "is_admin": True,
-        "created_at": None  # Motor will set this
+        "created_at": None,  # Motor will set this
+        **search_fields(request.name, request.email)
     }
     
     # Insert user
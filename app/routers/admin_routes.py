@@ -1,10 +1,27 @@
 from fastapi import APIRouter, HTTPException, status, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import os
 from bson.objectid import ObjectId
+from datetime import datetime
+from typing import Optional
+from zoneinfo import ZoneInfo
+from app.config import settings
 from app.database import get_database
 from app.utils.auth import decode_token
+from app.utils.organizer_stats import get_organizer_stats
+from app.utils.analytics import UNITS, registration_timeseries
+from app.utils.schedule import as_utc, to_naive_utc
+from app.utils.user_directory import SEARCH_FIELDS, list_users
+from app.utils.ticket_export import stream_tickets_pdf, stream_tickets_zip
+from app.utils.profiling import list_profiles, profile_path
+from app.utils.single_flight import all_stats as single_flight_stats, single_flight
+from app.utils.archive import collection_for
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+MAX_USERS_PAGE_SIZE = 200
+
 async def get_current_user_from_request(request: Request):
     """Extract user from request cookies"""
     token = request.cookies.get("access_token")
@@ -39,40 +56,42 @@ async def get_dashboard_data(request: Request):
             detail="Only admins can access this"
         )
     
-    # Get admin's events
+    # One pre-aggregated document, kept up to date by event and registration writes;
+    # concurrent dashboard loads (and a missing summary's rebuild) share one read
     admin_id = ObjectId(current_user["user_id"])
-    events = await db["events"].find({"created_by": admin_id}).to_list(None)
-    
-    # Calculate stats
-    total_events = len(events)
-    total_seats_available = sum(e.get("available_seats", 0) for e in events)
-    total_seats_booked = sum(e.get("total_seats", 0) - e.get("available_seats", 0) for e in events)
-    
-    # Get registrations for admin's events
-    event_ids = [e["_id"] for e in events]
-    registrations = await db["registrations"].find({"event_id": {"$in": event_ids}}).to_list(None)
-    total_registrations = len(registrations)
+    stats = await single_flight("dashboard").do(admin_id, lambda: get_organizer_stats(db, admin_id))
     
     return {
-        "total_events": total_events,
-        "total_registrations": total_registrations,
-        "total_seats_available": total_seats_available,
-        "total_seats_booked": total_seats_booked,
+        "total_events": stats["event_count"],
+        "total_registrations": stats["registrations"],
+        "total_seats_available": stats["total_seats"] - stats["seats_booked"],
+        "total_seats_booked": stats["seats_booked"],
         "events": [
             {
-                "id": str(e["_id"]),
+                "id": event_id,
                 "title": e["title"],
                 "date": e["date"],
-                "available_seats": e["available_seats"],
+                "available_seats": e["total_seats"] - e["seats_booked"],
                 "total_seats": e["total_seats"]
             }
-            for e in events
+            for event_id, e in stats["events"].items()
         ]
     }
 
 @router.get("/users")
-async def get_all_users(request: Request):
-    """Get all users (admin only)"""
+async def get_all_users(
+    request: Request,
+    q: Optional[str] = None,
+    field: str = "name",
+    after: Optional[str] = None,
+    limit: int = 50
+):
+    """
+    Page through users (admin only)
+
+    Pass the returned next_cursor as `after` to get the next page. With `q`,
+    only users whose name (or email, with field=email) starts with it are returned.
+    """
     db = get_database()
     current_user = await get_current_user_from_request(request)
     
@@ -82,18 +101,48 @@ async def get_all_users(request: Request):
             detail="Only admins can access this"
         )
     
-    users = await db["users"].find().to_list(None)
+    if field not in SEARCH_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="field must be 'name' or 'email'"
+        )
+    limit = max(1, min(limit, MAX_USERS_PAGE_SIZE))
+    
+    try:
+        users, next_cursor = await list_users(db, q, field, after, limit)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return {
+        "users": [
+            {
+                "id": str(u["_id"]),
+                "name": u["name"],
+                "email": u["email"],
+                "is_admin": u.get("is_admin", False),
+                "created_at": u.get("created_at")
+            }
+            for u in users
+        ],
+        "next_cursor": next_cursor
+    }
+
+@router.get("/users/count")
+async def get_user_count(request: Request):
+    """Approximate number of users from collection metadata (admin only)"""
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    
+    if not current_user["is_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can access this"
+        )
     
-    return [
-        {
-            "id": str(u["_id"]),
-            "name": u["name"],
-            "email": u["email"],
-            "is_admin": u.get("is_admin", False),
-            "created_at": u["created_at"]
-        }
-        for u in users
-    ]
+    return {"count": await db["users"].estimated_document_count(), "estimated": True}
 
 @router.get("/events/{event_id}/stats")
 async def get_event_statistics(event_id: str, request: Request):
@@ -123,14 +172,20 @@ async def get_event_statistics(event_id: str, request: Request):
         )
     
     registrations = await db["registrations"].find({"event_id": event_oid}).to_list(None)
-    
+
+    # One users lookup for every attendee
+    user_ids = list({reg["user_id"] for reg in registrations})
+    users = await db["users"].find({"_id": {"$in": user_ids}}, {"name": 1, "email": 1}).to_list(None)
+    users_by_id = {u["_id"]: u for u in users}
+
     attendees = []
     for reg in registrations:
-        user = await db["users"].find_one({"_id": reg["user_id"]})
+        user = users_by_id.get(reg["user_id"])
         attendees.append({
             "name": user.get("name") if user else "Unknown",
             "email": user.get("email") if user else "Unknown",
             "ticket_number": reg["ticket_number"],
+            "party_size": reg.get("party_size", 1),
             "registration_date": reg["registration_date"]
         })
     
@@ -146,10 +201,131 @@ async def get_event_statistics(event_id: str, request: Request):
         "attendees": attendees
     }
 
+@router.get("/events/{event_id}/tickets")
+async def export_event_tickets(event_id: str, request: Request, format: str = "zip"):
+    """
+    Download every ticket for an event (admin only)
+
+    The file is streamed batch by batch while QR codes are rendered in
+    worker processes, so large events never sit in memory at once.
+    """
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    
+    if not current_user["is_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can export tickets"
+        )
+    
+    if format not in ("zip", "pdf"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format must be 'zip' or 'pdf'"
+        )
+    
+    try:
+        event_oid = ObjectId(event_id)
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid event ID"
+        )
+    
+    event = await db["events"].find_one({"_id": event_oid}, {"title": 1})
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found"
+        )
+    
+    if format == "pdf":
+        body = stream_tickets_pdf(db, event_oid, event["title"])
+        media_type = "application/pdf"
+    else:
+        body = stream_tickets_zip(db, event_oid)
+        media_type = "application/zip"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tickets_{event_id}.{format}"'}
+    )
+
+@router.get("/analytics/registrations")
+async def get_registration_analytics(
+    request: Request,
+    event_id: Optional[str] = None,
+    organizer_id: Optional[str] = None,
+    unit: str = "hour",
+    timezone: str = "UTC",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """
+    Registrations over time for one event or all of an organizer's events (admin only)
+
+    Defaults to the current admin's events. Buckets are per minute, hour or
+    day, with day boundaries in the given timezone. Only registrations made
+    from start and before end are counted.
+    """
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    
+    if not current_user["is_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view analytics"
+        )
+    
+    if unit not in UNITS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"unit must be one of: {', '.join(UNITS)}"
+        )
+    try:
+        ZoneInfo(timezone)
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown timezone"
+        )
+    
+    try:
+        if event_id:
+            event_ids = [ObjectId(event_id)]
+            scope = {"event_id": event_id}
+        else:
+            organizer_oid = ObjectId(organizer_id or current_user["user_id"])
+            events = await db["events"].find({"created_by": organizer_oid}, {"_id": 1}).to_list(None)
+            event_ids = [e["_id"] for e in events]
+            scope = {"organizer_id": str(organizer_oid)}
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    buckets = await registration_timeseries(
+        db, event_ids, unit, timezone,
+        start=to_naive_utc(start) if start is not None else None,
+        end=to_naive_utc(end) if end is not None else None
+    ) if event_ids else []
+    
+    return {
+        **scope,
+        "unit": unit,
+        "timezone": timezone,
+        "total": sum(b["count"] for b in buckets),
+        "buckets": [{"start": as_utc(b["start"]), "count": b["count"]} for b in buckets]
+    }
+
 @router.get("/registrations", response_model=list)
-async def get_all_registrations(request: Request):
-    """Get all registrations (admin only)"""
+async def get_all_registrations(request: Request, archived: bool = False):
+    """Get all registrations, or all archived ones with archived=true (admin only)"""
     db = get_database()
+    events_collection = collection_for(db, "events", archived)
+    registrations_collection = collection_for(db, "registrations", archived)
     current_user = await get_current_user_from_request(request)
     
     if not current_user["is_admin"]:
@@ -158,12 +334,12 @@ async def get_all_registrations(request: Request):
             detail="Only admins can view all registrations"
         )
     
-    registrations = await db["registrations"].find().to_list(None)
+    registrations = await registrations_collection.find().to_list(None)
     
     result = []
     for reg in registrations:
         # Get event and user details
-        event = await db["events"].find_one({"_id": reg["event_id"]})
+        event = await events_collection.find_one({"_id": reg["event_id"]})
         user = await db["users"].find_one({"_id": reg["user_id"]})
         
         result.append({
@@ -180,9 +356,11 @@ async def get_all_registrations(request: Request):
     return result
 
 @router.get("/registrations/event/{event_id}", response_model=list)
-async def get_event_registrations(event_id: str, request: Request):
-    """Get all registrations for a specific event (admin only)"""
+async def get_event_registrations(event_id: str, request: Request, archived: bool = False):
+    """Get all registrations for a specific event, archived=true for an archived one (admin only)"""
     db = get_database()
+    events_collection = collection_for(db, "events", archived)
+    registrations_collection = collection_for(db, "registrations", archived)
     current_user = await get_current_user_from_request(request)
     
     if not current_user["is_admin"]:
@@ -200,14 +378,14 @@ async def get_event_registrations(event_id: str, request: Request):
         )
     
     # Check if event exists
-    event = await db["events"].find_one({"_id": event_oid})
+    event = await events_collection.find_one({"_id": event_oid})
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found"
         )
     
-    registrations = await db["registrations"].find({"event_id": event_oid}).to_list(None)
+    registrations = await registrations_collection.find({"event_id": event_oid}).to_list(None)
     
     result = []
     for reg in registrations:
@@ -218,8 +396,72 @@ async def get_event_registrations(event_id: str, request: Request):
             "user_name": user.get("name") if user else "Unknown",
             "user_email": user.get("email") if user else "Unknown",
             "ticket_number": reg["ticket_number"],
+            "party_size": reg.get("party_size", 1),
+            "tier": reg.get("tier"),
             "ticket_qr_path": reg["ticket_qr_path"],
             "registration_date": reg["registration_date"]
         })
     
     return result
+
+
+@router.get("/profiles")
+async def get_profiles(request: Request, limit: int = 50):
+    """Summaries of recently profiled requests on this worker, newest first (admin only)"""
+    current_user = await get_current_user_from_request(request)
+    
+    if not current_user["is_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view profiles"
+        )
+    
+    return await run_in_threadpool(list_profiles, settings.PROFILE_DIR, limit)
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, format: str = "json"):
+    """
+    One stored profile (admin only)
+    
+    format=json returns the timing summary; format=folded returns the sampled
+    stacks as text for flamegraph.pl or speedscope.
+    """
+    current_user = await get_current_user_from_request(request)
+    
+    if not current_user["is_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view profiles"
+        )
+    
+    if format not in ("json", "folded"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be json or folded"
+        )
+    
+    path = profile_path(settings.PROFILE_DIR, profile_id, f".{format}")
+    if path is None or not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    if format == "folded":
+        return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+    return FileResponse(path, media_type="application/json")
+
+
+@router.get("/single-flight")
+async def get_single_flight_stats(request: Request, top: int = 20):
+    """Coalesced reads on this worker: in-flight count and the busiest keys per group (admin only)"""
+    current_user = await get_current_user_from_request(request)
+    
+    if not current_user["is_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can access this"
+        )
+    
+    return {"groups": single_flight_stats(top)}
@@ -6,6 +6,8 @@ from app.database import get_database
 from app.schemas.user_schema import UserRegisterSchema, UserLoginSchema, UserResponseSchema
 from app.utils.auth import hash_password, verify_password, create_access_token, decode_token
 from app.models.user import User
+from app.utils.user_directory import search_fields
+from app.utils.single_flight import single_flight
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -30,7 +32,8 @@ async def register(user_data: UserRegisterSchema):
         "email": user_data.email,
         "password_hash": hashed_password,
         "is_admin": False,
-        "created_at": datetime.utcnow()
+        "created_at": datetime.utcnow(),
+        **search_fields(user_data.name, user_data.email)
     }
     
     result = await db["users"].insert_one(user_dict)
@@ -122,7 +125,8 @@ async def get_current_user_from_cookie(request):
 async def get_current_user(request: dict = Depends(get_current_user_from_cookie)):
     """Get current logged-in user info"""
     db = get_database()
-    user = await db["users"].find_one({"_id": ObjectId(request["user_id"])})
+    user_oid = ObjectId(request["user_id"])
+    user = await single_flight("user").do(user_oid, lambda: db["users"].find_one({"_id": user_oid}))
     
     if not user:
         raise HTTPException(
@@ -1,11 +1,21 @@
 from fastapi import APIRouter, HTTPException, status, Request, BackgroundTasks
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
 from app.database import get_database
 from app.schemas.event_schema import EventCreateSchema, EventUpdateSchema, EventResponseSchema
 from app.utils.auth import decode_token
 from app.models.event import Event
-from app.utils.email import send_event_created_email
+from app.utils.email import send_event_created_email, send_event_cancelled_emails
+from app.utils.background import add_tracked_task
+from app.utils.cleanup import delete_event_cascade
+from app.utils import organizer_stats
+from app.utils.qrcode_gen import delete_qr_codes
+from app.utils.idempotency import run_idempotent
+from app.utils.schedule import parse_starts_at, as_utc, to_naive_utc
+from app.utils.single_flight import single_flight
+from app.utils.archive import collection_for
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter(prefix="/api/events", tags=["events"])
 
@@ -31,59 +41,143 @@ async def get_current_user_from_request(request: Request):
         "is_admin": payload.get("is_admin", False)
     }
 
+# Fields read by _event_response; listings fetch nothing else, tiers included
+EVENT_PROJECTION = {
+    "title": 1, "description": 1, "date": 1, "time": 1, "starts_at": 1, "timezone": 1, "venue": 1,
+    "total_seats": 1, "available_seats": 1, "created_by": 1, "created_at": 1,
+    "tiers.name": 1, "tiers.total_seats": 1, "tiers.available_seats": 1
+}
+
+def _event_response(event: dict) -> dict:
+    """API representation of an event document"""
+    return {
+        "id": str(event["_id"]),
+        "title": event["title"],
+        "description": event["description"],
+        "date": event["date"],
+        "time": event["time"],
+        "starts_at": as_utc(event.get("starts_at")),
+        "timezone": event.get("timezone"),
+        "venue": event["venue"],
+        "total_seats": event["total_seats"],
+        "available_seats": event["available_seats"],
+        "tiers": event.get("tiers") or [],
+        "created_by": str(event.get("created_by", "Unknown")),
+        "created_at": event.get("created_at", datetime.min)
+    }
+
+def _tiers_or_400(event_data: EventCreateSchema) -> Optional[list]:
+    """Ticket tiers to store on a new event, each fully on sale"""
+    if not event_data.tiers:
+        return None
+    names = [tier.name for tier in event_data.tiers]
+    if len(set(names)) != len(names):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ticket tier names must be unique"
+        )
+    if any(tier.total_seats < 0 for tier in event_data.tiers):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ticket tier seats cannot be negative"
+        )
+    if sum(tier.total_seats for tier in event_data.tiers) != event_data.total_seats:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The ticket tiers' seats must add up to total_seats"
+        )
+    return [
+        {"name": tier.name, "total_seats": tier.total_seats, "available_seats": tier.total_seats}
+        for tier in event_data.tiers
+    ]
+
+def _starts_at_or_400(date: str, time: str, tz_name: str) -> datetime:
+    try:
+        return parse_starts_at(date, time, tz_name)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.get("/", response_model=list)
-async def get_all_events():
-    """Get all events"""
+async def get_all_events(
+    when: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    archived: bool = False
+):
+    """
+    Get events, upcoming first
+
+    Args:
+        when: "upcoming" (soonest first) or "past" (most recent first); both by default
+        start: Only events starting at or after this time
+        end: Only events starting before this time
+        archived: Read archived events instead (see `python -m app.manage archive-events`)
+    """
     db = get_database()
-    events = await db["events"].find().to_list(None)
+    collection = collection_for(db, "events", archived)
     
-    return [
-        {
-            "id": str(event["_id"]),
-            "title": event["title"],
-            "description": event["description"],
-            "date": event["date"],
-            "time": event["time"],
-            "venue": event["venue"],
-            "total_seats": event["total_seats"],
-            "available_seats": event["available_seats"],
-            "created_by": str(event.get("created_by", "Unknown")),
-            "created_at": event.get("created_at", datetime.min)
-        }
-        for event in events
-    ]
+    if when not in (None, "upcoming", "past"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="when must be 'upcoming' or 'past'"
+        )
+    
+    # Every query below is a range scan on the starts_at index
+    now = datetime.utcnow()
+    if start is not None or end is not None:
+        window = {}
+        if start is not None:
+            window["$gte"] = to_naive_utc(start)
+        if end is not None:
+            window["$lt"] = to_naive_utc(end)
+        if when == "upcoming":
+            window["$gte"] = max(window.get("$gte", now), now)
+        elif when == "past":
+            window["$lt"] = min(window.get("$lt", now), now)
+        events = await collection.find({"starts_at": window}, EVENT_PROJECTION).sort("starts_at", 1).to_list(None)
+    else:
+        events = []
+        if when in (None, "upcoming"):
+            events += await collection.find({"starts_at": {"$gte": now}}, EVENT_PROJECTION).sort("starts_at", 1).to_list(None)
+        if when in (None, "past"):
+            events += await collection.find({"starts_at": {"$lt": now}}, EVENT_PROJECTION).sort("starts_at", -1).to_list(None)
+        if when is None:
+            # Events not yet migrated to starts_at go last
+            events += await collection.find({"starts_at": None}, EVENT_PROJECTION).to_list(None)
+    
+    return [_event_response(event) for event in events]
 
 @router.get("/{event_id}", response_model=dict)
-async def get_event(event_id: str):
-    """Get a specific event by ID - API endpoint"""
+async def get_event(event_id: str, archived: bool = False):
+    """Get a specific event by ID, or an archived one with archived=true - API endpoint"""
     db = get_database()
     
     try:
-        event = await db["events"].find_one({"_id": ObjectId(event_id)})
+        event_oid = ObjectId(event_id)
     except:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid event ID"
         )
     
+    if archived:
+        event = await collection_for(db, "events", archived=True).find_one({"_id": event_oid}, EVENT_PROJECTION)
+    else:
+        # Concurrent requests for the same event share one query
+        event = await single_flight("event").do(
+            event_oid, lambda: db["events"].find_one({"_id": event_oid}, EVENT_PROJECTION)
+        )
+    
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found"
         )
     
-    return {
-        "id": str(event["_id"]),
-        "title": event["title"],
-        "description": event["description"],
-        "date": event["date"],
-        "time": event["time"],
-        "venue": event["venue"],
-        "total_seats": event["total_seats"],
-        "available_seats": event["available_seats"],
-        "created_by": str(event.get("created_by", "Unknown")),
-        "created_at": event.get("created_at", datetime.min)
-    }
+    return _event_response(event)
 
 @router.post("/", response_model=dict)
 async def create_event(event_data: EventCreateSchema, request: Request, background_tasks: BackgroundTasks):
@@ -97,11 +191,22 @@ async def create_event(event_data: EventCreateSchema, request: Request, backgrou
             detail="Only admins can create events"
         )
     
+    # Retries carrying the same Idempotency-Key get the stored response
+    return await run_idempotent(
+        request,
+        current_user["user_id"],
+        lambda: _insert_event(db, event_data, current_user, background_tasks)
+    )
+
+async def _insert_event(db, event_data: EventCreateSchema, current_user: dict, background_tasks: BackgroundTasks) -> dict:
+    """Insert a new event and queue the organizer's confirmation email"""
     event_dict = {
         "title": event_data.title,
         "description": event_data.description,
         "date": event_data.date,
         "time": event_data.time,
+        "starts_at": _starts_at_or_400(event_data.date, event_data.time, event_data.timezone),
+        "timezone": event_data.timezone,
         "venue": event_data.venue,
         "total_seats": event_data.total_seats,
         "available_seats": event_data.total_seats,
@@ -109,15 +214,22 @@ async def create_event(event_data: EventCreateSchema, request: Request, backgrou
         "created_at": datetime.utcnow()
     }
     
+    tiers = _tiers_or_400(event_data)
+    if tiers:
+        event_dict["tiers"] = tiers
+    
     result = await db["events"].insert_one(event_dict)
+    await organizer_stats.event_created(db, event_dict)
 
-    background_tasks.add_task(
+    add_tracked_task(
+        background_tasks,
         send_event_created_email,
         admin_email=current_user["email"],
         event_title=event_data.title,
         event_date=event_data.date,
         event_description=event_data.description,
-        event_venue=event_data.venue
+        event_venue=event_data.venue,
+        kind="email"
     )
     
     return {
@@ -163,20 +275,39 @@ async def update_event(event_id: str, event_data: EventUpdateSchema, request: Re
         update_data["date"] = event_data.date
     if event_data.time is not None:
         update_data["time"] = event_data.time
+    if event_data.timezone is not None:
+        update_data["timezone"] = event_data.timezone
+    if {"date", "time", "timezone"} & update_data.keys():
+        update_data["starts_at"] = _starts_at_or_400(
+            update_data.get("date", event["date"]),
+            update_data.get("time", event["time"]),
+            update_data.get("timezone", event.get("timezone", "UTC"))
+        )
     if event_data.venue is not None:
         update_data["venue"] = event_data.venue
+    if event.get("tiers") and (event_data.total_seats is not None or event_data.available_seats is not None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Seats of an event with ticket tiers are counted per tier"
+        )
     if event_data.total_seats is not None:
         update_data["total_seats"] = event_data.total_seats
     if event_data.available_seats is not None:
         update_data["available_seats"] = event_data.available_seats
     
-    await db["events"].update_one({"_id": event_oid}, {"$set": update_data})
+    before = await db["events"].find_one_and_update(
+        {"_id": event_oid},
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before:
+        await organizer_stats.event_updated(db, before, update_data)
     
     return {"message": "Event updated successfully"}
 
 @router.delete("/{event_id}", response_model=dict)
-async def delete_event(event_id: str, request: Request):
-    """Delete an event (admin only)"""
+async def delete_event(event_id: str, request: Request, background_tasks: BackgroundTasks):
+    """Delete an event with its registrations, waitlist and holds (admin only)"""
     db = get_database()
     current_user = await get_current_user_from_request(request)
     
@@ -194,12 +325,31 @@ async def delete_event(event_id: str, request: Request):
             detail="Invalid event ID"
         )
     
-    result = await db["events"].delete_one({"_id": event_oid})
+    result = await delete_event_cascade(db, event_oid)
     
-    if result.deleted_count == 0:
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found"
         )
     
-    return {"message": "Event deleted successfully"}
+    # QR files and attendee notifications are handled after the response
+    if result["ticket_numbers"]:
+        add_tracked_task(background_tasks, delete_qr_codes, result["ticket_numbers"])
+    if result["recipients"]:
+        event = result["event"]
+        add_tracked_task(
+            background_tasks,
+            send_event_cancelled_emails,
+            result["recipients"],
+            event.get("title", ""),
+            event.get("date", ""),
+            kind="email"
+        )
+    
+    return {
+        "message": "Event deleted successfully",
+        "registrations_deleted": result["deleted"]["registrations"],
+        "waitlist_deleted": result["deleted"]["waitlist"],
+        "attendees_notified": len(result["recipients"])
+    }
@@ -1,12 +1,20 @@
 from fastapi import APIRouter, HTTPException, status, Request, BackgroundTasks
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from app.database import get_database
 from app.schemas.registration_schema import RegistrationResponseSchema, RegistrationWithEventSchema
 from app.utils.auth import decode_token
-from app.utils.qrcode_gen import generate_qr_code, get_qr_code_data
-from app.utils.email import send_registration_email
-from datetime import datetime
-import uuid
+from app.utils.qrcode_gen import generate_qr_code, get_qr_code_data, delete_qr_codes, qr_file_path, qr_web_path
+from app.utils.background import add_tracked_task
+from app.utils.idempotency import run_idempotent
+from app.utils.seats import reserve_seat, create_registration, release_seat, return_seat, fill_from_waitlist
+from app.utils.registration_batcher import SoldOut, get_registration_batcher
+from app.utils.tickets import issue_ticket, registration_tickets
+from app.utils.archive import collection_for
+from app.utils import organizer_stats
+from datetime import datetime, timedelta
+from typing import Optional
 import os
 from app.config import settings
 
@@ -34,11 +42,18 @@ async def get_current_user_from_request(request: Request):
         "is_admin": payload.get("is_admin", False)
     }
 
-@router.post("/{event_id}", response_model=dict)
-async def register_for_event(event_id: str, request: Request, background_tasks: BackgroundTasks):
-    """Register a user for an event"""
-    db = get_database()
-    current_user = await get_current_user_from_request(request)
+def _no_seats_detail(party_size: int) -> str:
+    if party_size > 1:
+        return f"Fewer than {party_size} seats are available for this event"
+    return "No seats available for this event"
+
+async def _registration_context(db, event_id: str, current_user: dict, tier: Optional[str] = None, party_size: int = 1):
+    """Validate IDs, tier and party size, check the event (or tier) has the seats and the user is not registered yet"""
+    if not 1 <= party_size <= settings.MAX_PARTY_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"party_size must be between 1 and {settings.MAX_PARTY_SIZE}"
+        )
     
     try:
         event_oid = ObjectId(event_id)
@@ -49,25 +64,43 @@ async def register_for_event(event_id: str, request: Request, background_tasks:
             detail="Invalid ID format"
         )
     
-    # Check if event exists and has available seats
-    event = await db["events"].find_one({"_id": event_oid})
+    # Check if event exists and has available seats, in the chosen tier if it has tiers
+    event = await db["events"].find_one(
+        {"_id": event_oid},
+        {"available_seats": 1, "tiers.name": 1, "tiers.available_seats": 1}
+    )
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found"
         )
     
-    if event["available_seats"] <= 0:
+    available = event["available_seats"]
+    tiers = {t["name"]: t["available_seats"] for t in event.get("tiers") or []}
+    if tiers and tier not in tiers:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No seats available for this event"
+            detail=f"Choose a ticket tier: {', '.join(tiers)}"
+        )
+    if not tiers and tier is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This event has no ticket tiers"
+        )
+    if tiers:
+        available = tiers[tier]
+    
+    if available < party_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=_no_seats_detail(party_size)
         )
     
     # Check if user already registered for this event
     existing_registration = await db["registrations"].find_one({
         "user_id": user_oid,
         "event_id": event_oid
-    })
+    }, {"_id": 1})
     
     if existing_registration:
         raise HTTPException(
@@ -75,56 +108,379 @@ async def register_for_event(event_id: str, request: Request, background_tasks:
             detail="You already registered for this event"
         )
     
-    # Generate ticket number
-    ticket_number = f"REG_{uuid.uuid4().hex[:8].upper()}"
-    
+    return event_oid, user_oid
+
+async def _confirm_seat(db, user_oid: ObjectId, event_oid: ObjectId, current_user: dict, background_tasks: BackgroundTasks,
+                        tier: Optional[str] = None, party_size: int = 1) -> dict:
+    """Turn reserved seats into a registration; the seats are returned if that fails"""
     # Get user info for email
-    user = await db["users"].find_one({"_id": user_oid})
+    user = await db["users"].find_one({"_id": user_oid}, {"name": 1})
+    
+    try:
+        registration = await create_registration(
+            db,
+            user_oid,
+            event_oid,
+            current_user["email"],
+            user.get("name", "User") if user else "User",
+            background_tasks,
+            tier,
+            party_size
+        )
+    except DuplicateKeyError:
+        await return_seat(db, event_oid, tier, party_size)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already registered for this event"
+        )
+    
+    return _registration_response(registration)
+
+async def _register_batched(db, user_oid: ObjectId, event_oid: ObjectId, current_user: dict, background_tasks: BackgroundTasks,
+                            tier: Optional[str] = None) -> dict:
+    """Reserve a seat and insert the registration together with concurrent ones (group commit)"""
+    user = await db["users"].find_one({"_id": user_oid}, {"name": 1})
+    batcher = get_registration_batcher(
+        settings.REGISTRATION_BATCH_MAX_SIZE,
+        settings.REGISTRATION_BATCH_MAX_DELAY_MS / 1000
+    )
+    
+    try:
+        registration = await batcher.submit(db, user_oid, event_oid, tier)
+    except SoldOut:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No seats available for this event"
+        )
+    except DuplicateKeyError:
+        await return_seat(db, event_oid, tier)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already registered for this event"
+        )
+    
+    add_tracked_task(
+        background_tasks,
+        issue_ticket,
+        registration["ticket_number"],
+        current_user["email"],
+        user.get("name", "User") if user else "User",
+        str(event_oid),
+        kind="email"
+    )
+    return _registration_response(registration)
+
+def _registration_response(registration: dict) -> dict:
+    return {
+        "message": "Successfully registered for event",
+        "registration_id": str(registration["_id"]),
+        "ticket_number": registration["ticket_number"],
+        "ticket_numbers": registration_tickets(registration),
+        "party_size": registration.get("party_size", 1),
+        "tier": registration.get("tier"),
+        "qr_code_path": registration["ticket_qr_path"]
+    }
+
+@router.post("/{event_id}", response_model=dict)
+async def register_for_event(event_id: str, request: Request, background_tasks: BackgroundTasks,
+                             tier: Optional[str] = None, party_size: int = 1):
+    """
+    Register a user for an event (hold and confirm in one step)
+
+    Args:
+        tier: Ticket tier, required for events with tiers
+        party_size: Seats to book; the registration gets one ticket per seat
+    """
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
     
-    # Generate QR code
-    qr_data = get_qr_code_data(ticket_number, current_user["email"], event_id)
-    qr_relative_path = generate_qr_code(qr_data, ticket_number)
+    async def register():
+        event_oid, user_oid = await _registration_context(db, event_id, current_user, tier, party_size)
+        
+        # Parties already write once for N seats, so they skip the group commit
+        if settings.REGISTRATION_BATCHING and party_size == 1:
+            return await _register_batched(db, user_oid, event_oid, current_user, background_tasks, tier)
+        
+        # Reserve all the seats (of the tier) atomically; QR codes and email are produced in the background
+        if not await reserve_seat(db, event_oid, tier, party_size):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=_no_seats_detail(party_size)
+            )
+        
+        return await _confirm_seat(db, user_oid, event_oid, current_user, background_tasks, tier, party_size)
     
-    # Get absolute path for email attachment
-    qr_absolute_path = os.path.join(settings.QR_CODE_DIR, f"{ticket_number}.png")
+    # Retries carrying the same Idempotency-Key get the stored response
+    return await run_idempotent(request, current_user["user_id"], register)
 
-    # Create registration
-    registration_dict = {
+@router.post("/{event_id}/hold", response_model=dict)
+async def hold_seat(event_id: str, request: Request, tier: Optional[str] = None):
+    """Hold a seat (of a ticket tier) for SEAT_HOLD_MINUTES without registering yet"""
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    event_oid, user_oid = await _registration_context(db, event_id, current_user, tier)
+    
+    if not await reserve_seat(db, event_oid, tier):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No seats available for this event"
+        )
+    
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=settings.SEAT_HOLD_MINUTES)
+    hold = {
         "user_id": user_oid,
         "event_id": event_oid,
-        "ticket_qr_path": qr_relative_path,
-        "ticket_number": ticket_number,
-        "registration_date": datetime.utcnow()
+        "released": False,
+        "created_at": now,
+        "expires_at": expires_at,
+        "purge_at": expires_at + timedelta(minutes=settings.SEAT_HOLD_RETENTION_MINUTES)
     }
+    if tier is not None:
+        hold["tier"] = tier
+    try:
+        result = await db["seat_holds"].insert_one(hold)
+    except DuplicateKeyError:
+        # Give back the seat we just took; the existing hold keeps its own
+        await return_seat(db, event_oid, tier)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already hold a seat for this event"
+        )
     
-    result = await db["registrations"].insert_one(registration_dict)
+    return {
+        "message": "Seat held",
+        "hold_id": str(result.inserted_id),
+        "expires_at": expires_at
+    }
+
+@router.post("/holds/{hold_id}/confirm", response_model=dict)
+async def confirm_hold(hold_id: str, request: Request, background_tasks: BackgroundTasks):
+    """Confirm a seat hold, creating the registration"""
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
     
-    # Decrease available seats
-    await db["events"].update_one(
-        {"_id": event_oid},
-        {"$inc": {"available_seats": -1}}
-    )
+    try:
+        hold_oid = ObjectId(hold_id)
+        user_oid = ObjectId(current_user["user_id"])
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
     
-    # Send email in background
-    background_tasks.add_task(
-        send_registration_email,
-        current_user["email"],
-        user.get("name", "User"),
-        ticket_number,
-        qr_absolute_path
+    # Claim the hold; an expired one belongs to the sweeper
+    hold = await db["seat_holds"].find_one_and_delete({
+        "_id": hold_oid,
+        "user_id": user_oid,
+        "released": False,
+        "expires_at": {"$gt": datetime.utcnow()}
+    })
+    if not hold:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Seat hold not found or expired"
+        )
+    
+    return await _confirm_seat(db, user_oid, hold["event_id"], current_user, background_tasks, hold.get("tier"))
+
+@router.delete("/holds/{hold_id}", response_model=dict)
+async def release_hold(hold_id: str, request: Request, background_tasks: BackgroundTasks):
+    """Give up a seat hold before it expires"""
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    
+    try:
+        hold_oid = ObjectId(hold_id)
+        user_oid = ObjectId(current_user["user_id"])
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    hold = await db["seat_holds"].find_one_and_delete({
+        "_id": hold_oid,
+        "user_id": user_oid,
+        "released": False
+    })
+    if not hold:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Seat hold not found"
+        )
+    
+    await release_seat(db, hold["event_id"], background_tasks, hold.get("tier"))
+    return {"message": "Seat hold released"}
+
+@router.delete("/{registration_id}", response_model=dict)
+async def cancel_registration(registration_id: str, request: Request, background_tasks: BackgroundTasks):
+    """Cancel a registration; the seat goes to the next waitlisted user or back on sale"""
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    
+    try:
+        registration_oid = ObjectId(registration_id)
+        user_oid = ObjectId(current_user["user_id"])
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    # Users cancel their own registrations; admins can cancel any
+    query = {"_id": registration_oid}
+    if not current_user["is_admin"]:
+        query["user_id"] = user_oid
+    
+    registration = await db["registrations"].find_one_and_delete(query)
+    if not registration:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Registration not found"
+        )
+    
+    await organizer_stats.registrations_changed(db, registration["event_id"], -1)
+    party_size = registration.get("party_size", 1)
+    promoted = await release_seat(
+        db, registration["event_id"], background_tasks, registration.get("tier"), party_size
     )
+    add_tracked_task(background_tasks, delete_qr_codes, registration_tickets(registration))
     
     return {
-        "message": "Successfully registered for event",
-        "registration_id": str(result.inserted_id),
-        "ticket_number": ticket_number,
-        "qr_code_path": qr_relative_path
+        "message": "Registration cancelled",
+        "seat_released_to": "waitlist" if promoted else "sale",
+        "seats_released": party_size,
+        "seats_to_waitlist": len(promoted)
     }
 
+@router.post("/{event_id}/waitlist", response_model=dict)
+async def join_waitlist(event_id: str, request: Request, background_tasks: BackgroundTasks):
+    """Join the waitlist of a sold-out event"""
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    
+    try:
+        event_oid = ObjectId(event_id)
+        user_oid = ObjectId(current_user["user_id"])
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    event = await db["events"].find_one({"_id": event_oid}, {"available_seats": 1, "tiers.name": 1})
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found"
+        )
+    
+    if event["available_seats"] > 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Seats are still available, register instead"
+        )
+    
+    if await db["registrations"].find_one({"user_id": user_oid, "event_id": event_oid}, {"_id": 1}):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You already registered for this event"
+        )
+    
+    user = await db["users"].find_one({"_id": user_oid}, {"name": 1})
+    
+    # Next position in this event's queue
+    counter = await db["events"].find_one_and_update(
+        {"_id": event_oid},
+        {"$inc": {"waitlist_seq": 1}},
+        projection={"waitlist_seq": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    try:
+        await db["waitlist"].insert_one({
+            "user_id": user_oid,
+            "event_id": event_oid,
+            "user_email": current_user["email"],
+            "user_name": user.get("name", "User") if user else "User",
+            "position": counter["waitlist_seq"],
+            "joined_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You are already on the waitlist for this event"
+        )
+    
+    # A seat may have been released while we were joining, in any tier
+    for tier in [t["name"] for t in event.get("tiers") or []] or [None]:
+        await fill_from_waitlist(db, event_oid, background_tasks, tier)
+    
+    return await get_waitlist_position(event_id, request)
+
+@router.get("/{event_id}/waitlist", response_model=dict)
+async def get_waitlist_position(event_id: str, request: Request):
+    """Get the current user's place on an event's waitlist"""
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    
+    try:
+        event_oid = ObjectId(event_id)
+        user_oid = ObjectId(current_user["user_id"])
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    entry = await db["waitlist"].find_one({"event_id": event_oid, "user_id": user_oid}, {"position": 1})
+    if not entry:
+        registration = await db["registrations"].find_one(
+            {"user_id": user_oid, "event_id": event_oid}, {"ticket_number": 1}
+        )
+        if registration:
+            return {"waitlisted": False, "registered": True, "ticket_number": registration["ticket_number"]}
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="You are not on the waitlist for this event"
+        )
+    
+    ahead = await db["waitlist"].count_documents(
+        {"event_id": event_oid, "position": {"$lt": entry["position"]}}
+    )
+    return {"waitlisted": True, "registered": False, "position": ahead + 1}
+
+@router.delete("/{event_id}/waitlist", response_model=dict)
+async def leave_waitlist(event_id: str, request: Request):
+    """Leave an event's waitlist"""
+    db = get_database()
+    current_user = await get_current_user_from_request(request)
+    
+    try:
+        event_oid = ObjectId(event_id)
+        user_oid = ObjectId(current_user["user_id"])
+    except:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ID format"
+        )
+    
+    result = await db["waitlist"].delete_one({"event_id": event_oid, "user_id": user_oid})
+    if result.deleted_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="You are not on the waitlist for this event"
+        )
+    
+    return {"message": "Removed from the waitlist"}
+
 @router.get("/my-registrations", response_model=list)
-async def get_my_registrations(request: Request):
-    """Get all registrations for current user with self-healing QR codes."""
+async def get_my_registrations(request: Request, archived: bool = False):
+    """Get all registrations for current user with self-healing QR codes; archived=true lists those of archived events."""
     db = get_database()
+    events_collection = collection_for(db, "events", archived)
+    registrations_collection = collection_for(db, "registrations", archived)
     current_user = await get_current_user_from_request(request)
     
     try:
@@ -135,7 +491,7 @@ async def get_my_registrations(request: Request):
             detail="Invalid user ID"
         )
     
-    registrations = await db["registrations"].find({"user_id": user_oid}).to_list(None)
+    registrations = await registrations_collection.find({"user_id": user_oid}).to_list(None)
     
     result = []
     for reg in registrations:
@@ -144,23 +500,22 @@ async def get_my_registrations(request: Request):
             continue
 
         # 1. Construct the correct web path from the source of truth (ticket_number)
-        qr_path_web = f"/static/qrcodes/{ticket_number}.png"
+        qr_path_web = qr_web_path(ticket_number)
         
-        # 2. Check if the file exists on disk and regenerate if not.
-        filename_disk = f"{ticket_number}.png"
-        filepath_disk = os.path.join(settings.QR_CODE_DIR, filename_disk)
-
-        if not os.path.exists(filepath_disk):
-            # Regenerate if missing. User is already authenticated.
-            user_email = current_user.get("email")
-            event_id = str(reg.get("event_id"))
-            
-            if user_email and event_id:
-                qr_data = get_qr_code_data(ticket_number, user_email, event_id)
-                generate_qr_code(qr_data, ticket_number)
+        # 2. Check each ticket's file exists on disk (a party has several) and regenerate if not.
+        tickets = registration_tickets(reg)
+        for ticket in tickets:
+            if not os.path.exists(qr_file_path(ticket)):
+                # Regenerate if missing. User is already authenticated.
+                user_email = current_user.get("email")
+                event_id = str(reg.get("event_id"))
+                
+                if user_email and event_id:
+                    qr_data = get_qr_code_data(ticket, user_email, event_id)
+                    generate_qr_code(qr_data, ticket)
 
         # 3. Get event details
-        event = await db["events"].find_one({"_id": reg["event_id"]})
+        event = await events_collection.find_one({"_id": reg["event_id"]})
         
         result.append({
             "id": str(reg["_id"]),
@@ -171,15 +526,20 @@ async def get_my_registrations(request: Request):
             "event_venue": event.get("venue") if event else "",
             "ticket_qr_path": qr_path_web,  # Always use the reliable, constructed path
             "ticket_number": ticket_number,
+            "party_size": reg.get("party_size", 1),
+            "tickets": [{"ticket_number": t, "ticket_qr_path": qr_web_path(t)} for t in tickets],
+            "tier": reg.get("tier"),
             "registration_date": reg["registration_date"]
         })
     
     return result
 
 @router.get("/admin/registrations", response_model=list)
-async def get_all_registrations(request: Request):
-    """Get all registrations (admin only)"""
+async def get_all_registrations(request: Request, archived: bool = False):
+    """Get all registrations, or all archived ones with archived=true (admin only)"""
     db = get_database()
+    events_collection = collection_for(db, "events", archived)
+    registrations_collection = collection_for(db, "registrations", archived)
     current_user = await get_current_user_from_request(request)
     
     if not current_user["is_admin"]:
@@ -188,12 +548,12 @@ async def get_all_registrations(request: Request):
             detail="Only admins can view all registrations"
         )
     
-    registrations = await db["registrations"].find().to_list(None)
+    registrations = await registrations_collection.find().to_list(None)
     
     result = []
     for reg in registrations:
         # Get event and user details
-        event = await db["events"].find_one({"_id": reg["event_id"]})
+        event = await events_collection.find_one({"_id": reg["event_id"]})
         user = await db["users"].find_one({"_id": reg["user_id"]})
         
         result.append({
@@ -210,9 +570,11 @@ async def get_all_registrations(request: Request):
     return result
 
 @router.get("/admin/registrations/event/{event_id}", response_model=list)
-async def get_event_registrations(event_id: str, request: Request):
-    """Get all registrations for a specific event (admin only)"""
+async def get_event_registrations(event_id: str, request: Request, archived: bool = False):
+    """Get all registrations for a specific event, archived=true for an archived one (admin only)"""
     db = get_database()
+    events_collection = collection_for(db, "events", archived)
+    registrations_collection = collection_for(db, "registrations", archived)
     current_user = await get_current_user_from_request(request)
     
     if not current_user["is_admin"]:
@@ -230,14 +592,14 @@ async def get_event_registrations(event_id: str, request: Request):
         )
     
     # Check if event exists
-    event = await db["events"].find_one({"_id": event_oid})
+    event = await events_collection.find_one({"_id": event_oid})
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Event not found"
         )
     
-    registrations = await db["registrations"].find({"event_id": event_oid}).to_list(None)
+    registrations = await registrations_collection.find({"event_id": event_oid}).to_list(None)
     
     result = []
     for reg in registrations:
@@ -248,6 +610,8 @@ async def get_event_registrations(event_id: str, request: Request):
             "user_name": user.get("name") if user else "Unknown",
             "user_email": user.get("email") if user else "Unknown",
             "ticket_number": reg["ticket_number"],
+            "party_size": reg.get("party_size", 1),
+            "tier": reg.get("tier"),
             "registration_date": reg["registration_date"]
         })
     
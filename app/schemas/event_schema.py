@@ -1,7 +1,12 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
+class TicketTierSchema(BaseModel):
+    name: str
+    total_seats: int
+    available_seats: Optional[int] = None
+
 class EventCreateSchema(BaseModel):
     title: str
     description: str
@@ -9,6 +14,9 @@ class EventCreateSchema(BaseModel):
     time: str
     venue: str
     total_seats: int
+    timezone: str = "UTC"
+    # Optional ticket tiers; their seats must add up to total_seats
+    tiers: Optional[List[TicketTierSchema]] = None
     
     class Config:
         schema_extra = {
@@ -17,8 +25,14 @@ class EventCreateSchema(BaseModel):
                 "description": "A great conference for Python developers",
                 "date": "2024-06-15",
                 "time": "09:00",
+                "timezone": "Europe/Paris",
                 "venue": "Convention Center",
-                "total_seats": 500
+                "total_seats": 500,
+                "tiers": [
+                    {"name": "VIP", "total_seats": 50},
+                    {"name": "Standard", "total_seats": 400},
+                    {"name": "Student", "total_seats": 50}
+                ]
             }
         }
 
@@ -27,6 +41,7 @@ class EventUpdateSchema(BaseModel):
     description: Optional[str] = None
     date: Optional[str] = None
     time: Optional[str] = None
+    timezone: Optional[str] = None
     venue: Optional[str] = None
     total_seats: Optional[int] = None
     available_seats: Optional[int] = None
@@ -45,9 +60,12 @@ class EventResponseSchema(BaseModel):
     description: str
     date: str
     time: str
+    starts_at: Optional[datetime] = None
+    timezone: Optional[str] = None
     venue: str
     total_seats: int
     available_seats: int
+    tiers: List[TicketTierSchema] = []
     created_by: str
     created_at: datetime
     
@@ -60,9 +78,16 @@ class EventResponseSchema(BaseModel):
                 "description": "A great conference for Python developers",
                 "date": "2024-06-15",
                 "time": "09:00",
+                "starts_at": "2024-06-15T07:00:00+00:00",
+                "timezone": "Europe/Paris",
                 "venue": "Convention Center",
                 "total_seats": 500,
                 "available_seats": 450,
+                "tiers": [
+                    {"name": "VIP", "total_seats": 50, "available_seats": 0},
+                    {"name": "Standard", "total_seats": 400, "available_seats": 400},
+                    {"name": "Student", "total_seats": 50, "available_seats": 50}
+                ],
                 "created_by": "507f1f77bcf86cd799439010",
                 "created_at": "2024-01-01T12:00:00"
             }
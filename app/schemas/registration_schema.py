@@ -16,7 +16,7 @@ class RegistrationResponseSchema(BaseModel):
                 "id": "507f1f77bcf86cd799439011",
                 "user_id": "507f1f77bcf86cd799439010",
                 "event_id": "507f1f77bcf86cd799439009",
-                "ticket_qr_path": "/static/qrcodes/REG_12345.png",
+                "ticket_qr_path": "/static/qrcodes/c1/7e/REG_12345.png",
                 "ticket_number": "REG_12345",
                 "registration_date": "2024-01-01T12:00:00"
             }
@@ -43,7 +43,7 @@ class RegistrationWithEventSchema(BaseModel):
                 "event_date": "2024-06-15",
                 "event_time": "09:00",
                 "event_venue": "Convention Center",
-                "ticket_qr_path": "/static/qrcodes/REG_12345.png",
+                "ticket_qr_path": "/static/qrcodes/c1/7e/REG_12345.png",
                 "ticket_number": "REG_12345",
                 "registration_date": "2024-01-01T12:00:00"
             }
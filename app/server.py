@@ -0,0 +1,44 @@
+"""
+Production entry point
+
+    python -m app.server
+
+Runs WORKERS uvicorn worker processes, using uvloop and httptools when they
+are installed. On SIGTERM each worker stops accepting connections, finishes
+in-flight requests and then drains queued background tasks (emails, QR codes)
+before closing its MongoDB connection.
+"""
+import importlib.util
+import logging
+import uvicorn
+from app.config import settings
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f"Starting {settings.WORKERS} worker(s) with loop={loop} http={http}")
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=settings.WORKERS,
+        loop=loop,
+        http=http,
+        backlog=settings.BACKLOG,
+        # Keep idle connections open longer than the load balancer does, so it
+        # never reuses a connection the worker has just closed
+        timeout_keep_alive=settings.KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_SECONDS,
+        access_log=settings.DEBUG
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 // Authentication utilities
 
 async function getCurrentUser() {
+    // getBootstrapUser() is defined by base.html next to the embedded user
+    const user = typeof getBootstrapUser === 'function' ? getBootstrapUser() : undefined;
+    if (user !== undefined) {
+        return user;
+    }
     try {
         const response = await fetch('/auth/me');
         if (response.ok) {
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+from app.config import settings
+
+UNITS = ("minute", "hour", "day")
+
+# Registrations can be written a moment after their registration_date, so a
+# bucket is only treated as final once it ended this long ago
+FINALIZE_AFTER = timedelta(seconds=5)
+
+
+def bucket_start(moment: datetime, unit: str, tz_name: str) -> datetime:
+    """
+    Start of the bucket containing a moment, matching $dateTrunc
+
+    Args:
+        moment: Naive UTC datetime
+        unit: "minute", "hour" or "day"
+        tz_name: IANA timezone whose calendar days are used for "day"
+
+    Returns:
+        The bucket start as a naive UTC datetime
+    """
+    local = moment.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(tz_name))
+    if unit == "minute":
+        local = local.replace(second=0, microsecond=0)
+    elif unit == "hour":
+        local = local.replace(minute=0, second=0, microsecond=0)
+    else:
+        local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def _aggregate_buckets(db, event_ids: list, unit: str, tz_name: str,
+                             since: Optional[datetime], until: Optional[datetime] = None) -> Dict[datetime, int]:
+    """Count registrations per bucket with one indexed $match + $group"""
+    match = {"event_id": {"$in": event_ids}}
+    date_range = {}
+    if since is not None:
+        date_range["$gte"] = since
+    if until is not None:
+        date_range["$lt"] = until
+    if date_range:
+        match["registration_date"] = date_range
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$registration_date", "unit": unit, "timezone": tz_name}},
+            "count": {"$sum": 1}
+        }}
+    ]
+    rows = await db["registrations"].aggregate(pipeline).to_list(None)
+    return {row["_id"]: row["count"] for row in rows}
+
+
+class _FinishedBuckets:
+    """
+    LRU of per-event-set series whose finished buckets never need recounting
+
+    Each entry holds the counts of every bucket that ended before
+    complete_until; only registrations from complete_until onwards are
+    aggregated on the next request.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, complete_until: datetime, buckets: Dict[datetime, int]):
+        self._entries[key] = (complete_until, buckets)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+
+_finished = _FinishedBuckets(settings.ANALYTICS_CACHE_SIZE)
+
+
+async def registration_timeseries(db, event_ids: list, unit: str, tz_name: str = "UTC",
+                                  start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[dict]:
+    """
+    Registrations per time bucket for a set of events
+
+    Finished buckets are cached per event set and range, so repeated
+    requests only aggregate the registrations of the still-open bucket.
+    Registrations cancelled after their bucket finished remain counted until
+    the entry is evicted.
+
+    Args:
+        db: Database instance
+        event_ids: ObjectIds of the events to include
+        unit: "minute", "hour" or "day"
+        tz_name: IANA timezone for bucket boundaries
+        start: Only count registrations from this moment (naive UTC)
+        end: Only count registrations before this moment (naive UTC)
+
+    Returns:
+        List of {"start": bucket start (naive UTC), "count": registrations}, oldest first
+    """
+    key = (tuple(sorted(str(e) for e in event_ids)), unit, tz_name, start, end)
+    cached = _finished.get(key)
+    since, buckets = (cached[0], dict(cached[1])) if cached else (None, {})
+    if start is not None and (since is None or since < start):
+        since = start
+
+    # The range is part of the indexed $match on (event_id, registration_date)
+    if end is None or since is None or since < end:
+        buckets.update(await _aggregate_buckets(db, event_ids, unit, tz_name, since, end))
+
+    complete_until = bucket_start(datetime.utcnow() - FINALIZE_AFTER, unit, tz_name)
+    _finished.put(key, complete_until, {b: n for b, n in buckets.items() if b < complete_until})
+
+    return [{"start": b, "count": buckets[b]} for b in sorted(buckets)]
@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import List
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+# Hot collection -> cold collection holding its archived documents
+ARCHIVE_COLLECTIONS = {
+    "events": "events_archive",
+    "registrations": "registrations_archive",
+}
+
+# Per-event documents that are dropped, not archived: nobody can join the
+# waitlist of or hold a seat for an event that is over
+STALE_COLLECTIONS = ("waitlist", "seat_holds")
+
+
+def collection_for(db, name: str, archived: bool = False):
+    """The hot collection, or its archive when archived is true"""
+    return db[ARCHIVE_COLLECTIONS[name]] if archived else db[name]
+
+
+async def _copy(db, name: str, documents: List[dict]):
+    """Upsert documents into name's archive by _id, so re-running a batch is harmless"""
+    if documents:
+        await collection_for(db, name, archived=True).bulk_write(
+            [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in documents],
+            ordered=False
+        )
+
+
+async def _move_registrations(db, event_ids: List[ObjectId], batch_size: int) -> int:
+    """Move the registrations of events already removed from the hot collection"""
+    moved = 0
+    while True:
+        registrations = await db["registrations"].find(
+            {"event_id": {"$in": event_ids}}
+        ).sort("_id", 1).limit(batch_size).to_list(None)
+        if not registrations:
+            return moved
+        await _copy(db, "registrations", registrations)
+        result = await db["registrations"].delete_many({"_id": {"$in": [r["_id"] for r in registrations]}})
+        moved += result.deleted_count
+
+
+async def _finish_events(db, event_ids: List[ObjectId], batch_size: int, report: dict):
+    """Move the events' registrations, drop their stale documents and mark them done"""
+    report["registrations"] += await _move_registrations(db, event_ids, batch_size)
+    for collection in STALE_COLLECTIONS:
+        result = await db[collection].delete_many({"event_id": {"$in": event_ids}})
+        report[collection] += result.deleted_count
+    await db["events_archive"].update_many(
+        {"_id": {"$in": event_ids}},
+        {"$set": {"registrations_moved": True}}
+    )
+
+
+async def archive_events(db, before: datetime, dry_run: bool = True, batch_size: int = 100) -> dict:
+    """
+    Move events that started before a cutoff, with their registrations, to the archive
+
+    Each batch of events is copied to events_archive and removed from events
+    first, so no registration can be added to it meanwhile; its registrations
+    are then moved to registrations_archive and its waitlist entries and seat
+    holds deleted. Archived events are flagged until their registrations have
+    moved, and the next run finishes any batch an interrupted run left behind.
+    Organizer summaries keep counting archived events.
+
+    Args:
+        db: Database instance
+        before: Archive events whose starts_at is earlier than this (naive UTC)
+        dry_run: Only count what would be moved
+        batch_size: Events per batch, and registrations per bulk write
+
+    Returns:
+        Report with the number of events and registrations moved (or that
+        would be) and the number of waitlist entries and seat holds deleted
+    """
+    query = {"starts_at": {"$lt": before}}
+    report = {"dry_run": dry_run, "before": before, "events": 0, "registrations": 0}
+    report.update({collection: 0 for collection in STALE_COLLECTIONS})
+
+    if dry_run:
+        event_ids = [e["_id"] for e in await db["events"].find(query, {"_id": 1}).to_list(None)]
+        report["events"] = len(event_ids)
+        for start in range(0, len(event_ids), batch_size):
+            batch = {"event_id": {"$in": event_ids[start:start + batch_size]}}
+            report["registrations"] += await db["registrations"].count_documents(batch)
+            for collection in STALE_COLLECTIONS:
+                report[collection] += await db[collection].count_documents(batch)
+        return report
+
+    unfinished = await db["events_archive"].find({"registrations_moved": False}, {"_id": 1}).to_list(None)
+    if unfinished:
+        await _finish_events(db, [e["_id"] for e in unfinished], batch_size, report)
+
+    while True:
+        events = await db["events"].find(query).sort("starts_at", 1).limit(batch_size).to_list(None)
+        if not events:
+            return report
+        archived_at = datetime.utcnow()
+        await _copy(db, "events", [{**e, "archived_at": archived_at, "registrations_moved": False} for e in events])
+        event_ids = [e["_id"] for e in events]
+        result = await db["events"].delete_many({"_id": {"$in": event_ids}})
+        report["events"] += result.deleted_count
+        await _finish_events(db, event_ids, batch_size, report)
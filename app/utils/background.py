@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+from fastapi import BackgroundTasks
+from starlette.concurrency import run_in_threadpool
+from app.utils.metrics import BACKGROUND_TASKS, BACKGROUND_TASK_LATENCY
+
+# Tasks running in this worker, used to drain them on shutdown. A task is
+# counted once it starts: starlette never runs the tasks of a request whose
+# handler raised or whose client went away, so counting at queue time leaks
+_pending = 0
+_idle = asyncio.Event()
+_idle.set()
+# Running tasks per kind, e.g. "email" for the readiness email backlog
+_running_by_kind = defaultdict(int)
+
+
+def _task_started():
+    global _pending
+    _pending += 1
+    _idle.clear()
+
+
+def _task_finished():
+    global _pending
+    _pending -= 1
+    if _pending == 0:
+        _idle.set()
+
+
+def pending_tasks(kind: Optional[str] = None) -> int:
+    """Number of background tasks running in this worker, only those of a kind if given"""
+    if kind is not None:
+        return _running_by_kind[kind]
+    return _pending
+
+
+async def _run_tracked(kind: Optional[str], func, *args, **kwargs):
+    """Run a background task and keep the pending-task gauge up to date"""
+    name = func.__name__
+    BACKGROUND_TASKS.inc(labels=(name,))
+    _task_started()
+    if kind is not None:
+        _running_by_kind[kind] += 1
+    start = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        return await run_in_threadpool(func, *args, **kwargs)
+    finally:
+        BACKGROUND_TASK_LATENCY.observe(time.perf_counter() - start, labels=(name,))
+        BACKGROUND_TASKS.dec(labels=(name,))
+        if kind is not None:
+            _running_by_kind[kind] -= 1
+        _task_finished()
+
+
+def add_tracked_task(background_tasks: BackgroundTasks, func, *args, kind: Optional[str] = None, **kwargs):
+    """
+    Queue a background task whose running count and run time are exported as metrics
+
+    Args:
+        background_tasks: The request's BackgroundTasks
+        func: The sync or async callable to run after the response is sent
+        kind: Category counted by pending_tasks(kind), e.g. "email" for tasks that send mail
+    """
+    background_tasks.add_task(_run_tracked, kind, func, *args, **kwargs)
+
+
+async def drain(timeout: float) -> int:
+    """
+    Wait for running background tasks to finish
+
+    Args:
+        timeout: Maximum number of seconds to wait
+
+    Returns:
+        The number of tasks still pending when the wait ended
+    """
+    if _pending:
+        logging.info(f"Draining {_pending} background task(s)")
+        try:
+            await asyncio.wait_for(_idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"{_pending} background task(s) still pending after {timeout}s")
+    return _pending
@@ -0,0 +1,34 @@
+import hashlib
+import hmac
+import json
+import time
+from typing import Optional
+from app.config import settings
+
+# The only user fields exposed to page scripts
+BOOTSTRAP_FIELDS = ("id", "name", "email", "is_admin")
+
+
+def _signature(user: Optional[dict], issued_at: int) -> str:
+    message = json.dumps([user, issued_at], sort_keys=True, separators=(",", ":")).encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def user_bootstrap(user: Optional[dict]) -> dict:
+    """
+    Signed snapshot of the signed-in user, embedded in every rendered page
+
+    The page handler has already loaded the user from the cookie, so page
+    scripts read this instead of calling /auth/me.
+
+    Args:
+        user: User dict from get_user_from_request, or None when signed out
+
+    Returns:
+        Dict with user (or None), issued_at (Unix seconds) and signature
+    """
+    if user is not None:
+        user = {field: user.get(field) for field in BOOTSTRAP_FIELDS}
+    issued_at = int(time.time())
+    return {"user": user, "issued_at": issued_at, "signature": _signature(user, issued_at)}
+
@@ -0,0 +1,125 @@
+from typing import List, Optional
+from bson import ObjectId
+from app.utils import organizer_stats
+from app.utils.archive import collection_for
+from app.utils.tickets import registration_tickets
+
+# Collections whose documents belong to a single event
+EVENT_CHILD_COLLECTIONS = ("registrations", "waitlist", "seat_holds")
+
+
+async def _delete_in_batches(db, collection: str, event_oid: ObjectId, projection: dict, batch_size: int):
+    """
+    Delete an event's documents from a collection one batch at a time
+
+    Yields:
+        Each batch of documents, with the projected fields, and how many of
+        them were deleted (fewer if some were removed concurrently)
+    """
+    while True:
+        batch = await db[collection].find({"event_id": event_oid}, projection).limit(batch_size).to_list(None)
+        if not batch:
+            return
+        result = await db[collection].delete_many({"_id": {"$in": [d["_id"] for d in batch]}})
+        yield batch, result.deleted_count
+
+
+async def delete_event_cascade(db, event_oid: ObjectId, batch_size: int = 1000) -> Optional[dict]:
+    """
+    Delete an event together with its registrations, waitlist and seat holds
+
+    The event is deleted first so no new registration can reserve a seat
+    while its children are being removed; the children are then read and
+    deleted batch_size at a time, so large events are never loaded at once.
+
+    Args:
+        db: Database instance
+        event_oid: The event's ObjectId
+        batch_size: Number of documents read and deleted per query
+
+    Returns:
+        None if the event does not exist, otherwise a dict with the deleted
+        event, the removed ticket numbers, the (email, name) pairs to notify
+        and the number of documents deleted per collection
+    """
+    event = await db["events"].find_one_and_delete({"_id": event_oid})
+    if not event:
+        return None
+
+    deleted = {collection: 0 for collection in EVENT_CHILD_COLLECTIONS}
+    ticket_numbers = []
+    recipients = {}
+
+    async for registrations, count in _delete_in_batches(
+        db, "registrations", event_oid, {"user_id": 1, "ticket_number": 1, "ticket_numbers": 1}, batch_size
+    ):
+        deleted["registrations"] += count
+        ticket_numbers.extend(t for r in registrations for t in registration_tickets(r))
+        user_ids = [r["user_id"] for r in registrations]
+        users = await db["users"].find({"_id": {"$in": user_ids}}, {"email": 1, "name": 1}).to_list(None)
+        recipients.update((u["email"], u["name"]) for u in users)
+
+    async for waitlist, count in _delete_in_batches(db, "waitlist", event_oid, {"user_email": 1, "user_name": 1}, batch_size):
+        deleted["waitlist"] += count
+        for entry in waitlist:
+            recipients.setdefault(entry["user_email"], entry["user_name"])
+
+    async for _, count in _delete_in_batches(db, "seat_holds", event_oid, {"_id": 1}, batch_size):
+        deleted["seat_holds"] += count
+
+    await organizer_stats.event_deleted(db, event, deleted["registrations"])
+
+    return {
+        "event": event,
+        "ticket_numbers": ticket_numbers,
+        "recipients": list(recipients.items()),
+        "deleted": deleted
+    }
+
+
+async def _missing_event_ids(db, event_ids: List[ObjectId], batch_size: int) -> List[ObjectId]:
+    """Event IDs from the list that have no event document, live or archived"""
+    missing = []
+    for start in range(0, len(event_ids), batch_size):
+        batch = event_ids[start:start + batch_size]
+        existing_ids = set()
+        for archived in (False, True):
+            existing = await collection_for(db, "events", archived).find({"_id": {"$in": batch}}, {"_id": 1}).to_list(None)
+            existing_ids.update(e["_id"] for e in existing)
+        missing.extend(event_id for event_id in batch if event_id not in existing_ids)
+    return missing
+
+
+async def purge_orphans(db, dry_run: bool = True, batch_size: int = 1000) -> dict:
+    """
+    Remove registrations, waitlist entries and seat holds of events that no longer exist
+
+    Args:
+        db: Database instance
+        dry_run: Only count what would be deleted
+        batch_size: Number of event IDs checked or deleted per query
+
+    Returns:
+        Report with the orphaned event IDs, the orphan count per collection
+        and the ticket numbers whose QR codes can be removed
+    """
+    report = {"dry_run": dry_run, "missing_events": [], "orphans": {}, "ticket_numbers": []}
+
+    for collection in EVENT_CHILD_COLLECTIONS:
+        event_ids = await db[collection].distinct("event_id")
+        missing = await _missing_event_ids(db, event_ids, batch_size)
+        report["missing_events"].extend(e for e in missing if e not in report["missing_events"])
+
+        count = 0
+        for start in range(0, len(missing), batch_size):
+            query = {"event_id": {"$in": missing[start:start + batch_size]}}
+            if collection == "registrations":
+                tickets = await db[collection].find(query, {"ticket_number": 1, "ticket_numbers": 1}).to_list(None)
+                report["ticket_numbers"].extend(t for r in tickets for t in registration_tickets(r))
+            if dry_run:
+                count += await db[collection].count_documents(query)
+            else:
+                count += (await db[collection].delete_many(query)).deleted_count
+        report["orphans"][collection] = count
+
+    return report
@@ -0,0 +1,194 @@
+import zlib
+from typing import List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from app.utils.static_assets import accepted_encodings
+
+# Only text-like bodies are worth compressing; PNG QR codes, ZIP and PDF
+# exports and anything already encoded are passed through untouched
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def _brotli():
+    """The optional brotli module, or None when it isn't installed"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        brotli = _brotli()
+        self._compressor = brotli.Compressor(quality=quality, mode=brotli.MODE_TEXT)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def is_compressible(headers: Headers) -> bool:
+    """Whether a response with these headers should be compressed"""
+    if "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith(("+json", "+xml"))
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of the encoded representation: the upstream tag with an encoding suffix"""
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return f"{etag}-{encoding}"
+
+
+def _decoded_if_none_match(value: str, encoding: str) -> str:
+    """If-None-Match with the encoding suffix removed, for the app to compare with its own tags"""
+    suffix = f"-{encoding}"
+    tags = []
+    for tag in value.split(","):
+        tag = tag.strip()
+        if tag.endswith(suffix + '"'):
+            tag = tag[:-len(suffix) - 1] + '"'
+        elif tag.endswith(suffix):
+            tag = tag[:-len(suffix)]
+        tags.append(tag)
+    return ", ".join(tags)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing text responses with brotli or gzip
+
+    Bodies are buffered only until minimum_size bytes have been seen: smaller
+    responses go out unchanged, larger ones are compressed. For streaming
+    responses each later chunk is compressed and flushed as it arrives, so
+    clients still receive data incrementally.
+
+    A compressed response's ETag gets an encoding suffix ("abc" becomes
+    "abc-gzip"), since its bytes differ from the upstream representation.
+    The suffix is removed from If-None-Match before the request reaches
+    the app, so conditional requests still get 304s.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, use_brotli: bool = True):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.use_brotli = use_brotli and _brotli() is not None
+
+    def _choose_encoding(self, scope) -> Optional[str]:
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if self.use_brotli and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _encoder(self, encoding: str):
+        if encoding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Set when the client revalidates a representation we compressed
+        revalidating_encoded = False
+        request_headers = MutableHeaders(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            decoded = _decoded_if_none_match(if_none_match, encoding)
+            revalidating_encoded = decoded != if_none_match
+            request_headers["If-None-Match"] = decoded
+
+        start_message = None
+        passthrough = False
+        encoder = None
+        buffered: List[bytes] = []
+        buffered_size = 0
+
+        async def send_start(compressed: bool):
+            if compressed:
+                headers = MutableHeaders(raw=start_message["headers"])
+                del headers["content-length"]
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            await send(start_message)
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough, encoder, buffered_size
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                passthrough = message["status"] in (204, 304) or not is_compressible(headers)
+                if message["status"] == 304 and revalidating_encoded and "etag" in headers:
+                    # Still fresh: the client's copy is the compressed one
+                    MutableHeaders(raw=message["headers"])["ETag"] = encoded_etag(headers["etag"], encoding)
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is not None:
+                data = encoder.chunk(body) if more_body else encoder.finish(body)
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            buffered.append(body)
+            buffered_size += len(body)
+            if buffered_size < self.minimum_size:
+                if more_body:
+                    return
+                # Small response: send it as it is
+                await send_start(compressed=False)
+                await send({"type": "http.response.body", "body": b"".join(buffered), "more_body": False})
+                return
+
+            encoder = self._encoder(encoding)
+            data = b"".join(buffered)
+            buffered.clear()
+            await send_start(compressed=True)
+            data = encoder.chunk(data) if more_body else encoder.finish(data)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
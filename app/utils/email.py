@@ -1,19 +1,20 @@
-import aiosmtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
 from app.config import settings
 
-async def send_registration_email(recipient_email: str, username: str, ticket_number: str, qr_code_path: str):
+async def send_registration_email(recipient_email: str, username: str, tickets: list):
     """
-    Send registration confirmation email with ticket QR code link
+    Send registration confirmation email with the QR code of each ticket
     
     Args:
         recipient_email: Recipient's email address
         username: User's name
-        ticket_number: Registration ticket number
-        qr_code_path: URL path to QR code image
+        tickets: (ticket number, QR code image path) pairs, one per seat
     """
+    # Imported on first use to keep them out of worker startup
+    import aiosmtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.image import MIMEImage
+    
     try:
         # Create email message
         message = MIMEMultipart("related")
@@ -21,6 +22,17 @@ async def send_registration_email(recipient_email: str, username: str, ticket_nu
         message["From"] = settings.EMAIL_FROM
         message["To"] = recipient_email
         
+        # One ticket number and QR code per seat
+        ticket_html = "".join(
+            f"""
+                <p><strong>Ticket Number:</strong> {ticket_number}</p>
+                <div style="margin-top: 20px;">
+                    <p><strong>Your Event Ticket (QR Code):</strong></p>
+                    <img src="cid:qrcode{index}" alt="Event Ticket QR Code" style="max-width: 200px;">
+                </div>"""
+            for index, (ticket_number, _) in enumerate(tickets)
+        )
+        
         # HTML content
         html_content = f"""
         <html>
@@ -28,12 +40,8 @@ async def send_registration_email(recipient_email: str, username: str, ticket_nu
                 <h2>Welcome to Event Management System!</h2>
                 <p>Hi {username},</p>
                 <p>Thank you for registering for the event. Your registration is confirmed.</p>
-                <p><strong>Ticket Number:</strong> {ticket_number}</p>
-                <div style="margin-top: 20px;">
-                    <p><strong>Your Event Ticket (QR Code):</strong></p>
-                    <img src="cid:qrcode" alt="Event Ticket QR Code" style="max-width: 200px;">
-                </div>
-                <p>Please present this QR code at the event venue.</p>
+                {ticket_html}
+                <p>Please present {"these QR codes" if len(tickets) > 1 else "this QR code"} at the event venue.</p>
                 <hr>
                 <p style="color: #666; font-size: 12px;">This is an automated email, please do not reply.</p>
             </body>
@@ -44,14 +52,16 @@ async def send_registration_email(recipient_email: str, username: str, ticket_nu
         part = MIMEText(html_content, "html")
         message.attach(part)
         
-        # Attach QR code image
-        if qr_code_path:
+        # Attach QR code images
+        for index, (_, qr_code_path) in enumerate(tickets):
+            if not qr_code_path:
+                continue
             try:
                 with open(qr_code_path, "rb") as f:
                     img_data = f.read()
-                image = MIMEImage(img_data, name="qrcode.png")
-                image.add_header("Content-ID", "<qrcode>")
-                image.add_header("Content-Disposition", "inline", filename="qrcode.png")
+                image = MIMEImage(img_data, name=f"qrcode{index}.png")
+                image.add_header("Content-ID", f"<qrcode{index}>")
+                image.add_header("Content-Disposition", "inline", filename=f"qrcode{index}.png")
                 message.attach(image)
             except FileNotFoundError:
                 import logging
@@ -84,6 +94,10 @@ async def send_event_created_email(admin_email: str, event_title: str, event_dat
         event_description: Description of the event
         event_venue: Venue of the event
     """
+    import aiosmtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
     try:
         message = MIMEMultipart("alternative")
         message["Subject"] = "Event Created Successfully"
@@ -123,3 +137,55 @@ async def send_event_created_email(admin_email: str, event_title: str, event_dat
         import logging
         logging.warning(f"Could not send event notification email (this is non-critical)")
         return False
+
+async def send_event_cancelled_emails(recipients: list, event_title: str, event_date: str):
+    """
+    Tell every attendee that an event was cancelled, over a single SMTP session
+    
+    Args:
+        recipients: List of (email, name) tuples
+        event_title: Title of the cancelled event
+        event_date: Date of the cancelled event
+    
+    Returns:
+        The number of emails sent
+    """
+    import logging
+    import aiosmtplib
+    from email.mime.text import MIMEText
+    
+    if not recipients:
+        return 0
+    
+    sent = 0
+    try:
+        async with aiosmtplib.SMTP(hostname=settings.SMTP_SERVER, port=settings.SMTP_PORT) as smtp:
+            await smtp.login(settings.EMAIL_FROM, settings.EMAIL_PASSWORD)
+            for recipient_email, username in recipients:
+                html_content = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif;">
+                <h2>Event Cancelled</h2>
+                <p>Hi {username},</p>
+                <p>We're sorry to let you know that <strong>{event_title}</strong> on {event_date} has been cancelled.</p>
+                <p>Your registration and ticket are no longer valid.</p>
+                <hr>
+                <p style="color: #666; font-size: 12px;">This is an automated email, please do not reply.</p>
+            </body>
+        </html>
+        """
+                message = MIMEText(html_content, "html")
+                message["Subject"] = f"Event Cancelled: {event_title}"
+                message["From"] = settings.EMAIL_FROM
+                message["To"] = recipient_email
+                try:
+                    await smtp.send_message(message)
+                    sent += 1
+                except aiosmtplib.SMTPRecipientsRefused:
+                    logging.warning(f"Cancellation email to {recipient_email} was refused")
+    except Exception as e:
+        # Notifications are best-effort; the event is already deleted
+        logging.warning(f"Could not send all event cancellation emails (this is non-critical)")
+    
+    logging.info(f"Sent {sent} of {len(recipients)} event cancellation email(s)")
+    return sent
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import tempfile
+import time
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import get_database
+from app.utils.background import pending_tasks
+from app.utils.metrics import DB_POOL_CHECKED_OUT
+
+
+async def _check_mongo() -> dict:
+    """Ping MongoDB, bounded by the readiness timeout"""
+    db = get_database()
+    if db is None:
+        return {"ok": False, "error": "not connected"}
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=settings.READINESS_DB_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"ping timed out after {settings.READINESS_DB_TIMEOUT_SECONDS}s"}
+    except Exception as e:
+        return {"ok": False, "error": type(e).__name__}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def _check_qr_storage() -> dict:
+    """Make sure QR codes can still be written to disk"""
+    start = time.perf_counter()
+    try:
+        os.makedirs(settings.QR_CODE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=settings.QR_CODE_DIR, prefix=".probe_"):
+            pass
+    except OSError as e:
+        return {"ok": False, "error": e.strerror or type(e).__name__}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def _check_pool() -> dict:
+    """
+    Connection pool saturation: checked-out connections over the pool size
+
+    MONGODB_MAX_POOL_SIZE applies to each server's pool, so saturation is
+    computed per address and the busiest server decides.
+    """
+    checked_out = {address: value for (address,), value in DB_POOL_CHECKED_OUT.snapshot().items()}
+    saturation = max(checked_out.values(), default=0) / settings.MONGODB_MAX_POOL_SIZE
+    return {
+        "ok": saturation < settings.READINESS_MAX_POOL_SATURATION,
+        "checked_out": {address: int(value) for address, value in checked_out.items()},
+        "max_pool_size": settings.MONGODB_MAX_POOL_SIZE,
+        "saturation": round(saturation, 3)
+    }
+
+
+def _check_email_backlog() -> dict:
+    """Running background tasks that send email (queued with kind="email")"""
+    backlog = pending_tasks("email")
+    return {
+        "ok": backlog < settings.READINESS_MAX_EMAIL_BACKLOG,
+        "pending": int(backlog),
+        "max_pending": settings.READINESS_MAX_EMAIL_BACKLOG
+    }
+
+
+class ReadinessProbe:
+    """Dependency checks whose result is cached briefly so frequent probes stay cheap"""
+
+    def __init__(self, cache_seconds: float):
+        self.cache_seconds = cache_seconds
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> dict:
+        if self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+            return self._result
+
+        # Concurrent probes wait for a single check instead of each pinging Mongo
+        async with self._lock:
+            if self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+                return self._result
+
+            checks = {
+                "mongodb": await _check_mongo(),
+                # Filesystem calls would block the event loop
+                "qr_storage": await run_in_threadpool(_check_qr_storage),
+                "connection_pool": _check_pool(),
+                "email_backlog": _check_email_backlog()
+            }
+            ready = all(check["ok"] for check in checks.values())
+            self._result = {"status": "ready" if ready else "unavailable", "checks": checks}
+            self._checked_at = time.monotonic()
+            return self._result
+
+
+readiness_probe = ReadinessProbe(settings.READINESS_CACHE_SECONDS)
@@ -0,0 +1,150 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from urllib.parse import parse_qsl, urlencode
+from fastapi import HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
+from app.config import settings
+from app.database import get_database
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class _ResponseCache:
+    """Small in-process LRU of completed responses, so hot retries skip Mongo entirely"""
+
+    def __init__(self, capacity: int, ttl_seconds: int):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, record = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return record
+
+    def put(self, key: str, record: dict):
+        self._entries[key] = (time.monotonic(), record)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+
+_cache = _ResponseCache(settings.IDEMPOTENCY_CACHE_SIZE, settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+
+
+async def _fingerprint(request: Request) -> str:
+    """
+    Hash of what the request asks for: its query parameters and body
+
+    Parameters such as tier and party_size travel in the query string, so a
+    retry changing them is a different request even with an empty body.
+    """
+    query = urlencode(sorted(parse_qsl(request.url.query, keep_blank_values=True)))
+    digest = hashlib.sha256(query.encode())
+    digest.update(b"\n")
+    digest.update(await request.body())
+    return digest.hexdigest()
+
+
+def _replay(record: dict, fingerprint: str) -> JSONResponse:
+    if record["fingerprint"] != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    return JSONResponse(
+        content=record["body"],
+        status_code=record["status_code"],
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+async def run_idempotent(request: Request, user_id: str, handler: Callable[[], Awaitable[dict]]):
+    """
+    Run a write endpoint at most once per Idempotency-Key
+
+    Keys are scoped to the user, method and path. A retry of a completed
+    request gets the stored response back without running the handler again;
+    a retry while the first attempt is still running gets 409, and a retry
+    with a different query string or body gets 422. If the handler fails, the
+    key is released so the client can retry.
+
+    Args:
+        request: The incoming request (the header, query string and body are read from it)
+        user_id: The authenticated user's ID
+        handler: Coroutine function producing the endpoint's response
+
+    Returns:
+        The handler's result, or the stored response for a replayed key
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return await handler()
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"
+        )
+
+    scoped_key = f"{user_id}:{request.method}:{request.url.path}:{key}"
+    fingerprint = await _fingerprint(request)
+
+    record = _cache.get(scoped_key)
+    if record is not None:
+        return _replay(record, fingerprint)
+
+    db = get_database()
+    collection = db["idempotency_keys"]
+    now = datetime.utcnow()
+    try:
+        await collection.insert_one({
+            "_id": scoped_key,
+            "status": "pending",
+            "fingerprint": fingerprint,
+            "created_at": now
+        })
+    except DuplicateKeyError:
+        existing = await collection.find_one({"_id": scoped_key})
+        if existing and existing["status"] == "done":
+            _cache.put(scoped_key, existing)
+            return _replay(existing, fingerprint)
+
+        # Take over a pending key whose worker died mid-request
+        stale_before = now - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+        taken_over = await collection.update_one(
+            {"_id": scoped_key, "status": "pending", "created_at": {"$lt": stale_before}},
+            {"$set": {"created_at": now, "fingerprint": fingerprint}}
+        )
+        if taken_over.modified_count == 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is already in progress"
+            )
+
+    try:
+        result = await handler()
+    except BaseException:
+        await collection.delete_one({"_id": scoped_key, "status": "pending"})
+        raise
+
+    record = {
+        "status": "done",
+        "fingerprint": fingerprint,
+        "status_code": status.HTTP_200_OK,
+        "body": jsonable_encoder(result)
+    }
+    await collection.update_one({"_id": scoped_key}, {"$set": record})
+    _cache.put(scoped_key, record)
+    return result
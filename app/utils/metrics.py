@@ -0,0 +1,360 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from pymongo import monitoring
+
+# Default latency buckets (seconds) shared by all histograms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prometheus text exposition format content type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class for a labelled metric. Values are keyed by label value tuples."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def _key(self, labels: Tuple[str, ...]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        """Copy of the current values keyed by label values"""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, labels: Tuple[str, ...] = ()):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, labels: Tuple[str, ...] = ()):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, labels: Tuple[str, ...] = ()):
+        self.inc(-amount, labels)
+
+    def set(self, value: float, labels: Tuple[str, ...] = ()):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, labels: Tuple[str, ...] = ()) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        """Sum of the gauge over all label values"""
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, labels: Tuple[str, ...] = ()):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [bucket counts..., sum, count]
+                series = [0] * len(self.buckets) + [0.0, 0]
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {count}"
+            inf = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{inf} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together at /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+# HTTP
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "Total HTTP requests", ("method", "route", "status")
+))
+HTTP_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+HTTP_DB_COMMANDS = registry.register(Counter(
+    "http_request_db_commands_total", "MongoDB commands issued while serving a route", ("method", "route")
+))
+HTTP_DB_COMMANDS_PER_REQUEST = registry.register(Histogram(
+    "http_request_db_commands", "MongoDB commands issued per request", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+))
+
+# MongoDB
+DB_COMMANDS = registry.register(Counter(
+    "mongodb_commands_total", "MongoDB commands by name and outcome", ("command", "outcome")
+))
+DB_LATENCY = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("command",)
+))
+
+DB_POOL_CHECKED_OUT = registry.register(Gauge(
+    "mongodb_pool_connections_checked_out", "Connections currently checked out of the pool", ("address",)
+))
+DB_POOL_OPEN = registry.register(Gauge(
+    "mongodb_pool_connections_open", "Open connections in the pool", ("address",)
+))
+
+# Background work
+BACKGROUND_TASKS = registry.register(Gauge(
+    "background_tasks_pending", "Background tasks running", ("task",)
+))
+BACKGROUND_TASK_LATENCY = registry.register(Histogram(
+    "background_task_duration_seconds", "Background task run time", ("task",)
+))
+
+# QR codes
+QR_RENDER_LATENCY = registry.register(Histogram(
+    "qr_render_duration_seconds", "Time spent rendering and saving a QR code"
+))
+
+# Registration group commit
+REGISTRATION_BATCH_SIZE = registry.register(Histogram(
+    "registration_batch_size", "Registrations written per group-commit batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+))
+
+# Single-flight reads
+SINGLE_FLIGHT_CALLS = registry.register(Counter(
+    "single_flight_calls_total", "Coalesced reads that ran a query or shared one already in flight",
+    ("group", "outcome")
+))
+SINGLE_FLIGHT_IN_FLIGHT = registry.register(Gauge(
+    "single_flight_in_flight", "Distinct reads currently in flight", ("group",)
+))
+
+
+class RequestStats:
+    """Per-request counters collected while a request is being served"""
+
+    __slots__ = ("db_commands", "db_time")
+
+    def __init__(self):
+        self.db_commands = 0
+        self.db_time = 0.0
+
+
+# Motor copies the context into its executor threads, so command listener
+# callbacks can see the stats object of the request that issued the command.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Get the stats object of the request being served, if any"""
+    return _request_stats.get()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """PyMongo command listener feeding the MongoDB metrics"""
+
+    def started(self, event):
+        pass
+
+    def _record(self, event, outcome: str):
+        seconds = event.duration_micros / 1_000_000
+        DB_COMMANDS.inc(labels=(event.command_name, outcome))
+        DB_LATENCY.observe(seconds, labels=(event.command_name,))
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_commands += 1
+            stats.db_time += seconds
+
+    def succeeded(self, event):
+        self._record(event, "success")
+
+    def failed(self, event):
+        self._record(event, "failure")
+
+
+mongo_listener = MongoCommandListener()
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """PyMongo pool listener tracking open and checked-out connections"""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        DB_POOL_OPEN.set(0, labels=(_address(event),))
+        DB_POOL_CHECKED_OUT.set(0, labels=(_address(event),))
+
+    def connection_created(self, event):
+        DB_POOL_OPEN.inc(labels=(_address(event),))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        DB_POOL_OPEN.dec(labels=(_address(event),))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        DB_POOL_CHECKED_OUT.inc(labels=(_address(event),))
+
+    def connection_checked_in(self, event):
+        DB_POOL_CHECKED_OUT.dec(labels=(_address(event),))
+
+
+pool_listener = MongoPoolListener()
+
+
+def _route_label(scope) -> str:
+    """Low-cardinality route label: the route template rather than the raw path"""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if scope.get("path", "").startswith("/static/"):
+        return "/static"
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and DB usage per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        recorded = False
+
+        def record():
+            # Background tasks run after the body is sent; they are not
+            # counted towards the request's latency or DB usage.
+            nonlocal recorded
+            recorded = True
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            method = scope["method"]
+            route = _route_label(scope)
+            HTTP_REQUESTS.inc(labels=(method, route, str(status_code)))
+            HTTP_LATENCY.observe(elapsed, labels=(method, route))
+            HTTP_DB_COMMANDS.inc(stats.db_commands, labels=(method, route))
+            HTTP_DB_COMMANDS_PER_REQUEST.observe(stats.db_commands, labels=(method, route))
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not recorded:
+                record()
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not recorded:
+                record()
+            _request_stats.reset(token)
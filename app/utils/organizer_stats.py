@@ -0,0 +1,226 @@
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.utils.archive import collection_for
+
+COLLECTION = "organizer_stats"
+
+# Rebuild attempts before giving up when increments keep landing meanwhile
+_REBUILD_ATTEMPTS = 5
+
+# Event ID -> organizer ID. created_by never changes, so entries stay valid
+# until the event is deleted.
+_organizers: OrderedDict = OrderedDict()
+_ORGANIZER_CACHE_SIZE = 10000
+
+
+async def _organizer_of(db, event_oid: ObjectId) -> Optional[ObjectId]:
+    organizer = _organizers.get(event_oid)
+    if organizer is None:
+        event = await db["events"].find_one({"_id": event_oid}, {"created_by": 1})
+        organizer = event.get("created_by") if event else None
+        if organizer is None:
+            return None
+        _organizers[event_oid] = organizer
+        while len(_organizers) > _ORGANIZER_CACHE_SIZE:
+            _organizers.popitem(last=False)
+    return organizer
+
+
+def _event_summary(event: dict, registrations: int = 0) -> dict:
+    return {
+        "title": event.get("title", ""),
+        "date": event.get("date", ""),
+        "total_seats": event.get("total_seats", 0),
+        "seats_booked": event.get("total_seats", 0) - event.get("available_seats", 0),
+        "registrations": registrations
+    }
+
+
+async def _compute_stats(db, organizer_oid: ObjectId) -> dict:
+    """An organizer's summary computed from their events and registrations"""
+    # Archived events still count towards the organizer's totals
+    events, registrations = [], {}
+    for archived in (False, True):
+        batch = await collection_for(db, "events", archived).find(
+            {"created_by": organizer_oid},
+            {"title": 1, "date": 1, "total_seats": 1, "available_seats": 1}
+        ).to_list(None)
+        counts = await collection_for(db, "registrations", archived).aggregate([
+            {"$match": {"event_id": {"$in": [e["_id"] for e in batch]}}},
+            {"$group": {"_id": "$event_id", "registrations": {"$sum": 1}}}
+        ]).to_list(None)
+        events += batch
+        registrations.update((c["_id"], c["registrations"]) for c in counts)
+
+    summaries = {str(e["_id"]): _event_summary(e, registrations.get(e["_id"], 0)) for e in events}
+    stats = {
+        "_id": organizer_oid,
+        "event_count": len(events),
+        "total_seats": sum(s["total_seats"] for s in summaries.values()),
+        "seats_booked": sum(s["seats_booked"] for s in summaries.values()),
+        "registrations": sum(s["registrations"] for s in summaries.values()),
+        "events": summaries,
+        "updated_at": datetime.utcnow()
+    }
+    return stats
+
+
+async def rebuild_organizer_stats(db, organizer_oid: ObjectId) -> dict:
+    """
+    Recompute an organizer's summary from their events and registrations,
+    archived ones included
+
+    Every increment bumps the summary's version. The new summary only
+    replaces the one whose version was read before counting, so an increment
+    that lands meanwhile makes the rebuild count again instead of being
+    overwritten. A missing summary is first created as a placeholder, so
+    increments have a document to land on while the counts are read.
+
+    Args:
+        db: Database instance
+        organizer_oid: The organizer's user ID
+
+    Returns:
+        The new summary document
+    """
+    for _ in range(_REBUILD_ATTEMPTS):
+        current = await db[COLLECTION].find_one({"_id": organizer_oid}, {"version": 1})
+        if current is None:
+            try:
+                await db[COLLECTION].insert_one({"_id": organizer_oid, "building": True, "version": 0})
+            except DuplicateKeyError:
+                continue
+            version = 0
+        else:
+            version = current.get("version", 0)
+
+        stats = await _compute_stats(db, organizer_oid)
+        stats["version"] = version + 1
+        result = await db[COLLECTION].replace_one({"_id": organizer_oid, "version": version}, stats)
+        if result.matched_count:
+            return stats
+
+    logging.warning(f"Organizer stats for {organizer_oid} kept changing during rebuild; left as they are")
+    return stats
+
+
+async def get_organizer_stats(db, organizer_oid: ObjectId) -> dict:
+    """Read an organizer's summary, building it first if it doesn't exist yet"""
+    stats = await db[COLLECTION].find_one({"_id": organizer_oid})
+    if stats is None or stats.get("building"):
+        stats = await rebuild_organizer_stats(db, organizer_oid)
+    return stats
+
+
+async def _apply(db, organizer_oid: ObjectId, update: dict):
+    """Apply an increment; a missing summary is left to be built on first read"""
+    update.setdefault("$set", {})["updated_at"] = datetime.utcnow()
+    update.setdefault("$inc", {})["version"] = 1
+    await db[COLLECTION].update_one({"_id": organizer_oid}, update)
+
+
+async def event_created(db, event: dict):
+    """Add a newly inserted event to its organizer's summary"""
+    organizer_oid = event.get("created_by")
+    if organizer_oid is None:
+        return
+    summary = _event_summary(event)
+    result = await db[COLLECTION].update_one(
+        {"_id": organizer_oid},
+        {
+            "$inc": {
+                "event_count": 1,
+                "total_seats": summary["total_seats"],
+                "seats_booked": summary["seats_booked"],
+                "version": 1
+            },
+            "$set": {f"events.{event['_id']}": summary, "updated_at": datetime.utcnow()}
+        }
+    )
+    if result.matched_count == 0:
+        # First event, or the summary was never built: build it from scratch
+        await rebuild_organizer_stats(db, organizer_oid)
+
+
+async def event_updated(db, before: dict, changes: dict):
+    """
+    Apply an event update to its organizer's summary
+
+    Args:
+        db: Database instance
+        before: The event document before the update
+        changes: The fields that were set
+    """
+    organizer_oid = before.get("created_by")
+    if organizer_oid is None:
+        return
+    after = {**before, **changes}
+    old, new = _event_summary(before), _event_summary(after)
+    prefix = f"events.{before['_id']}"
+    await _apply(db, organizer_oid, {
+        "$inc": {
+            "total_seats": new["total_seats"] - old["total_seats"],
+            "seats_booked": new["seats_booked"] - old["seats_booked"],
+            f"{prefix}.total_seats": new["total_seats"] - old["total_seats"],
+            f"{prefix}.seats_booked": new["seats_booked"] - old["seats_booked"]
+        },
+        "$set": {f"{prefix}.title": new["title"], f"{prefix}.date": new["date"]}
+    })
+
+
+async def event_deleted(db, event: dict, registrations_deleted: int):
+    """Remove a deleted event and its registrations from its organizer's summary"""
+    _organizers.pop(event["_id"], None)
+    organizer_oid = event.get("created_by")
+    if organizer_oid is None:
+        return
+    summary = _event_summary(event)
+    await _apply(db, organizer_oid, {
+        "$inc": {
+            "event_count": -1,
+            "total_seats": -summary["total_seats"],
+            "seats_booked": -summary["seats_booked"],
+            "registrations": -registrations_deleted
+        },
+        "$unset": {f"events.{event['_id']}": ""}
+    })
+
+
+async def seats_booked(db, event_oid: ObjectId, delta: int, organizer_oid: Optional[ObjectId] = None):
+    """Record seats taken off sale (positive) or put back on sale (negative)"""
+    organizer_oid = organizer_oid or await _organizer_of(db, event_oid)
+    if organizer_oid is None:
+        return
+    await _apply(db, organizer_oid, {
+        "$inc": {"seats_booked": delta, f"events.{event_oid}.seats_booked": delta}
+    })
+
+
+async def registrations_changed(db, event_oid: ObjectId, delta: int):
+    """Record registrations created (positive) or cancelled (negative)"""
+    organizer_oid = await _organizer_of(db, event_oid)
+    if organizer_oid is None:
+        return
+    await _apply(db, organizer_oid, {
+        "$inc": {"registrations": delta, f"events.{event_oid}.registrations": delta}
+    })
+
+
+async def reconcile_all(db) -> int:
+    """
+    Rebuild every organizer's summary from scratch
+
+    Returns:
+        The number of summaries rebuilt
+    """
+    organizers = set(await db["events"].distinct("created_by"))
+    organizers.update(await collection_for(db, "events", archived=True).distinct("created_by"))
+    organizers.update(await db[COLLECTION].distinct("_id"))
+    for organizer_oid in organizers:
+        if organizer_oid is not None:
+            await rebuild_organizer_stats(db, organizer_oid)
+    return len(organizers)
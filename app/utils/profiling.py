@@ -0,0 +1,327 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+from pymongo import monitoring
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+
+# Time categories reported for a profiled request, in Server-Timing order
+CATEGORIES = ("mongo", "bcrypt", "qr", "serialization")
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "_profile"
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Innermost frames of a thread with nothing to do; such samples are dropped
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+_MAX_STACK_DEPTH = 128
+
+
+class RequestProfile:
+    """Time spent per category while serving one profiled request"""
+
+    __slots__ = ("timings", "counts")
+
+    def __init__(self):
+        self.timings: Dict[str, float] = dict.fromkeys(CATEGORIES, 0.0)
+        self.counts: Dict[str, int] = dict.fromkeys(CATEGORIES, 0)
+
+    def add(self, category: str, seconds: float):
+        self.timings[category] = self.timings.get(category, 0.0) + seconds
+        self.counts[category] = self.counts.get(category, 0) + 1
+
+
+# Copied into threadpool and Motor executor threads along with the rest of
+# the context, so work done there on behalf of the request is attributed to it
+_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    """Get the profile of the request being served, if it is being profiled"""
+    return _profile.get()
+
+
+@contextmanager
+def timed(category: str):
+    """Add the time spent in the block to the current profile, if any"""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(category, time.perf_counter() - start)
+
+
+class ProfileCommandListener(monitoring.CommandListener):
+    """
+    PyMongo command listener adding each command's time to the current profile
+
+    Installed whenever profiling is enabled, independently of the metrics
+    listener, so profiles report Mongo time with METRICS_ENABLED off too.
+    """
+
+    def started(self, event):
+        pass
+
+    def _record(self, event):
+        profile = _profile.get()
+        if profile is not None:
+            profile.add("mongo", event.duration_micros / 1_000_000)
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+
+profile_listener = ProfileCommandListener()
+
+
+class ProfiledJSONResponse(JSONResponse):
+    """JSONResponse whose encoding is reported as serialization time"""
+
+    def render(self, content) -> bytes:
+        if _profile.get() is None:
+            return super().render(content)
+        with timed("serialization"):
+            return super().render(content)
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    marker = filename.rfind("site-packages" + os.sep)
+    if marker != -1:
+        filename = filename[marker + len("site-packages") + 1:]
+    else:
+        marker = filename.rfind(os.sep + "app" + os.sep)
+        filename = filename[marker + 1:] if marker != -1 else os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _fold(frame) -> Optional[str]:
+    """Stack of a frame as "outer;...;inner", or None when the thread is idle"""
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+        return None
+    labels = []
+    while frame is not None and len(labels) < _MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of every thread at a fixed interval
+
+    Stacks are counted in folded form ("thread;outer;...;inner"), which
+    flamegraph.pl, speedscope and similar tools read directly.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = _fold(frame)
+                if stack is None:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self.stacks[f"{names.get(ident, ident)};{stack}"] += 1
+
+
+def server_timing(profile: RequestProfile, total: float) -> str:
+    """Server-Timing header value for a profile"""
+    parts = []
+    for category in CATEGORIES:
+        if profile.counts[category]:
+            parts.append(f'{category};dur={profile.timings[category] * 1000:.2f};desc="{profile.counts[category]} calls"')
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER.encode() and value not in (b"", b"0"):
+            return True
+    query = scope.get("query_string", b"").decode("latin-1")
+    for name, value in parse_qsl(query):
+        if name == PROFILE_QUERY_PARAM and value not in ("", "0"):
+            return True
+    return False
+
+
+def _is_admin(scope) -> bool:
+    # Imported here: app.utils.auth reports bcrypt time through this module
+    from app.utils.auth import decode_token
+    token = HTTPConnection(scope).cookies.get("access_token")
+    payload = decode_token(token) if token else None
+    return bool(payload and payload.get("is_admin"))
+
+
+def list_profiles(profile_dir: str, limit: int = 50) -> List[dict]:
+    """Summaries of the stored profiles, newest first"""
+    try:
+        names = [n for n in os.listdir(profile_dir) if n.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    paths = sorted((os.path.join(profile_dir, n) for n in names), key=os.path.getmtime, reverse=True)
+    summaries = []
+    for path in paths[:limit]:
+        with open(path) as f:
+            summaries.append(json.load(f))
+    return summaries
+
+
+def profile_path(profile_dir: str, profile_id: str, suffix: str) -> Optional[str]:
+    """Path of a stored profile file, or None when the id is malformed"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    return os.path.join(profile_dir, f"{profile_id}{suffix}")
+
+
+def _prune(profile_dir: str, keep: int):
+    paths = [os.path.join(profile_dir, n) for n in os.listdir(profile_dir) if n.endswith(".json")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        for suffix in (".json", ".folded"):
+            try:
+                os.remove(path[:-len(".json")] + suffix)
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests on demand
+
+    An admin sends `X-Profile: 1` or `?_profile=1`; a sample_rate fraction of
+    those requests runs under a stack sampler and the category timers. The
+    response carries Server-Timing and X-Profile-Id headers, and the summary
+    and folded stacks are stored in profile_dir. Other requests only pay for
+    the header check. One request is profiled at a time per worker, since
+    the sampler sees every thread in the process.
+    """
+
+    def __init__(self, app, profile_dir: str, sample_rate: float = 1.0,
+                 interval: float = 0.001, max_stored: int = 100):
+        self.app = app
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_stored = max_stored
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        if not _is_admin(scope) or random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, scope, receive, send):
+        profile_id = uuid.uuid4().hex
+        profile = RequestProfile()
+        sampler = StackSampler(self.interval)
+        status_code = 500
+        token = _profile.set(profile)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(profile, time.perf_counter() - start))
+                headers.append("X-Profile-Id", profile_id)
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            total = time.perf_counter() - start
+            _profile.reset(token)
+            # Joining the sampler and writing the files block, so neither runs on the event loop
+            await run_in_threadpool(self._finish, profile_id, scope, status_code, total, profile, sampler)
+
+    def _finish(self, profile_id: str, scope, status_code: int, total: float,
+                profile: RequestProfile, sampler: StackSampler):
+        sampler.stop()
+        self._store(profile_id, scope, status_code, total, profile, sampler)
+
+    def _store(self, profile_id: str, scope, status_code: int, total: float,
+               profile: RequestProfile, sampler: StackSampler):
+        route = scope.get("route")
+        accounted = sum(profile.timings.values())
+        summary = {
+            "id": profile_id,
+            "created_at": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "status": status_code,
+            "total_ms": round(total * 1000, 3),
+            "categories": {
+                category: {"ms": round(profile.timings[category] * 1000, 3), "count": profile.counts[category]}
+                for category in CATEGORIES
+            },
+            # Mongo time is measured by the driver per command and overlaps with
+            # other work when commands run concurrently, so this can go negative
+            "other_ms": round((total - accounted) * 1000, 3),
+            "samples": sampler.samples,
+            "interval_ms": self.interval * 1000,
+        }
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with open(os.path.join(self.profile_dir, f"{profile_id}.folded"), "w") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.profile_dir, f"{profile_id}.json"), "w") as f:
+            json.dump(summary, f)
+        _prune(self.profile_dir, self.max_stored)
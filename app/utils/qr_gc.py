@@ -0,0 +1,156 @@
+import os
+import re
+import time
+from typing import Dict, Iterator, List, Tuple
+from pymongo import UpdateOne
+from app.config import settings
+from app.utils.archive import collection_for
+from app.utils.qrcode_gen import qr_file_path, qr_web_path
+from app.utils.tickets import registration_tickets
+
+QR_FILE_PATTERN = re.compile(r"^(REG_[0-9A-Za-z]+)\.png$")
+
+
+def _scan_qr_files(root: str, min_age_seconds: float) -> Iterator[Tuple[str, str, int]]:
+    """
+    Walk the QR code directory, both the sharded layout and legacy flat files
+
+    Files modified within min_age_seconds are skipped so images for
+    registrations still being written are never touched.
+
+    Yields:
+        Tuples of (file path, ticket number, size in bytes)
+    """
+    cutoff = time.time() - min_age_seconds
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            match = QR_FILE_PATTERN.match(filename)
+            if not match:
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            yield path, match.group(1), stat.st_size
+
+
+def _batches(items: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _live_tickets(db, ticket_numbers: List[str]) -> Dict[str, bool]:
+    """
+    Ticket numbers whose registration and event both still exist, live or archived
+
+    An archive run moves an event before its registrations, so a registration
+    may be in either collection while its event is in the other.
+
+    Returns:
+        Each live ticket number mapped to whether its registration is archived
+    """
+    # Party registrations list all their tickets in ticket_numbers
+    query = {"$or": [{"ticket_number": {"$in": ticket_numbers}}, {"ticket_numbers": {"$in": ticket_numbers}}]}
+    projection = {"ticket_number": 1, "ticket_numbers": 1, "event_id": 1}
+    registrations = []
+    for archived in (False, True):
+        found = await collection_for(db, "registrations", archived).find(query, projection).to_list(None)
+        registrations.extend((r, archived) for r in found)
+
+    event_ids = list({r["event_id"] for r, _ in registrations})
+    existing_events = set()
+    for archived in (False, True):
+        events = await collection_for(db, "events", archived).find({"_id": {"$in": event_ids}}, {"_id": 1}).to_list(None)
+        existing_events.update(e["_id"] for e in events)
+    return {
+        t: archived
+        for r, archived in registrations if r["event_id"] in existing_events
+        for t in registration_tickets(r)
+    }
+
+
+def _remove_empty_dirs(path: str, root: str):
+    """Remove now-empty shard directories above a deleted file"""
+    directory = os.path.dirname(path)
+    while os.path.abspath(directory) != os.path.abspath(root):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+async def collect_qr_garbage(db, dry_run: bool = True, batch_size: int = 1000,
+                             min_age_seconds: float = 3600, sample_size: int = 20) -> dict:
+    """
+    Remove QR code images whose registration or event no longer exists
+
+    Files are checked against Mongo one batch at a time; tickets of archived
+    events are live. Images of live tickets that are not at their sharded
+    location (the old flat layout) are moved there and the registration's
+    ticket_qr_path is updated.
+
+    Args:
+        db: Database instance
+        dry_run: Only report what would be deleted or moved
+        batch_size: Number of files checked per query
+        min_age_seconds: Skip files newer than this
+        sample_size: Number of orphaned paths listed in the report
+
+    Returns:
+        Report with scanned/orphaned/relocated counts, reclaimable bytes and sample paths
+    """
+    root = settings.QR_CODE_DIR
+    report = {
+        "dry_run": dry_run,
+        "scanned": 0,
+        "orphaned": 0,
+        "orphaned_bytes": 0,
+        "relocated": 0,
+        "sample": []
+    }
+
+    for batch in _batches(_scan_qr_files(root, min_age_seconds), batch_size):
+        report["scanned"] += len(batch)
+        live = await _live_tickets(db, list({ticket for _, ticket, _ in batch}))
+        relocations = {False: [], True: []}
+
+        for path, ticket_number, size in batch:
+            if ticket_number not in live:
+                report["orphaned"] += 1
+                report["orphaned_bytes"] += size
+                if len(report["sample"]) < sample_size:
+                    report["sample"].append(os.path.relpath(path, root))
+                if not dry_run:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    _remove_empty_dirs(path, root)
+                continue
+
+            target = qr_file_path(ticket_number)
+            if os.path.abspath(path) != os.path.abspath(target):
+                report["relocated"] += 1
+                if not dry_run:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(path, target)
+                    relocations[live[ticket_number]].append(UpdateOne(
+                        {"ticket_number": ticket_number},
+                        {"$set": {"ticket_qr_path": qr_web_path(ticket_number)}}
+                    ))
+
+        for archived, updates in relocations.items():
+            if updates:
+                await collection_for(db, "registrations", archived).bulk_write(updates, ordered=False)
+
+    return report
@@ -1,25 +1,44 @@
-import qrcode
+import hashlib
+import time
+import os
 from io import BytesIO
 from pathlib import Path
 from typing import Optional
 from app.config import settings
+from app.utils.metrics import QR_RENDER_LATENCY
+from app.utils.profiling import timed
 
-def generate_qr_code(data: str, filename: str) -> str:
+def qr_shard(ticket_number: str) -> str:
     """
-    Generate a QR code and save it as PNG
-    
-    Args:
-        data: The data to encode in QR code
-        filename: The filename to save as (without extension)
+    Two-level directory for a ticket's QR code, e.g. "ab/cd"
     
-    Returns:
-        The relative path to the saved QR code
+    Hashing the ticket number spreads images evenly over 65536 directories,
+    so no single directory grows large enough to slow down lookups or backups.
     """
-    # Ensure QR code directory exists
-    qr_dir = Path(settings.QR_CODE_DIR)
-    qr_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.md5(ticket_number.encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+def qr_web_path(ticket_number: str) -> str:
+    """URL path of a ticket's QR code image"""
+    return f"/static/qrcodes/{qr_shard(ticket_number)}/{ticket_number}.png"
+
+def qr_file_path(ticket_number: str) -> str:
+    """Absolute path of a ticket's QR code image on disk"""
+    return os.path.join(settings.QR_CODE_DIR, *qr_shard(ticket_number).split("/"), f"{ticket_number}.png")
+
+def delete_qr_codes(ticket_numbers: list):
+    """Remove QR code images from disk, ignoring ones that are already gone"""
+    for ticket_number in ticket_numbers:
+        try:
+            os.remove(qr_file_path(ticket_number))
+        except FileNotFoundError:
+            pass
+
+def _make_qr_image(data: str):
+    """Build the ticket QR code as a 1-bit PIL image"""
+    # qrcode pulls in PIL; import it on first use rather than at worker startup
+    import qrcode
     
-    # Generate QR code
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -28,16 +47,76 @@ def generate_qr_code(data: str, filename: str) -> str:
     )
     qr.add_data(data)
     qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").get_image()
+
+def render_qr_png(data: str) -> bytes:
+    """
+    Render a QR code to PNG bytes without touching disk
+    
+    Args:
+        data: The data to encode in QR code
+    
+    Returns:
+        The PNG file contents
+    """
+    buffer = BytesIO()
+    _make_qr_image(data).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def render_qr_bitmap(data: str) -> tuple:
+    """
+    Render a QR code as packed 1-bit rows (1 = white), e.g. for embedding in a PDF
+    
+    Args:
+        data: The data to encode in QR code
+    
+    Returns:
+        Tuple of (width, height, pixel bytes)
+    """
+    img = _make_qr_image(data)
+    width, height = img.size
+    return width, height, img.tobytes()
+
+def save_qr_png(png: bytes, ticket_number: str) -> str:
+    """
+    Write an already rendered QR code PNG to the ticket's location
+    
+    Returns:
+        The relative path to the saved QR code
+    """
+    file_path = qr_file_path(ticket_number)
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write(png)
+    return qr_web_path(ticket_number)
+
+def generate_qr_code(data: str, filename: str) -> str:
+    """
+    Generate a QR code and save it as PNG
+    
+    Args:
+        data: The data to encode in QR code
+        filename: The filename to save as (without extension)
+    
+    Returns:
+        The relative path to the saved QR code
+    """
+    # Ensure the ticket's shard directory exists
+    file_path = qr_file_path(filename)
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
     
-    # Create image
-    img = qr.make_image(fill_color="black", back_color="white")
+    start = time.perf_counter()
     
-    # Save image
-    file_path = qr_dir / f"{filename}.png"
-    img.save(str(file_path))
+    with timed("qr"):
+        # Generate QR code
+        img = _make_qr_image(data)
+        
+        # Save image
+        img.save(file_path)
+    QR_RENDER_LATENCY.observe(time.perf_counter() - start)
     
     # Return relative path for web access
-    return f"/static/qrcodes/{filename}.png"
+    return qr_web_path(filename)
 
 def get_qr_code_data(registration_id: str, user_email: str, event_id: str) -> str:
     """
@@ -0,0 +1,370 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional
+from bson import ObjectId
+from pymongo import monitoring
+
+# Representative shape of every query the app issues, keyed by where it is
+# issued. Values only need the right type; the planner picks indexes by shape.
+# allow_collscan marks queries that read the whole collection on purpose.
+_OID = ObjectId("000000000000000000000000")
+_NOW = datetime(2030, 1, 1)
+
+QUERY_PATTERNS = [
+    # Users
+    {"name": "auth.login", "collection": "users", "filter": {"email": "user@example.com"}},
+    {"name": "auth.me", "collection": "users", "filter": {"_id": _OID}},
+    {"name": "admin_creation.admin_count", "collection": "users", "op": "count", "filter": {"is_admin": True}},
+    {"name": "admin.users_page", "collection": "users", "filter": {"_id": {"$lt": _OID}}, "sort": {"_id": -1}},
+    {"name": "admin.users_search", "collection": "users", "filter": {"name_lower": {"$regex": "^ali"}},
+     "sort": {"name_lower": 1, "_id": 1}},
+    {"name": "user_directory.backfill", "collection": "users", "filter": {"name_lower": None}},
+    {"name": "ticket_export.attendee_emails", "collection": "users", "filter": {"_id": {"$in": [_OID]}}},
+
+    # Events
+    {"name": "events.upcoming", "collection": "events", "filter": {"starts_at": {"$gte": _NOW}},
+     "sort": {"starts_at": 1}},
+    {"name": "events.past", "collection": "events", "filter": {"starts_at": {"$lt": _NOW}}, "sort": {"starts_at": -1}},
+    {"name": "events.undated", "collection": "events", "filter": {"starts_at": None}},
+    {"name": "events.by_organizer", "collection": "events", "filter": {"created_by": _OID}},
+    {"name": "seats.reserve", "collection": "events", "filter": {"_id": _OID, "available_seats": {"$gte": 1}}},
+    {"name": "seats.reserve_tier", "collection": "events",
+     "filter": {"_id": _OID, "tiers": {"$elemMatch": {"name": "VIP", "available_seats": {"$gte": 1}}}}},
+
+    # Registrations
+    {"name": "registrations.mine", "collection": "registrations", "filter": {"user_id": _OID}},
+    {"name": "registrations.duplicate_check", "collection": "registrations",
+     "filter": {"user_id": _OID, "event_id": _OID}},
+    {"name": "registrations.by_event", "collection": "registrations", "filter": {"event_id": _OID}},
+    {"name": "ticket_export.tickets", "collection": "registrations", "filter": {"event_id": _OID},
+     "sort": {"_id": 1}},
+    {"name": "qr_gc.live_tickets", "collection": "registrations", "filter": {"$or": [
+        {"ticket_number": {"$in": ["REG_0"]}}, {"ticket_numbers": {"$in": ["REG_0"]}}
+    ]}},
+    {"name": "registrations.cancel", "collection": "registrations", "filter": {"_id": _OID, "user_id": _OID}},
+    {"name": "analytics.buckets", "collection": "registrations", "op": "aggregate", "pipeline": [
+        {"$match": {"event_id": {"$in": [_OID]}, "registration_date": {"$gte": _NOW}}},
+        {"$group": {"_id": "$event_id", "count": {"$sum": 1}}},
+    ]},
+    {"name": "organizer_stats.counts", "collection": "registrations", "op": "aggregate", "pipeline": [
+        {"$match": {"event_id": {"$in": [_OID]}}},
+        {"$group": {"_id": "$event_id", "registrations": {"$sum": 1}}},
+    ]},
+    {"name": "admin.all_registrations", "collection": "registrations", "filter": {}, "allow_collscan": True},
+
+    # Archive
+    {"name": "archive.events", "collection": "events_archive", "filter": {"starts_at": {"$lt": _NOW}},
+     "sort": {"starts_at": -1}},
+    {"name": "archive.by_organizer", "collection": "events_archive", "filter": {"created_by": _OID}},
+    {"name": "archive.unfinished", "collection": "events_archive", "filter": {"registrations_moved": False}},
+    {"name": "archive.registrations_mine", "collection": "registrations_archive", "filter": {"user_id": _OID}},
+    {"name": "archive.registrations_by_event", "collection": "registrations_archive",
+     "filter": {"event_id": _OID}},
+    {"name": "archive.qr_gc_live_tickets", "collection": "registrations_archive", "filter": {"$or": [
+        {"ticket_number": {"$in": ["REG_0"]}}, {"ticket_numbers": {"$in": ["REG_0"]}}
+    ]}},
+    {"name": "archive.move_registrations", "collection": "registrations", "filter": {"event_id": {"$in": [_OID]}},
+     "sort": {"_id": 1}},
+
+    # Waitlist
+    {"name": "waitlist.next", "collection": "waitlist", "filter": {"event_id": _OID}, "sort": {"position": 1}},
+    {"name": "waitlist.entry", "collection": "waitlist", "filter": {"event_id": _OID, "user_id": _OID}},
+    {"name": "waitlist.ahead", "collection": "waitlist", "op": "count",
+     "filter": {"event_id": _OID, "position": {"$lt": 10}}},
+
+    # Seat holds
+    {"name": "holds.confirm", "collection": "seat_holds",
+     "filter": {"_id": _OID, "user_id": _OID, "released": False, "expires_at": {"$gt": _NOW}}},
+    {"name": "holds.sweep", "collection": "seat_holds", "filter": {"released": False, "expires_at": {"$lte": _NOW}}},
+    {"name": "holds.active", "collection": "seat_holds",
+     "filter": {"user_id": _OID, "event_id": _OID, "released": False}},
+
+    # Summaries and idempotency keys
+    {"name": "organizer_stats.summary", "collection": "organizer_stats", "filter": {"_id": _OID}},
+    {"name": "idempotency.lookup", "collection": "idempotency_keys", "filter": {"_id": "user:key"}},
+]
+
+# Operators that make a field a range (or scan) rather than an equality match
+_RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$regex", "$exists", "$not"}
+
+
+def _explain_command(pattern: dict) -> dict:
+    op = pattern.get("op", "find")
+    collection = pattern["collection"]
+    if op == "aggregate":
+        return {"aggregate": collection, "pipeline": pattern["pipeline"], "cursor": {}}
+    if op == "count":
+        return {"count": collection, "query": pattern.get("filter", {})}
+    command = {"find": collection, "filter": pattern.get("filter", {})}
+    if pattern.get("sort"):
+        command["sort"] = pattern["sort"]
+    return command
+
+
+def _find_key(document, key: str):
+    """First value stored under key anywhere in a nested explain document"""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        values = document.values()
+    elif isinstance(document, list):
+        values = document
+    else:
+        return None
+    for value in values:
+        found = _find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_stages(plan) -> List[dict]:
+    """Every stage of a plan tree, innermost last"""
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, dict):
+            if "stage" in node:
+                stages.append(node)
+            for key in ("inputStage", "inputStages", "queryPlan", "shards"):
+                if key in node:
+                    pending.append(node[key])
+    return stages
+
+
+def summarize_plan(explain: dict) -> dict:
+    """
+    The parts of an explain result that matter for index use
+
+    Returns:
+        Dict with stages (outermost first), indexes used, collscan and
+        in_memory_sort flags, and docs/keys examined and returned when the
+        explain ran with executionStats
+    """
+    winning = _find_key(explain, "winningPlan") or {}
+    stages = _plan_stages(winning)
+    names = [s["stage"] for s in stages]
+    stats = _find_key(explain, "executionStats") or {}
+    return {
+        "stages": names,
+        "indexes": [s["indexName"] for s in stages if s.get("indexName")],
+        "collscan": "COLLSCAN" in names,
+        "in_memory_sort": "SORT" in names,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+    }
+
+
+def describe_plan(summary: dict) -> str:
+    """e.g. "IXSCAN(event_id_1) -> FETCH", innermost stage first"""
+    indexes = iter(reversed(summary["indexes"]))
+    parts = []
+    for stage in reversed(summary["stages"]):
+        if stage in ("IXSCAN", "DISTINCT_SCAN", "COUNT_SCAN"):
+            stage = f"{stage}({next(indexes, '?')})"
+        parts.append(stage)
+    description = " -> ".join(parts) or "?"
+    if summary["docs_examined"] is not None:
+        description += f"  examined {summary['docs_examined']} docs/{summary['keys_examined']} keys" \
+                       f" for {summary['returned']}"
+    return description
+
+
+def suggest_index(pattern: dict) -> List[tuple]:
+    """
+    Index for a pattern following the equality, sort, range rule
+
+    Returns:
+        Index keys as (field, direction) pairs, empty when _id already covers it
+    """
+    query = pattern.get("filter")
+    if query is None:
+        query = next((s["$match"] for s in pattern.get("pipeline", []) if "$match" in s), {})
+    if "_id" in query and not isinstance(query["_id"], dict):
+        return []
+    equality, ranges = [], []
+    for field, condition in query.items():
+        if field.startswith("$"):
+            continue
+        if isinstance(condition, dict) and _RANGE_OPERATORS & set(condition):
+            ranges.append((field, 1))
+        else:
+            equality.append((field, 1))
+    sort = [(field, direction) for field, direction in (pattern.get("sort") or {}).items()]
+    keys = []
+    for field, direction in equality + sort + ranges:
+        if field not in [k for k, _ in keys]:
+            keys.append((field, direction))
+    if [field for field, _ in keys] == ["_id"]:
+        return []
+    return keys
+
+
+async def check_query_plans(db, patterns: List[dict] = QUERY_PATTERNS) -> List[dict]:
+    """
+    Explain every query pattern against db
+
+    Returns:
+        One result per pattern: name, collection, plan summary, problem
+        ("COLLSCAN", "in-memory SORT" or None), failed (a COLLSCAN that isn't
+        allowed) and suggested_index for patterns with a problem
+    """
+    results = []
+    for pattern in patterns:
+        explain = await db.command({"explain": _explain_command(pattern), "verbosity": "executionStats"})
+        summary = summarize_plan(explain)
+        problem = None
+        if summary["collscan"]:
+            problem = "COLLSCAN"
+        elif summary["in_memory_sort"]:
+            problem = "in-memory SORT"
+        results.append({
+            "name": pattern["name"],
+            "collection": pattern["collection"],
+            "plan": summary,
+            "problem": problem,
+            "failed": summary["collscan"] and not pattern.get("allow_collscan", False),
+            "suggested_index": suggest_index(pattern) if problem and not pattern.get("allow_collscan") else [],
+        })
+    return results
+
+
+async def unused_indexes(db, collections: List[str]) -> List[dict]:
+    """Indexes with no recorded use since the server started ($indexStats), except _id"""
+    unused = []
+    for collection in collections:
+        stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+        for index in stats:
+            if index["name"] != "_id_" and index["accesses"]["ops"] == 0:
+                unused.append({
+                    "collection": collection,
+                    "name": index["name"],
+                    "since": index["accesses"]["since"],
+                })
+    return unused
+
+
+async def seed_plan_dataset(db, size: int):
+    """
+    Fill an empty database with `size` users and registrations and size // 10
+    events, shaped like production data, so plans are chosen as they would be
+    on a real dataset
+    """
+    now = datetime.utcnow()
+    events_count = max(size // 10, 1)
+    users = [
+        {"_id": ObjectId(), "name": f"User {i}", "email": f"user{i}@example.com",
+         "name_lower": f"user {i}", "email_lower": f"user{i}@example.com",
+         "password_hash": "x", "is_admin": i % 100 == 0, "created_at": now}
+        for i in range(size)
+    ]
+    await db["users"].insert_many(users)
+    organizers = [u["_id"] for u in users if u["is_admin"]]
+    events = [
+        {"_id": ObjectId(), "title": f"Event {i}", "date": "2030-01-01", "time": "10:00",
+         "starts_at": now + timedelta(days=i - events_count // 2), "timezone": "UTC",
+         "venue": "Hall", "total_seats": 100, "available_seats": 50,
+         "created_by": organizers[i % len(organizers)], "created_at": now}
+        for i in range(events_count)
+    ]
+    await db["events"].insert_many(events)
+    await db["registrations"].insert_many([
+        {"user_id": users[i]["_id"], "event_id": events[i % events_count]["_id"],
+         "ticket_number": f"REG_{i:08X}", "ticket_qr_path": "", "registration_date": now - timedelta(minutes=i)}
+        for i in range(size)
+    ])
+    await db["waitlist"].insert_many([
+        {"event_id": events[i % events_count]["_id"], "user_id": users[i]["_id"], "position": i,
+         "user_email": users[i]["email"], "user_name": users[i]["name"], "joined_at": now}
+        for i in range(size // 10)
+    ])
+    await db["seat_holds"].insert_many([
+        {"user_id": users[i]["_id"], "event_id": events[i % events_count]["_id"], "released": i % 2 == 0,
+         "expires_at": now + timedelta(minutes=i % 20 - 10), "purge_at": now + timedelta(days=1)}
+        for i in range(size // 10)
+    ])
+
+
+# Commands whose filter is worth logging; the value is the key holding it
+_TRACKED_COMMANDS = {"find": "filter", "count": "query", "distinct": "query",
+                     "findAndModify": "query", "aggregate": "pipeline"}
+# Driver bookkeeping stripped before re-running a command under explain
+_SESSION_KEYS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+
+
+def query_shape(value):
+    """A filter with its values replaced by "?", safe to log"""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(v) for v in value[:1]]
+    return "?"
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """
+    PyMongo command listener logging slow queries with their plans
+
+    Queries taking at least threshold_ms are logged with their shape (values
+    stripped). The first time a shape is slow, and again at most once per
+    explain_interval seconds, the command is re-run under explain in a
+    background thread and its plan is logged too.
+    """
+
+    def __init__(self, threshold_ms: float, explain_interval: float = 300):
+        self.threshold = threshold_ms / 1000
+        self.explain_interval = explain_interval
+        # Sync pymongo client used for explains, set by connect_to_mongo
+        self.client = None
+        self._pending = {}
+        self._explained = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in _TRACKED_COMMANDS:
+            self._pending[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def _finished(self, event):
+        entry = self._pending.pop((event.connection_id, event.request_id), None)
+        if entry is None or event.duration_micros < self.threshold * 1_000_000:
+            return
+        database_name, command = entry
+        name = event.command_name
+        shape = json.dumps(query_shape(command.get(_TRACKED_COMMANDS[name])), sort_keys=True, default=str)
+        collection = command.get(name)
+        logging.warning(f"Slow query ({event.duration_micros / 1000:.1f} ms): "
+                        f"{name} {database_name}.{collection} {shape}")
+
+        key = (name, database_name, collection, shape)
+        now = time.monotonic()
+        with self._lock:
+            if self.client is None or now - self._explained.get(key, -self.explain_interval) < self.explain_interval:
+                return
+            self._explained[key] = now
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        self._executor.submit(self._explain, database_name, command, f"{name} {database_name}.{collection} {shape}")
+
+    def _explain(self, database_name: str, command, label: str):
+        command = {k: v for k, v in command.items() if not k.startswith("$") and k not in _SESSION_KEYS}
+        try:
+            explain = self.client[database_name].command("explain", command, verbosity="queryPlanner")
+        except Exception as e:
+            logging.warning(f"Could not explain slow query {label}: {e}")
+            return
+        logging.warning(f"Slow query plan for {label}: {describe_plan(summarize_plan(explain))}")
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
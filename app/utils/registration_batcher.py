@@ -0,0 +1,245 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from fastapi import BackgroundTasks
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.utils import organizer_stats
+from app.utils.background import add_tracked_task
+from app.utils.metrics import REGISTRATION_BATCH_SIZE
+from app.utils.qrcode_gen import qr_web_path
+from app.utils.seats import return_seat, seat_update
+from app.utils.tickets import issue_ticket, new_ticket_number
+
+# MongoDB duplicate key error code
+DUPLICATE_KEY = 11000
+
+
+class SoldOut(Exception):
+    """No seat was left for this registration when its batch was written"""
+
+
+class RegistrationBatcher:
+    """
+    Group commit for registrations
+
+    Registrations submitted within max_delay of each other, up to max_size,
+    are written together. Seats are taken with one bulk_write per event in
+    the batch, and the registrations that got a seat are inserted with a
+    single unordered insert_many. Every caller gets its own outcome: the new
+    registration, SoldOut, or DuplicateKeyError (its seat is still reserved;
+    the caller returns it as in the per-request path).
+
+    A caller may be cancelled while its batch is written. Its registration
+    is kept and the batcher queues its ticket. If the registration was a
+    duplicate, the batcher returns its seat.
+    """
+
+    def __init__(self, max_size: int = 100, max_delay: float = 0.005):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._db = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    async def submit(self, db, user_oid: ObjectId, event_oid: ObjectId, tier: Optional[str] = None) -> dict:
+        """
+        Queue a registration (for a seat of tier, if given) for the next batch and wait for its outcome
+
+        Returns:
+            The inserted registration
+
+        Raises:
+            SoldOut: The event (or tier) had no seat left
+            DuplicateKeyError: The user is already registered for the event
+        """
+        loop = asyncio.get_running_loop()
+        ticket_number = new_ticket_number()
+        registration = {
+            # Set here so a failed insert_many can be checked for what was written
+            "_id": ObjectId(),
+            "user_id": user_oid,
+            "event_id": event_oid,
+            "ticket_qr_path": qr_web_path(ticket_number),
+            "ticket_number": ticket_number,
+            "registration_date": datetime.utcnow()
+        }
+        if tier is not None:
+            registration["tier"] = tier
+        future = loop.create_future()
+        self._pending.append((registration, future))
+        self._db = db
+
+        if len(self._pending) >= self.max_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._flush(self._db, batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, db, batch: List[Tuple[dict, asyncio.Future]]):
+        REGISTRATION_BATCH_SIZE.observe(len(batch))
+        granted = []
+        try:
+            granted = await self._take_seats(db, batch)
+            await self._insert(db, granted)
+        except Exception as e:
+            logging.error(f"Registration batch of {len(batch)} failed: {e}")
+            # Seats taken for registrations whose callers were never answered go back on sale
+            try:
+                await _return_seats(db, [r for r, future in granted if not future.done()])
+            except Exception as return_error:
+                logging.error(f"Returning the seats of a failed registration batch failed: {return_error}")
+            for _, future in batch:
+                _resolve(future, exception=e)
+
+    async def _take_seats(self, db, batch) -> List[Tuple[dict, asyncio.Future]]:
+        """Reserve seats per event and tier, first come first served; the rest are sold out"""
+        by_seat: Dict[Tuple[ObjectId, Optional[str]], list] = defaultdict(list)
+        for item in batch:
+            by_seat[item[0]["event_id"], item[0].get("tier")].append(item)
+
+        async def take(event_oid: ObjectId, tier: Optional[str], items: list) -> int:
+            # One conditional single-seat decrement per registration: the
+            # matched count is exactly the number of seats this batch got
+            result = await db["events"].bulk_write(
+                [UpdateOne(**seat_update(event_oid, -1, tier)) for _ in items],
+                ordered=True
+            )
+            return result.matched_count
+
+        taken = await asyncio.gather(
+            *(take(e, tier, items) for (e, tier), items in by_seat.items()),
+            return_exceptions=True
+        )
+
+        granted = []
+        for ((event_oid, _), items), count in zip(by_seat.items(), taken):
+            if isinstance(count, Exception):
+                # Other events' seats were taken; only this group fails
+                logging.error(f"Taking seats for event {event_oid} failed: {count}")
+                for _, future in items:
+                    _resolve(future, exception=count)
+                continue
+            if count:
+                await organizer_stats.seats_booked(db, event_oid, count)
+            granted.extend(items[:count])
+            for _, future in items[count:]:
+                _resolve(future, exception=SoldOut())
+        return granted
+
+    async def _insert(self, db, granted: List[Tuple[dict, asyncio.Future]]):
+        """Insert the registrations that got a seat; report failures per item"""
+        if not granted:
+            return
+        failed: Dict[int, Exception] = {}
+        try:
+            await db["registrations"].insert_many([r for r, _ in granted], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error["code"] == DUPLICATE_KEY:
+                    failed[error["index"]] = DuplicateKeyError(error.get("errmsg", "duplicate key"), DUPLICATE_KEY)
+                else:
+                    failed[error["index"]] = BulkWriteError({"writeErrors": [error]})
+        except Exception as e:
+            # Network error or timeout: part of the batch may have been written anyway
+            written = await db["registrations"].find(
+                {"_id": {"$in": [r["_id"] for r, _ in granted]}}, {"_id": 1}
+            ).to_list(None)
+            written_ids = {w["_id"] for w in written}
+            failed = {index: e for index, (r, _) in enumerate(granted) if r["_id"] not in written_ids}
+
+        # Not a duplicate: hand those seats back here, the callers only see the error
+        await _return_seats(db, [
+            granted[index][0] for index, error in failed.items() if not isinstance(error, DuplicateKeyError)
+        ])
+
+        inserted = defaultdict(int)
+        unclaimed = []
+        for index, (registration, future) in enumerate(granted):
+            error = failed.get(index)
+            if error is None:
+                inserted[registration["event_id"]] += 1
+                if not _resolve(future, result=registration):
+                    unclaimed.append(registration)
+            elif not _resolve(future, exception=error) and isinstance(error, DuplicateKeyError):
+                # Nobody is left to return this seat
+                await return_seat(db, registration["event_id"], registration.get("tier"))
+        for event_oid, count in inserted.items():
+            await organizer_stats.registrations_changed(db, event_oid, count)
+        if unclaimed:
+            await _issue_unclaimed_tickets(db, unclaimed)
+
+
+async def _return_seats(db, registrations: List[dict]):
+    """Put the seats of registrations that were not written back on sale"""
+    returned = defaultdict(int)
+    for registration in registrations:
+        returned[registration["event_id"], registration.get("tier")] += 1
+    if not returned:
+        return
+    await db["events"].bulk_write(
+        [UpdateOne(**seat_update(e_oid, n, tier)) for (e_oid, tier), n in returned.items()],
+        ordered=False
+    )
+    for (e_oid, _), n in returned.items():
+        await organizer_stats.seats_booked(db, e_oid, -n)
+
+
+async def _issue_unclaimed_tickets(db, registrations: List[dict]):
+    """Issue tickets for written registrations whose request was cancelled before it could"""
+    users = await db["users"].find(
+        {"_id": {"$in": list({r["user_id"] for r in registrations})}}, {"name": 1, "email": 1}
+    ).to_list(None)
+    users_by_id = {u["_id"]: u for u in users}
+    background_tasks = BackgroundTasks()
+    for registration in registrations:
+        user = users_by_id.get(registration["user_id"])
+        if not user:
+            continue
+        add_tracked_task(
+            background_tasks,
+            issue_ticket,
+            registration["ticket_number"],
+            user["email"],
+            user.get("name", "User"),
+            str(registration["event_id"]),
+            kind="email"
+        )
+    await background_tasks()
+
+
+def _resolve(future: asyncio.Future, result=None, exception: Optional[BaseException] = None) -> bool:
+    """Deliver an outcome; False if the waiting request was cancelled meanwhile"""
+    if future.done():
+        return False
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+    return True
+
+
+_batcher: Optional[RegistrationBatcher] = None
+
+
+def get_registration_batcher(max_size: int, max_delay: float) -> RegistrationBatcher:
+    """The worker's batcher, created on first use"""
+    global _batcher
+    if _batcher is None:
+        _batcher = RegistrationBatcher(max_size=max_size, max_delay=max_delay)
+    return _batcher
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = "UTC"
+
+# Formats accepted for the legacy free-form date and time strings
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%B %d, %Y", "%b %d, %Y")
+TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M%p", "%I %p")
+
+
+def _parse(value: str, formats: tuple) -> Optional[datetime]:
+    for fmt in formats:
+        try:
+            return datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_starts_at(date: str, time: str, tz_name: str = DEFAULT_TIMEZONE) -> datetime:
+    """
+    Combine an event's local date, time and timezone into its start instant
+
+    Args:
+        date: Local date, e.g. "2024-06-15"
+        time: Local time, e.g. "09:00" (empty means midnight)
+        tz_name: IANA timezone name, e.g. "Europe/Paris"
+
+    Returns:
+        The start time as a naive UTC datetime, the way PyMongo stores and returns BSON dates
+
+    Raises:
+        ValueError: If the date, time or timezone cannot be parsed
+    """
+    try:
+        zone = ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {tz_name}")
+
+    day = _parse(date or "", DATE_FORMATS)
+    if day is None:
+        raise ValueError(f"Unrecognized date: {date}")
+    clock = _parse(time, TIME_FORMATS) if time else datetime.min
+    if clock is None:
+        raise ValueError(f"Unrecognized time: {time}")
+
+    local = datetime.combine(day.date(), clock.time(), tzinfo=zone)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Mark a naive UTC datetime from MongoDB as UTC so it serializes with an offset"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Normalize a query bound to naive UTC for comparison with stored dates"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
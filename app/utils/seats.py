@@ -0,0 +1,268 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional
+from bson import ObjectId
+from fastapi import BackgroundTasks
+from pymongo.errors import DuplicateKeyError
+from app.config import settings
+from app.database import get_database
+from app.utils.background import add_tracked_task
+from app.utils import organizer_stats
+from app.utils.qrcode_gen import qr_web_path
+from app.utils.tickets import new_ticket_number, issue_tickets
+
+
+def seat_update(event_oid: ObjectId, delta: int, tier: Optional[str] = None) -> dict:
+    """
+    Filter, update and array filters moving delta seats of an event, or of one of its tiers
+
+    A tiered event keeps available_seats as the sum over its tiers, so both
+    counters change in the same update. A negative delta only matches while
+    the event (or tier) still has at least that many seats.
+
+    Returns:
+        Keyword arguments for update_one, find_one_and_update or UpdateOne
+    """
+    query = {"_id": event_oid}
+    change = {"available_seats": delta}
+    array_filters = None
+    if tier is not None:
+        tier_match = {"name": tier}
+        if delta < 0:
+            tier_match["available_seats"] = {"$gte": -delta}
+        query["tiers"] = {"$elemMatch": tier_match}
+        change["tiers.$[tier].available_seats"] = delta
+        array_filters = [{"tier.name": tier}]
+    elif delta < 0:
+        query["available_seats"] = {"$gte": -delta}
+    return {"filter": query, "update": {"$inc": change}, "array_filters": array_filters}
+
+
+async def reserve_seat(db, event_oid: ObjectId, tier: Optional[str] = None, seats: int = 1) -> bool:
+    """
+    Take seats (of a tier, for tiered events) off sale with a single conditional update
+
+    Args:
+        seats: Number of seats, all or none
+
+    Returns:
+        True if the seats were reserved, False if fewer are left or the event is missing
+    """
+    event = await db["events"].find_one_and_update(
+        **seat_update(event_oid, -seats, tier),
+        projection={"created_by": 1}
+    )
+    if event is None:
+        return False
+    await organizer_stats.seats_booked(db, event_oid, seats, event.get("created_by"))
+    return True
+
+
+async def unreserve_seat(db, event_oid: ObjectId, tier: Optional[str] = None, seats: int = 1):
+    """Put seats back on sale"""
+    await db["events"].update_one(**seat_update(event_oid, seats, tier))
+    await organizer_stats.seats_booked(db, event_oid, -seats)
+
+
+async def create_registration(
+    db,
+    user_oid: ObjectId,
+    event_oid: ObjectId,
+    user_email: str,
+    user_name: str,
+    background_tasks: BackgroundTasks,
+    tier: Optional[str] = None,
+    party_size: int = 1
+) -> dict:
+    """
+    Insert a registration for already reserved seats and queue its QR codes and email
+
+    A party gets a single registration holding one ticket number per seat;
+    ticket_number is the first of them.
+
+    Raises:
+        DuplicateKeyError: The user is already registered for the event
+    """
+    ticket_numbers = [new_ticket_number() for _ in range(party_size)]
+    registration = {
+        "user_id": user_oid,
+        "event_id": event_oid,
+        "ticket_qr_path": qr_web_path(ticket_numbers[0]),
+        "ticket_number": ticket_numbers[0],
+        "registration_date": datetime.utcnow()
+    }
+    if party_size > 1:
+        registration["party_size"] = party_size
+        registration["ticket_numbers"] = ticket_numbers
+    if tier is not None:
+        registration["tier"] = tier
+    await db["registrations"].insert_one(registration)
+    await organizer_stats.registrations_changed(db, event_oid, 1)
+
+    add_tracked_task(
+        background_tasks,
+        issue_tickets,
+        ticket_numbers,
+        user_email,
+        user_name,
+        str(event_oid),
+        kind="email"
+    )
+    return registration
+
+
+async def promote_from_waitlist(db, event_oid: ObjectId, background_tasks: BackgroundTasks,
+                                tier: Optional[str] = None) -> Optional[dict]:
+    """
+    Give one seat (of the given tier) to the user at the head of the event's waitlist
+
+    The head entry is claimed and removed in a single find_one_and_delete, so
+    concurrent releases never promote the same user twice. If the registration
+    can't be written, the entry is put back before the error is raised. The QR
+    code and confirmation email are queued as a background task.
+
+    Returns:
+        The new registration, or None if nobody is waiting
+    """
+    while True:
+        entry = await db["waitlist"].find_one_and_delete(
+            {"event_id": event_oid},
+            sort=[("position", 1)]
+        )
+        if not entry:
+            return None
+
+        try:
+            return await create_registration(
+                db,
+                entry["user_id"],
+                event_oid,
+                entry["user_email"],
+                entry.get("user_name", "User"),
+                background_tasks,
+                tier
+            )
+        except DuplicateKeyError:
+            # Registered directly while waiting; the seat goes to the next in line
+            continue
+        except Exception:
+            # Keep the user's place in line; the caller still holds the seat
+            await db["waitlist"].insert_one(entry)
+            raise
+
+
+async def fill_from_waitlist(db, event_oid: ObjectId, background_tasks: BackgroundTasks, tier: Optional[str] = None):
+    """Move waitlisted users into seats (of the given tier) that are currently on sale"""
+    while await db["waitlist"].find_one({"event_id": event_oid}, {"_id": 1}):
+        if not await reserve_seat(db, event_oid, tier):
+            return
+        try:
+            registration = await promote_from_waitlist(db, event_oid, background_tasks, tier)
+        except Exception:
+            await unreserve_seat(db, event_oid, tier)
+            raise
+        if registration is None:
+            await unreserve_seat(db, event_oid, tier)
+            return
+
+
+async def release_seat(db, event_oid: ObjectId, background_tasks: BackgroundTasks,
+                       tier: Optional[str] = None, seats: int = 1) -> List[dict]:
+    """
+    Hand freed seats to the next waitlisted users, and put the rest back on sale
+
+    Args:
+        tier: The freed seats' tier; promoted users get seats of the same tier
+        seats: Number of seats freed, e.g. by cancelling a party registration
+
+    Returns:
+        The registrations of the promoted users; empty if every seat went back on sale
+    """
+    promoted = []
+    try:
+        while len(promoted) < seats:
+            registration = await promote_from_waitlist(db, event_oid, background_tasks, tier)
+            if registration is None:
+                break
+            promoted.append(registration)
+    except Exception:
+        # The seats nobody got go back on sale
+        await unreserve_seat(db, event_oid, tier, seats - len(promoted))
+        raise
+    if len(promoted) < seats:
+        await unreserve_seat(db, event_oid, tier, seats - len(promoted))
+        # Someone may have joined the waitlist between the pop and the increment
+        await fill_from_waitlist(db, event_oid, background_tasks, tier)
+    return promoted
+
+
+async def _refill_from_waitlist(db, event_oid: ObjectId, tier: Optional[str]):
+    """Promote waitlisted users into seats put back on sale, queuing their tickets ourselves"""
+    try:
+        background_tasks = BackgroundTasks()
+        await fill_from_waitlist(db, event_oid, background_tasks, tier)
+        await background_tasks()
+    except Exception as e:
+        logging.error(f"Waitlist refill for event {event_oid} failed: {e}")
+
+
+# Refills still running, referenced so they are not garbage collected
+_refills = set()
+
+
+async def return_seat(db, event_oid: ObjectId, tier: Optional[str] = None, seats: int = 1):
+    """
+    Put back seats reserved by a request that is about to fail
+
+    Unlike release_seat, this doesn't use the request's BackgroundTasks:
+    starlette drops them when the endpoint raises. The seats go back on
+    sale, and users waiting for them are promoted by a separate task that
+    runs their tickets itself, like the hold sweeper.
+    """
+    await unreserve_seat(db, event_oid, tier, seats)
+    task = asyncio.ensure_future(_refill_from_waitlist(db, event_oid, tier))
+    _refills.add(task)
+    task.add_done_callback(_refills.discard)
+
+
+async def release_expired_holds(db, background_tasks: BackgroundTasks) -> int:
+    """
+    Return the seats of expired, unconfirmed holds
+
+    Each hold is flagged as released with a conditional update before its seat
+    is returned, so several workers can sweep at the same time. Released holds
+    are purged later by the TTL index on purge_at.
+
+    Returns:
+        The number of seats returned
+    """
+    released = 0
+    while True:
+        hold = await db["seat_holds"].find_one_and_update(
+            {"released": False, "expires_at": {"$lte": datetime.utcnow()}},
+            {"$set": {"released": True}},
+            projection={"event_id": 1, "tier": 1}
+        )
+        if not hold:
+            return released
+        await release_seat(db, hold["event_id"], background_tasks, hold.get("tier"))
+        released += 1
+
+
+async def run_hold_sweeper():
+    """Periodically return seats from expired holds. Runs for the lifetime of the worker."""
+    while True:
+        await asyncio.sleep(settings.SEAT_HOLD_SWEEP_SECONDS)
+        db = get_database()
+        if db is None:
+            continue
+        try:
+            background_tasks = BackgroundTasks()
+            released = await release_expired_holds(db, background_tasks)
+            # Tickets for users promoted from the waitlist
+            await background_tasks()
+            if released:
+                logging.info(f"Released {released} expired seat hold(s)")
+        except Exception as e:
+            logging.error(f"Seat hold sweep failed: {e}")
@@ -0,0 +1,101 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List
+from app.config import settings
+from app.utils.metrics import SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_IN_FLIGHT
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical reads within a worker
+
+    While a read for a key is in flight, further calls with the same key wait
+    for it instead of issuing their own, so the database sees one query per
+    key at a time however many requests ask. Only concurrent calls share a
+    result; nothing is cached once the read completes. Callers receive the
+    same object and must not mutate it.
+
+    The read runs in its own task: a caller that is cancelled (e.g. the
+    client went away) doesn't cancel it for the others.
+    """
+
+    def __init__(self, group: str, stats_size: int = 1000):
+        self.group = group
+        self.stats_size = stats_size
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        # key -> [calls, executions], least recently used first
+        self._key_stats: "OrderedDict[Hashable, List[int]]" = OrderedDict()
+
+    async def do(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        """
+        Run fetch(), or join the in-flight call for key
+
+        Args:
+            key: Identifies the read, e.g. the document _id
+            fetch: Coroutine function performing the read
+
+        Returns:
+            The result of the shared fetch() call
+        """
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await fetch()
+
+        task = self._in_flight.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[key] = task
+            SINGLE_FLIGHT_IN_FLIGHT.inc(labels=(self.group,))
+            task.add_done_callback(lambda t: self._done(key, t))
+        self._record(key, leader)
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        SINGLE_FLIGHT_IN_FLIGHT.dec(labels=(self.group,))
+        # Every caller may have been cancelled; don't warn about an unread exception
+        if not task.cancelled():
+            task.exception()
+
+    def _record(self, key: Hashable, executed: bool):
+        SINGLE_FLIGHT_CALLS.inc(labels=(self.group, "executed" if executed else "shared"))
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = self._key_stats[key] = [0, 0]
+            if len(self._key_stats) > self.stats_size:
+                self._key_stats.popitem(last=False)
+        else:
+            self._key_stats.move_to_end(key)
+        stats[0] += 1
+        if executed:
+            stats[1] += 1
+
+    def stats(self, top: int = 20) -> dict:
+        """Totals and the busiest keys among the stats_size most recently used"""
+        keys = sorted(self._key_stats.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        return {
+            "group": self.group,
+            "in_flight": len(self._in_flight),
+            "tracked_keys": len(self._key_stats),
+            "keys": [
+                {"key": str(key), "calls": calls, "executions": executions, "shared": calls - executions}
+                for key, (calls, executions) in keys
+            ],
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def single_flight(group: str) -> SingleFlight:
+    """The SingleFlight for a group of reads, created on first use"""
+    flight = _groups.get(group)
+    if flight is None:
+        flight = _groups[group] = SingleFlight(group, stats_size=settings.SINGLE_FLIGHT_STATS_KEYS)
+    return flight
+
+
+def all_stats(top: int = 20) -> List[dict]:
+    """Stats of every group in this worker"""
+    return [flight.stats(top) for flight in _groups.values()]
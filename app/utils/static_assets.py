@@ -0,0 +1,107 @@
+import json
+import mimetypes
+import os
+import stat
+from typing import Callable, Optional, Set
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# Built assets live under static/dist, named by content hash
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Preferred first
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_manifest(static_dir: str) -> dict:
+    """Source path -> hashed path mapping written by `python -m app.build_static`"""
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def make_static_url(static_dir: str, use_build: bool = True) -> Callable[[str], str]:
+    """
+    Build the `static_url` template helper
+
+    Args:
+        static_dir: The static files directory
+        use_build: Serve the built, fingerprinted files when a manifest exists
+
+    Returns:
+        Function mapping e.g. "css/style.css" to "/static/dist/css/style.1a2b3c4d5e.css",
+        or to "/static/css/style.css" when the asset has not been built
+    """
+    manifest = load_manifest(static_dir) if use_build else {}
+
+    def static_url(path: str) -> str:
+        path = path.lstrip("/")
+        hashed = manifest.get(path)
+        if hashed:
+            return f"/static/{DIST_DIR}/{hashed}"
+        return f"/static/{path}"
+
+    return static_url
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Content codings from an Accept-Encoding header, minus ones refused with q=0"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves fingerprinted assets with immutable caching
+
+    For files under dist/, a .br or .gz variant written by the build step is
+    served instead of the original when the client accepts it, so nothing is
+    compressed per request. Other files are served as usual.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if not path.startswith(DIST_DIR + os.sep):
+            return await super().get_response(path, scope)
+
+        response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _precompressed_response(self, path: str, scope: Scope) -> Optional[Response]:
+        if scope["method"] not in ("GET", "HEAD"):
+            return None
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                method=scope["method"],
+                media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                headers={"Content-Encoding": encoding}
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+        return None
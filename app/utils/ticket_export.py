@@ -0,0 +1,207 @@
+import asyncio
+import multiprocessing
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from bson import ObjectId
+from app.config import settings
+from app.utils.qrcode_gen import get_qr_code_data, render_qr_bitmap, render_qr_png
+from app.utils.tickets import registration_tickets
+
+# Worker processes rendering QR codes for exports, created on first use
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_export_pool() -> ProcessPoolExecutor:
+    """Process pool for QR rendering; spawned rather than forked since the worker runs threads"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.TICKET_EXPORT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_export_pool():
+    """Stop the export worker processes"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _ticket_batches(db, event_oid: ObjectId, batch_size: int) -> AsyncIterator[List[dict]]:
+    """Yield the event's tickets in batches, with attendee emails looked up once per batch"""
+    cursor = db["registrations"].find(
+        {"event_id": event_oid},
+        {"user_id": 1, "ticket_number": 1, "ticket_numbers": 1}
+    ).sort("_id", 1).batch_size(batch_size)
+
+    batch = []
+    async for registration in cursor:
+        batch.append(registration)
+        if len(batch) >= batch_size:
+            yield await _with_emails(db, batch)
+            batch = []
+    if batch:
+        yield await _with_emails(db, batch)
+
+
+async def _with_emails(db, registrations: List[dict]) -> List[dict]:
+    user_ids = list({r["user_id"] for r in registrations})
+    users = await db["users"].find({"_id": {"$in": user_ids}}, {"email": 1}).to_list(None)
+    emails = {u["_id"]: u["email"] for u in users}
+    # A party registration has one ticket per seat
+    return [
+        {"ticket_number": ticket_number, "email": emails.get(r["user_id"], "")}
+        for r in registrations
+        for ticket_number in registration_tickets(r)
+    ]
+
+
+async def _render_batch(render, tickets: List[dict], event_id: str) -> list:
+    """Render a batch of QR codes in parallel in the export worker processes"""
+    loop = asyncio.get_running_loop()
+    pool = get_export_pool()
+    return await asyncio.gather(*(
+        loop.run_in_executor(pool, render, get_qr_code_data(t["ticket_number"], t["email"], event_id))
+        for t in tickets
+    ))
+
+
+class _ChunkSink:
+    """Write-only file object collecting output until the response takes it"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_tickets_zip(db, event_oid: ObjectId) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP of PNG tickets for every registration of an event
+
+    The sink is not seekable, so zipfile writes each entry followed by a data
+    descriptor and nothing is rewritten; only the current batch is held in memory.
+    """
+    event_id = str(event_oid)
+    sink = _ChunkSink()
+    # PNGs are already compressed, so entries are stored as-is
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        async for tickets in _ticket_batches(db, event_oid, settings.TICKET_EXPORT_BATCH_SIZE):
+            images = await _render_batch(render_qr_png, tickets, event_id)
+            timestamp = datetime.utcnow().timetuple()[:6]
+            for ticket, png in zip(tickets, images):
+                archive.writestr(zipfile.ZipInfo(f"{ticket['ticket_number']}.png", timestamp), png)
+            yield sink.take()
+    # Central directory, written when the archive is closed
+    yield sink.take()
+
+
+def _pdf_text(value: str) -> str:
+    """Escape a string for a PDF literal, limited to Latin-1"""
+    value = value.encode("latin-1", "replace").decode("latin-1")
+    return value.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class _StreamingPdf:
+    """
+    Minimal PDF writer that emits one page per ticket as it goes
+
+    Object 1 is the catalog, 2 the page tree and 3 the font; each page adds a
+    page, a content stream and an image. The page tree and cross-reference
+    table are written at the end, so only byte offsets are kept in memory.
+    """
+
+    PAGE_WIDTH = 300
+    PAGE_HEIGHT = 400
+    QR_SIZE = 220
+
+    def __init__(self):
+        self._offsets = {}
+        self._position = 0
+        self._page_ids = []
+        self._next_id = 4
+
+    def _emit(self, data: bytes) -> bytes:
+        self._position += len(data)
+        return data
+
+    def _object(self, object_id: int, body: bytes) -> bytes:
+        self._offsets[object_id] = self._position
+        return self._emit(b"%d 0 obj\n" % object_id + body + b"\nendobj\n")
+
+    def _stream(self, object_id: int, dictionary: bytes, data: bytes) -> bytes:
+        body = b"<< " + dictionary + b" /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+        return self._object(object_id, body)
+
+    def header(self) -> bytes:
+        return self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def page(self, title: str, ticket_number: str, width: int, height: int, bits: bytes) -> bytes:
+        page_id, content_id, image_id = self._next_id, self._next_id + 1, self._next_id + 2
+        self._next_id += 3
+        self._page_ids.append(page_id)
+
+        margin = (self.PAGE_WIDTH - self.QR_SIZE) / 2
+        content = (
+            f"BT /F1 14 Tf {margin:.0f} {self.PAGE_HEIGHT - 40} Td ({_pdf_text(title[:40])}) Tj ET\n"
+            f"q {self.QR_SIZE} 0 0 {self.QR_SIZE} {margin:.0f} 110 cm /QR Do Q\n"
+            f"BT /F1 12 Tf {margin:.0f} 80 Td (Ticket: {_pdf_text(ticket_number)}) Tj ET\n"
+        ).encode("latin-1")
+
+        return b"".join([
+            self._object(page_id, (
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                b"/Resources << /Font << /F1 3 0 R >> /XObject << /QR %d 0 R >> >> /Contents %d 0 R >>"
+                % (self.PAGE_WIDTH, self.PAGE_HEIGHT, image_id, content_id)
+            )),
+            self._stream(content_id, b"/Filter /FlateDecode", zlib.compress(content)),
+            self._stream(image_id, (
+                b"/Type /XObject /Subtype /Image /Width %d /Height %d "
+                b"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode" % (width, height)
+            ), zlib.compress(bits)),
+        ])
+
+    def trailer(self) -> bytes:
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        out = [
+            self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+            self._object(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self._page_ids)),
+            self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"),
+        ]
+        xref_position = self._position
+        size = self._next_id
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        xref.extend(b"%010d 00000 n \n" % self._offsets[object_id] for object_id in range(1, size))
+        out.append(self._emit(b"".join(xref)))
+        out.append(self._emit(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_position)))
+        return b"".join(out)
+
+
+async def stream_tickets_pdf(db, event_oid: ObjectId, event_title: str) -> AsyncIterator[bytes]:
+    """Stream a printable PDF with one page per ticket for every registration of an event"""
+    event_id = str(event_oid)
+    pdf = _StreamingPdf()
+    yield pdf.header()
+    async for tickets in _ticket_batches(db, event_oid, settings.TICKET_EXPORT_BATCH_SIZE):
+        bitmaps = await _render_batch(render_qr_bitmap, tickets, event_id)
+        yield b"".join(
+            pdf.page(event_title, ticket["ticket_number"], width, height, bits)
+            for ticket, (width, height, bits) in zip(tickets, bitmaps)
+        )
+    yield pdf.trailer()
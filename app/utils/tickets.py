@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+from typing import List
+from starlette.concurrency import run_in_threadpool
+from app.utils.qrcode_gen import (
+    generate_qr_code, get_qr_code_data, qr_file_path, render_qr_png, save_qr_png
+)
+from app.utils.email import send_registration_email
+from app.utils.profiling import timed
+
+
+def new_ticket_number() -> str:
+    """Generate a new ticket number"""
+    return f"REG_{uuid.uuid4().hex[:8].upper()}"
+
+
+def registration_tickets(registration: dict) -> List[str]:
+    """Every ticket number of a registration: one per seat of a party"""
+    if registration.get("ticket_numbers"):
+        return list(registration["ticket_numbers"])
+    return [registration["ticket_number"]] if registration.get("ticket_number") else []
+
+
+async def issue_ticket(ticket_number: str, user_email: str, user_name: str, event_id: str):
+    """
+    Render a ticket's QR code and email it to the attendee. Runs as a background task.
+
+    Args:
+        ticket_number: Registration ticket number
+        user_email: Attendee's email address
+        user_name: Attendee's name
+        event_id: The event ID
+    """
+    qr_data = get_qr_code_data(ticket_number, user_email, event_id)
+    await run_in_threadpool(generate_qr_code, qr_data, ticket_number)
+    await send_registration_email(user_email, user_name, [(ticket_number, qr_file_path(ticket_number))])
+
+
+async def issue_tickets(ticket_numbers: List[str], user_email: str, user_name: str, event_id: str):
+    """
+    Render the QR codes of a party registration and email them together.
+    Runs as a background task.
+
+    The codes are rendered in the threadpool, one call per ticket; the
+    export worker processes are left to ticket exports, so registering
+    never spawns them.
+    """
+    if len(ticket_numbers) == 1:
+        await issue_ticket(ticket_numbers[0], user_email, user_name, event_id)
+        return
+
+    with timed("qr"):
+        images = await asyncio.gather(*(
+            run_in_threadpool(render_qr_png, get_qr_code_data(t, user_email, event_id))
+            for t in ticket_numbers
+        ))
+    await run_in_threadpool(lambda: [save_qr_png(png, t) for t, png in zip(ticket_numbers, images)])
+    await send_registration_email(user_email, user_name, [(t, qr_file_path(t)) for t in ticket_numbers])
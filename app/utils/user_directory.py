@@ -0,0 +1,107 @@
+import base64
+import json
+import re
+from typing import List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+
+# Fields returned by the admin directory; password_hash never leaves MongoDB
+DIRECTORY_PROJECTION = {"name": 1, "email": 1, "is_admin": 1, "created_at": 1}
+
+SEARCH_FIELDS = {"name": "name_lower", "email": "email_lower"}
+
+
+def search_fields(name: str, email: str) -> dict:
+    """Lowercased copies of name and email, indexed for case-insensitive prefix search"""
+    return {"name_lower": (name or "").lower(), "email_lower": (email or "").lower()}
+
+
+def encode_cursor(sort_value: Optional[str], last_id: ObjectId) -> str:
+    """Opaque keyset cursor pointing just past the last returned user"""
+    raw = json.dumps([sort_value, str(last_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], ObjectId]:
+    """
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, ObjectId(last_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+async def list_users(db, q: Optional[str], field: str, after: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of the user directory
+
+    Without a search, users are listed newest first by _id. With a search,
+    users whose name or email (per field) starts with q are listed in
+    alphabetical order. Either way the query walks an index from the cursor
+    instead of skipping rows.
+
+    Args:
+        db: Database instance
+        q: Case-insensitive prefix to search for, or None
+        field: "name" or "email"
+        after: Cursor from the previous page, or None for the first page
+        limit: Page size
+
+    Returns:
+        Tuple of (users, cursor for the next page or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    cursor_value, cursor_id = decode_cursor(after) if after else (None, None)
+
+    if not q:
+        query = {"_id": {"$lt": cursor_id}} if cursor_id else {}
+        sort = [("_id", -1)]
+        key = None
+    else:
+        key = SEARCH_FIELDS[field]
+        # An anchored, case-sensitive regex on the lowercased field is an index range scan
+        query = {key: {"$regex": f"^{re.escape(q.lower())}"}}
+        if cursor_id:
+            query[key]["$gte"] = cursor_value
+            query["$or"] = [{key: {"$gt": cursor_value}}, {"_id": {"$gt": cursor_id}}]
+        sort = [(key, 1), ("_id", 1)]
+
+    projection = dict(DIRECTORY_PROJECTION)
+    if key:
+        projection[key] = 1
+    users = await db["users"].find(query, projection).sort(sort).limit(limit + 1).to_list(None)
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        last = users[-1]
+        next_cursor = encode_cursor(last.get(key) if key else None, last["_id"])
+    return users, next_cursor
+
+
+async def backfill_search_fields(db, batch_size: int = 1000) -> int:
+    """
+    Add name_lower and email_lower to users created before they existed
+
+    Returns:
+        The number of users updated
+    """
+    updated = 0
+    updates = []
+    cursor = db["users"].find({"name_lower": None}, {"name": 1, "email": 1}).batch_size(batch_size)
+    async for user in cursor:
+        updates.append(UpdateOne(
+            {"_id": user["_id"]},
+            {"$set": search_fields(user.get("name"), user.get("email"))}
+        ))
+        if len(updates) >= batch_size:
+            updated += (await db["users"].bulk_write(updates, ordered=False)).modified_count
+            updates = []
+    if updates:
+        updated += (await db["users"].bulk_write(updates, ordered=False)).modified_count
+    return updated
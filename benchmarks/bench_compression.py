@@ -0,0 +1,165 @@
+"""
+Benchmark response compression: CPU time against bytes on the wire.
+
+Seeds realistic data, captures the app's largest JSON listings and an HTML
+page, then compresses each body with every gzip level and brotli quality in
+CODECS and reports size, ratio and compression time. It also measures the
+end-to-end latency of the listings through CompressionMiddleware for each
+Accept-Encoding.
+
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --events 500 --registrations 5000
+    python -m benchmarks.bench_compression --compare benchmarks/results/<file>.json
+"""
+import argparse
+import asyncio
+import gzip
+import statistics
+import time
+from datetime import datetime
+
+from benchmarks.bench_hot_path import seed
+from benchmarks.common import compare_results, run_concurrently, save_results, setup_app, summarize
+
+CODECS = [("gzip", 1), ("gzip", 6), ("gzip", 9), ("br", 1), ("br", 4), ("br", 6), ("br", 11)]
+
+PAYLOADS = {
+    "events_listing": "/api/events/",
+    "admin_registrations": "/admin/registrations",
+    "admin_users_page": "/admin/users?limit=200",
+    "admin_dashboard": "/admin/dashboard-data",
+    "events_page_html": "/events",
+}
+
+
+def _compressor(codec: str, level: int):
+    if codec == "gzip":
+        return lambda data: gzip.compress(data, compresslevel=level)
+    import brotli
+
+    return lambda data: brotli.compress(data, quality=level, mode=brotli.MODE_TEXT)
+
+
+def _time_codec(compress, body: bytes, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        compressed = compress(body)
+        timings.append(time.perf_counter() - start)
+    return len(compressed), statistics.median(timings)
+
+
+async def _seed_registrations(db, seeded, count: int):
+    """Registrations spread over the seeded users and events, for the admin listing"""
+    from bson import ObjectId
+
+    users = await db["users"].find({"is_admin": False}, {"_id": 1}).to_list(None)
+    event_ids = [ObjectId(e) for e in seeded["event_ids"]]
+    now = datetime.utcnow()
+    docs = [
+        {"user_id": users[i % len(users)]["_id"], "event_id": event_ids[i // len(users) % len(event_ids)],
+         "ticket_number": f"REG_{i:08X}", "ticket_qr_path": f"/static/qrcodes/00/00/REG_{i:08X}.png",
+         "registration_date": now}
+        for i in range(count)
+    ]
+    if docs:
+        await db["registrations"].insert_many(docs)
+
+
+async def run(args):
+    import httpx
+    from app.config import settings
+
+    if args.codecs:
+        codecs = [(c.split(":")[0], int(c.split(":")[1])) for c in args.codecs]
+    else:
+        codecs = CODECS
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        print("brotli is not installed; only gzip is measured")
+        codecs = [c for c in codecs if c[0] != "br"]
+
+    app, db, sink = await setup_app(args.mongodb_url)
+    seeded = await seed(db, users=args.users, events=args.events)
+    await _seed_registrations(db, seeded, args.registrations)
+    admin = seeded["admin_headers"]
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'payload':<22}{'codec':<9}{'bytes':>10}{'ratio':>8}{'ms':>9}{'MB/s':>9}")
+        for name, path in PAYLOADS.items():
+            response = await client.get(path, headers={**admin, "Accept-Encoding": "identity"})
+            body = response.content
+            print(f"{name:<22}{'none':<9}{len(body):>10}{1.0:>8.2f}{0.0:>9.3f}{'':>9}")
+            for codec, level in codecs:
+                size, seconds = _time_codec(_compressor(codec, level), body, args.repeats)
+                key = f"{name} {codec}:{level}"
+                results[key] = {
+                    "bytes": size,
+                    "original_bytes": len(body),
+                    "ratio": round(len(body) / size, 2) if size else 0.0,
+                    "compress_ms": round(seconds * 1000, 3),
+                }
+                throughput = len(body) / seconds / 1e6 if seconds else 0.0
+                print(f"{'':<22}{codec + ':' + str(level):<9}{size:>10}{results[key]['ratio']:>8.2f}"
+                      f"{seconds * 1000:>9.3f}{throughput:>9.1f}")
+
+        # End to end through the middleware with the configured settings
+        print(f"\nThrough CompressionMiddleware (gzip level {settings.COMPRESSION_GZIP_LEVEL}, "
+              f"brotli quality {settings.COMPRESSION_BROTLI_QUALITY}, minimum {settings.COMPRESSION_MINIMUM_SIZE} bytes)")
+        for name in ("events_listing", "admin_registrations"):
+            for encoding in ("identity", "gzip", "br"):
+                headers = {**admin, "Accept-Encoding": encoding}
+                sent = []
+
+                async def request(i):
+                    response = await client.get(PAYLOADS[name], headers=headers)
+                    sent.append(response.num_bytes_downloaded)
+                    return response
+
+                await request(0)
+                latencies, errors, elapsed = await run_concurrently(request, args.requests, args.concurrency)
+                summary = summarize(latencies, errors, elapsed)
+                summary["bytes_per_response"] = int(statistics.median(sent))
+                results[f"{name} e2e {encoding}"] = summary
+                print(f"{name:<22}{encoding:<9}{summary['bytes_per_response']:>10} bytes  "
+                      f"{summary['throughput_rps']:>8.1f} req/s  p50 {summary['p50_ms']:>7.2f} ms  "
+                      f"p95 {summary['p95_ms']:>7.2f} ms")
+
+    await sink.stop()
+    payload = {
+        "config": {
+            "events": args.events,
+            "users": args.users,
+            "registrations": args.registrations,
+            "repeats": args.repeats,
+            "database": "mongodb" if args.mongodb_url else "mongomock",
+        },
+        "scenarios": results,
+    }
+    path = save_results("compression", payload, args.output_dir)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        compare_results(args.compare, payload, keys=("bytes", "compress_ms", "p50_ms", "bytes_per_response"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200, help="Events to seed")
+    parser.add_argument("--users", type=int, default=500, help="Users to seed")
+    parser.add_argument("--registrations", type=int, default=2000, help="Registrations to seed")
+    parser.add_argument("--repeats", type=int, default=20, help="Compressions timed per codec")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per end-to-end scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients end to end")
+    parser.add_argument("--codecs", type=lambda s: s.split(","), default=None,
+                        help="Comma-separated codec:level list, e.g. gzip:6,br:4")
+    parser.add_argument("--mongodb-url", default=None, help="Use a real MongoDB instead of mongomock")
+    parser.add_argument("--output-dir", default=None, help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
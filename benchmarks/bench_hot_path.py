@@ -0,0 +1,170 @@
+"""
+Benchmark the registration hot path.
+
+Runs the FastAPI app in-process against MongoDB (or a mongomock stand-in) and
+a local SMTP sink, drives each scenario at the requested concurrency and
+reports throughput, latency percentiles and DB operations per request.
+
+    python -m benchmarks.bench_hot_path --concurrency 32 --requests 1000
+    python -m benchmarks.bench_hot_path --mongodb-url mongodb://localhost:27017
+    python -m benchmarks.bench_hot_path --compare benchmarks/results/<file>.json
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from benchmarks.common import compare_results, run_concurrently, save_results, setup_app, summarize
+
+SCENARIOS = ["login", "get_all_events", "get_event", "register_for_event", "get_my_registrations", "admin_dashboard",
+             "event_page", "event_page_with_auth_me", "event_page_anonymous"]
+
+READ_ONLY_SCENARIOS = {"login", "get_all_events", "get_event", "admin_dashboard", "event_page", "event_page_with_auth_me",
+                       "event_page_anonymous"}
+
+BENCH_PASSWORD = "benchpassword123"
+
+
+async def seed(db, users: int, events: int):
+    """Create an admin, `users` regular users and `events` events owned by the admin"""
+    from app.utils.auth import hash_password, create_access_token
+
+    # Hash once; every seeded account shares the same password
+    password_hash = hash_password(BENCH_PASSWORD)
+    now = datetime.utcnow()
+
+    admin = {"name": "Bench Admin", "email": "admin@bench.example.com", "password_hash": password_hash,
+             "is_admin": True, "created_at": now}
+    admin_id = (await db["users"].insert_one(admin)).inserted_id
+
+    user_docs = [
+        {"name": f"User {i}", "email": f"user{i}@bench.example.com", "password_hash": password_hash,
+         "is_admin": False, "created_at": now}
+        for i in range(users)
+    ]
+    user_ids = (await db["users"].insert_many(user_docs)).inserted_ids
+
+    event_docs = [
+        {"title": f"Event {i}", "description": "Benchmark event " * 8, "date": "2030-06-15",
+         "time": "09:00", "starts_at": datetime(2030, 6, 15, 9, 0), "timezone": "UTC",
+         "venue": "Convention Center", "total_seats": users + 10,
+         "available_seats": users + 10, "created_by": admin_id, "created_at": now}
+        for i in range(events)
+    ]
+    event_ids = (await db["events"].insert_many(event_docs)).inserted_ids
+
+    def cookie(user_id, email, is_admin=False):
+        token = create_access_token({"sub": str(user_id), "email": email, "is_admin": is_admin})
+        return {"Cookie": f"access_token={token}"}
+
+    return {
+        "admin_headers": cookie(admin_id, admin["email"], True),
+        "user_headers": [cookie(uid, doc["email"]) for uid, doc in zip(user_ids, user_docs)],
+        "event_ids": [str(eid) for eid in event_ids],
+    }
+
+
+def db_ops_snapshot():
+    from app.utils import metrics
+
+    return metrics.HTTP_DB_COMMANDS.snapshot(), metrics.HTTP_REQUESTS.snapshot()
+
+
+def db_ops_per_request(before, after) -> float:
+    """DB commands per request issued between two metric snapshots"""
+    commands = sum(after[0].values()) - sum(before[0].values())
+    requests = sum(after[1].values()) - sum(before[1].values())
+    return round(commands / requests, 2) if requests else 0.0
+
+
+async def page_load(client, path: str, fetches, headers=None):
+    """Render a page, then issue the requests its script makes on load, one after another"""
+    response = await client.get(path, headers=headers)
+    for url in fetches:
+        response = await client.get(url, headers=headers)
+    return response
+
+
+async def run(args):
+    import httpx
+
+    app, db, sink = await setup_app(args.mongodb_url)
+    seeded = await seed(db, users=args.requests, events=args.events)
+    user_headers = seeded["user_headers"]
+    target_event = seeded["event_ids"][0]
+
+    requests = {
+        "login": lambda c, i: c.post("/auth/login", json={"email": f"user{i % len(user_headers)}@bench.example.com",
+                                                          "password": BENCH_PASSWORD}),
+        "get_all_events": lambda c, i: c.get("/api/events/"),
+        # Every client asks for the same event, as when one goes viral
+        "get_event": lambda c, i: c.get(f"/api/events/{target_event}"),
+        # Each user registers exactly once, so the scenario measures successful registrations
+        "register_for_event": lambda c, i: c.post(f"/registrations/{target_event}", headers=user_headers[i]),
+        "get_my_registrations": lambda c, i: c.get("/registrations/my-registrations", headers=user_headers[i]),
+        "admin_dashboard": lambda c, i: c.get("/admin/dashboard-data", headers=seeded["admin_headers"]),
+        # Event page as the browser loads it; the user comes from the embedded bootstrap
+        "event_page": lambda c, i: page_load(c, f"/events/{target_event}", [
+            f"/api/events/{target_event}", "/registrations/my-registrations"], user_headers[i]),
+        # The same page with the /auth/me round trip the bootstrap replaced, for comparison
+        "event_page_with_auth_me": lambda c, i: page_load(c, f"/events/{target_event}", [
+            "/auth/me", f"/api/events/{target_event}", "/registrations/my-registrations"], user_headers[i]),
+        # Signed out, the page skips the registrations lookup
+        "event_page_anonymous": lambda c, i: page_load(c, f"/events/{target_event}", [
+            f"/api/events/{target_event}"]),
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in args.scenarios:
+            if name in READ_ONLY_SCENARIOS:
+                # Warm up outside the measured window
+                await requests[name](client, 0)
+            before = db_ops_snapshot()
+            latencies, errors, elapsed = await run_concurrently(
+                lambda i: requests[name](client, i), args.requests, args.concurrency
+            )
+            summary = summarize(latencies, errors, elapsed)
+            summary["db_ops_per_request"] = db_ops_per_request(before, db_ops_snapshot())
+            results[name] = summary
+            print(f"{name:<22} {summary['throughput_rps']:>9.1f} req/s  p50 {summary['p50_ms']:>8.2f} ms  "
+                  f"p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  "
+                  f"db ops/req {summary['db_ops_per_request']:>6.2f}  errors {errors}")
+
+    await sink.stop()
+    payload = {
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "events": args.events,
+            "database": "mongodb" if args.mongodb_url else "mongomock",
+        },
+        "emails_received": sink.messages_received,
+        "scenarios": results,
+    }
+    path = save_results("hot_path", payload, args.output_dir)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        compare_results(args.compare, payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients per scenario")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--events", type=int, default=50, help="Events to seed for listings")
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=SCENARIOS,
+                        help=f"Comma-separated subset of: {','.join(SCENARIOS)}")
+    parser.add_argument("--mongodb-url", default=None, help="Use a real MongoDB instead of mongomock")
+    parser.add_argument("--output-dir", default=None, help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark registration group commit against the per-request write path.
+
+Seeds users and events, then registers every user for an event through
+POST /registrations/{event_id}, once with REGISTRATION_BATCHING off and once
+on (a fresh event each time), and reports registrations per second, latency
+percentiles and DB operations per request. A second pass registers more
+users than there are seats to check that neither path oversells.
+
+Run it against a real MongoDB for throughput numbers: the gain comes from
+fewer round trips, while mongomock is CPU bound (it scans documents for
+every query and insert), so with it only db ops/request are meaningful.
+
+    python -m benchmarks.bench_registration_batching --requests 2000 --concurrency 64
+    python -m benchmarks.bench_registration_batching --mongodb-url mongodb://localhost:27017
+    python -m benchmarks.bench_registration_batching --compare benchmarks/results/<file>.json
+"""
+import argparse
+import asyncio
+
+from benchmarks.bench_hot_path import db_ops_per_request, db_ops_snapshot, seed
+from benchmarks.common import compare_results, run_concurrently, save_results, setup_app, summarize
+
+MODES = {"per_request": False, "batched": True}
+
+
+async def run(args):
+    import httpx
+    from bson import ObjectId
+    from app.config import settings
+
+    settings.REGISTRATION_BATCH_MAX_SIZE = args.batch_size
+    settings.REGISTRATION_BATCH_MAX_DELAY_MS = args.max_delay_ms
+
+    app, db, sink = await setup_app(args.mongodb_url)
+    # One event per mode and pass; every user registers once per event
+    seeded = await seed(db, users=args.requests, events=2 * len(MODES))
+    user_headers = seeded["user_headers"]
+    event_ids = iter(seeded["event_ids"])
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for sold_out_pass in (False, True):
+            for mode, batching in MODES.items():
+                settings.REGISTRATION_BATCHING = batching
+                event_id = next(event_ids)
+                seats = args.requests // 2 if sold_out_pass else args.requests + 10
+                await db["events"].update_one(
+                    {"_id": ObjectId(event_id)}, {"$set": {"total_seats": seats, "available_seats": seats}}
+                )
+
+                before = db_ops_snapshot()
+                latencies, errors, elapsed = await run_concurrently(
+                    lambda i: client.post(f"/registrations/{event_id}", headers=user_headers[i]),
+                    args.requests, args.concurrency
+                )
+                summary = summarize(latencies, errors, elapsed)
+                summary["db_ops_per_request"] = db_ops_per_request(before, db_ops_snapshot())
+
+                registered = await db["registrations"].count_documents({"event_id": ObjectId(event_id)})
+                event = await db["events"].find_one({"_id": ObjectId(event_id)}, {"available_seats": 1})
+                summary["registrations_per_s"] = round(registered / elapsed, 1) if elapsed else 0.0
+                summary["registered"] = registered
+                summary["oversold"] = registered + event["available_seats"] != seats
+
+                name = f"{mode}{' sold_out' if sold_out_pass else ''}"
+                results[name] = summary
+                print(f"{name:<22} {summary['registrations_per_s']:>9.1f} reg/s  p50 {summary['p50_ms']:>8.2f} ms  "
+                      f"p95 {summary['p95_ms']:>8.2f} ms  db ops/req {summary['db_ops_per_request']:>6.2f}  "
+                      f"registered {registered}/{seats} seats  oversold {summary['oversold']}")
+
+    await sink.stop()
+    payload = {
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "batch_size": args.batch_size,
+            "max_delay_ms": args.max_delay_ms,
+            "database": "mongodb" if args.mongodb_url else "mongomock",
+        },
+        "scenarios": results,
+    }
+    path = save_results("registration_batching", payload, args.output_dir)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        compare_results(args.compare, payload, keys=("registrations_per_s", "p50_ms", "p95_ms", "db_ops_per_request"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=1000, help="Registrations per scenario (one per user)")
+    parser.add_argument("--batch-size", type=int, default=100, help="REGISTRATION_BATCH_MAX_SIZE")
+    parser.add_argument("--max-delay-ms", type=float, default=5, help="REGISTRATION_BATCH_MAX_DELAY_MS")
+    parser.add_argument("--mongodb-url", default=None, help="Use a real MongoDB instead of mongomock")
+    parser.add_argument("--output-dir", default=None, help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
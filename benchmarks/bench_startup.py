@@ -0,0 +1,124 @@
+"""
+Benchmark worker cold start.
+
+Each run starts a fresh interpreter and measures how long it takes to import
+the app, run the lifespan startup and serve the first request on a few
+representative routes.
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --mongodb-url mongodb://localhost:27017
+    python -m benchmarks.bench_startup --importtime
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import REPO_DIR, compare_results, save_results
+
+FIRST_REQUEST_PATHS = ["/health/live", "/login", "/api/events/"]
+
+
+async def _child(mongodb_url):
+    """Runs inside the fresh interpreter and prints its timings as JSON"""
+    start = time.perf_counter()
+    import benchmarks.common  # noqa: F401  (app settings used by the benchmarks)
+    from app.main import app
+    import_seconds = time.perf_counter() - start
+
+    from app import database
+    from app.config import settings
+
+    if mongodb_url:
+        settings.MONGODB_URL = mongodb_url
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        database.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient()
+
+    import httpx
+
+    timings = {"import": import_seconds}
+    async with app.router.lifespan_context(app):
+        timings["lifespan_startup"] = time.perf_counter() - start - import_seconds
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for path in FIRST_REQUEST_PATHS:
+                request_start = time.perf_counter()
+                await client.get(path)
+                timings[f"first_request {path}"] = time.perf_counter() - request_start
+        timings["ready_to_serve"] = time.perf_counter() - start
+    print(json.dumps(timings))
+
+
+def _run_child(mongodb_url):
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child"]
+    if mongodb_url:
+        command += ["--mongodb-url", mongodb_url]
+    start = time.perf_counter()
+    output = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process_total"] = time.perf_counter() - start
+    return timings
+
+
+def _importtime_report(limit: int = 15):
+    """Top modules by cumulative import time, from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, module = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        rows.append((int(cumulative_us), int(self_us), module.strip()))
+    rows.sort(reverse=True)
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for cumulative_us, self_us, module in rows[:limit]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts to measure")
+    parser.add_argument("--mongodb-url", default=None, help="Use a real MongoDB instead of mongomock")
+    parser.add_argument("--importtime", action="store_true", help="Print the slowest imports and exit")
+    parser.add_argument("--output-dir", default=None, help="Where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(_child(args.mongodb_url))
+        return
+    if args.importtime:
+        _importtime_report()
+        return
+
+    runs = [_run_child(args.mongodb_url) for _ in range(args.runs)]
+    results = {}
+    for metric in runs[0]:
+        values = [run[metric] * 1000 for run in runs]
+        results[metric] = {
+            "median_ms": round(statistics.median(values), 2),
+            "min_ms": round(min(values), 2),
+            "max_ms": round(max(values), 2),
+        }
+        print(f"{metric:<32} median {results[metric]['median_ms']:>9.2f} ms  "
+              f"min {results[metric]['min_ms']:>9.2f} ms  max {results[metric]['max_ms']:>9.2f} ms")
+
+    payload = {
+        "config": {"runs": args.runs, "database": "mongodb" if args.mongodb_url else "mongomock"},
+        "scenarios": results,
+    }
+    path = save_results("startup", payload, args.output_dir)
+    print(f"\nResults written to {path}")
+    if args.compare:
+        compare_results(args.compare, payload, keys=("median_ms", "max_ms"))
+
+
+if __name__ == "__main__":
+    main()
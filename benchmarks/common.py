@@ -0,0 +1,225 @@
+"""Shared helpers for the benchmark scripts."""
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCH_DIR = Path(__file__).parent
+REPO_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Configure the app before it is imported: metrics on, QR codes in a scratch dir
+os.environ.setdefault("METRICS_ENABLED", "True")
+os.environ.setdefault("DEBUG", "False")
+
+
+def _record_op(name: str):
+    from app.utils import metrics
+
+    metrics.DB_COMMANDS.inc(labels=(name, "success"))
+    stats = metrics.current_request_stats()
+    if stats is not None:
+        stats.db_commands += 1
+
+
+class _CountingCursor:
+    """Cursor proxy counting one DB operation per materialization"""
+
+    def __init__(self, cursor, name: str):
+        self._cursor = cursor
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._cursor, attr)
+        if attr == "to_list":
+            async def to_list(*args, **kwargs):
+                _record_op(self._name)
+                return await value(*args, **kwargs)
+            return to_list
+        if callable(value):
+            def chained(*args, **kwargs):
+                result = value(*args, **kwargs)
+                return self if result is self._cursor else result
+            return chained
+        return value
+
+    def __aiter__(self):
+        _record_op(self._name)
+        return self._cursor.__aiter__()
+
+
+class _CountingCollection:
+    """Collection proxy counting DB operations, for stand-ins without command monitoring"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, attr):
+        value = getattr(self._collection, attr)
+        if attr in ("find", "aggregate", "list_indexes"):
+            def cursor(*args, **kwargs):
+                return _CountingCursor(value(*args, **kwargs), attr)
+            return cursor
+        if asyncio.iscoroutinefunction(value):
+            async def counted(*args, **kwargs):
+                _record_op(attr)
+                return await value(*args, **kwargs)
+            return counted
+        return value
+
+
+class _CountingDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name):
+        return _CountingCollection(self._database[name])
+
+    def __getattr__(self, attr):
+        value = getattr(self._database, attr)
+        if asyncio.iscoroutinefunction(value):
+            async def counted(*args, **kwargs):
+                _record_op(attr)
+                return await value(*args, **kwargs)
+            return counted
+        return value
+
+
+async def setup_app(mongodb_url: Optional[str], database_name: str = "event_management_bench"):
+    """
+    Point the app at a benchmark database and a local SMTP sink
+
+    Uses a real MongoDB when mongodb_url is given (commands are counted by the
+    app's own command listener), otherwise an in-memory mongomock stand-in.
+
+    Returns:
+        Tuple of (app, db, smtp_sink)
+    """
+    from benchmarks.smtp_sink import SMTPSink
+    from app.config import settings
+    from app import database
+
+    sink = await SMTPSink().start()
+    settings.SMTP_SERVER = sink.host
+    settings.SMTP_PORT = sink.port
+    settings.QR_CODE_DIR = tempfile.mkdtemp(prefix="bench_qrcodes_")
+    settings.DATABASE_NAME = database_name
+
+    if mongodb_url:
+        settings.MONGODB_URL = mongodb_url
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        await AsyncIOMotorClient(mongodb_url).drop_database(database_name)
+        await database.connect_to_mongo()
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        database.client = AsyncMongoMockClient()
+        database.db = _CountingDatabase(database.client[database_name])
+        await database.create_indexes()
+
+    from app.main import app
+
+    return app, database.get_database(), sink
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    """Throughput and latency percentiles (milliseconds) for one scenario"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 4),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+    }
+
+
+async def run_concurrently(make_request, total: int, concurrency: int):
+    """
+    Issue `total` requests from `concurrency` workers
+
+    Args:
+        make_request: Async callable taking the request index and returning a response
+
+    Returns:
+        Tuple of (latencies in seconds, error count, wall-clock seconds)
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            start = time.perf_counter()
+            response = await make_request(index)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def git_revision() -> str:
+    """Short commit hash of the working tree, with a suffix if it has local changes"""
+    try:
+        revision = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True
+        ).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], cwd=REPO_DIR) != 0
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(benchmark: str, payload: Dict, output_dir: Optional[str] = None) -> Path:
+    """Write benchmark results as JSON, named by benchmark, commit and time"""
+    directory = Path(output_dir) if output_dir else RESULTS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    revision = git_revision()
+    payload = {
+        "benchmark": benchmark,
+        "commit": revision,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        **payload,
+    }
+    path = directory / f"{benchmark}-{datetime.utcnow():%Y%m%dT%H%M%S}-{revision}.json"
+    path.write_text(json.dumps(payload, indent=2))
+    return path
+
+
+def compare_results(baseline_path: str, current: Dict, keys=("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "db_ops_per_request")):
+    """Print per-scenario differences against a previously saved result file"""
+    baseline = json.loads(Path(baseline_path).read_text())
+    print(f"\nComparison against {baseline_path} (commit {baseline.get('commit')})")
+    print(f"{'scenario':<22}{'metric':<22}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        for key in keys:
+            if key not in result or key not in old:
+                continue
+            before, after = old[key], result[key]
+            change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+            print(f"{name:<22}{key:<22}{before:>12}{after:>12}{change:>10}")
@@ -0,0 +1,58 @@
+"""Minimal local SMTP server that accepts and discards every message."""
+import asyncio
+
+
+class SMTPSink:
+    """Accepts AUTH PLAIN with any credentials and drops all mail"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.messages_received = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+
+        reply("220 sink ESMTP")
+        await writer.drain()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip().upper()
+                if command.startswith(("EHLO", "HELO")):
+                    reply("250-sink")
+                    reply("250-AUTH PLAIN")
+                    reply("250 8BITMIME")
+                elif command.startswith("AUTH"):
+                    reply("235 Authentication successful")
+                elif command == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    self.messages_received += 1
+                    reply("250 OK")
+                elif command == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    # MAIL FROM, RCPT TO, RSET, NOOP
+                    reply("250 OK")
+                await writer.drain()
+        finally:
+            writer.close()
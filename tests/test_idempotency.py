@@ -0,0 +1,135 @@
+"""
+Idempotency-Key handling of POST /registrations/{event_id}
+
+The tier and party size travel in the query string, so a retry reusing a
+key with different ones must be rejected rather than replayed. Runs the app
+in-process against mongomock (pip install -r tests/requirements.txt).
+
+    python -m pytest tests
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+from app import database
+from app.main import app
+from app.utils.auth import create_access_token
+
+
+@pytest.fixture(autouse=True)
+def no_ticket_emails(monkeypatch):
+    # QR codes and emails are background work unrelated to the key handling
+    async def skip(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr("app.routers.registration_routes.issue_ticket", skip)
+    monkeypatch.setattr("app.utils.seats.issue_tickets", skip)
+    monkeypatch.setattr("app.utils.registration_batcher.issue_ticket", skip)
+
+
+def run(test):
+    """Run an async test against a fresh in-memory database and an in-process client"""
+
+    async def main():
+        database.client = AsyncMongoMockClient()
+        database.db = database.client["test"]
+        await database.create_indexes()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await test(database.db, client)
+
+    asyncio.run(main())
+
+
+async def sign_in(db) -> dict:
+    result = await db["users"].insert_one({
+        "name": "Attendee",
+        "email": "attendee@example.com",
+        "password_hash": "x",
+        "is_admin": False,
+        "created_at": datetime.utcnow()
+    })
+    token = create_access_token({"sub": str(result.inserted_id), "email": "attendee@example.com", "is_admin": False})
+    return {"access_token": token}
+
+
+async def insert_event(db, seats=10) -> str:
+    event = {"title": "Event", "date": "2030-01-01", "time": "10:00", "venue": "Hall",
+             "total_seats": seats, "available_seats": seats}
+    result = await db["events"].insert_one(event)
+    return str(result.inserted_id)
+
+
+def test_retry_with_the_same_request_is_replayed():
+    async def test(db, client):
+        cookies = await sign_in(db)
+        event_id = await insert_event(db)
+        headers = {"Idempotency-Key": "key-1"}
+
+        first = await client.post(f"/registrations/{event_id}", cookies=cookies, headers=headers)
+        retry = await client.post(f"/registrations/{event_id}", cookies=cookies, headers=headers)
+
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert retry.json()["ticket_number"] == first.json()["ticket_number"]
+        assert await db["registrations"].count_documents({}) == 1
+
+    run(test)
+
+
+def test_retry_with_another_tier_is_rejected():
+    async def test(db, client):
+        cookies = await sign_in(db)
+        # Untiered, since mongomock can't run the tiered seat update; the key
+        # check comes before the handler, so the retry's tier is never used
+        event_id = await insert_event(db)
+        headers = {"Idempotency-Key": "key-1"}
+
+        first = await client.post(f"/registrations/{event_id}", cookies=cookies, headers=headers)
+        retry = await client.post(f"/registrations/{event_id}?tier=VIP", cookies=cookies, headers=headers)
+
+        assert first.status_code == 200
+        assert retry.status_code == 422
+        assert "Idempotent-Replayed" not in retry.headers
+
+    run(test)
+
+
+def test_retry_with_another_party_size_is_rejected():
+    async def test(db, client):
+        cookies = await sign_in(db)
+        event_id = await insert_event(db)
+        headers = {"Idempotency-Key": "key-1"}
+
+        first = await client.post(f"/registrations/{event_id}?party_size=1", cookies=cookies, headers=headers)
+        retry = await client.post(f"/registrations/{event_id}?party_size=3", cookies=cookies, headers=headers)
+
+        assert first.status_code == 200
+        assert retry.status_code == 422
+        registration = await db["registrations"].find_one({})
+        assert registration.get("party_size", 1) == 1
+        assert (await db["events"].find_one({}))["available_seats"] == 9
+
+    run(test)
+
+
+def test_query_parameter_order_does_not_matter():
+    async def test(db, client):
+        cookies = await sign_in(db)
+        event_id = await insert_event(db)
+        headers = {"Idempotency-Key": "key-1"}
+
+        first = await client.post(f"/registrations/{event_id}?a=1&b=2", cookies=cookies, headers=headers)
+        retry = await client.post(f"/registrations/{event_id}?b=2&a=1", cookies=cookies, headers=headers)
+
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.headers["Idempotent-Replayed"] == "true"
+
+    run(test)
@@ -0,0 +1,135 @@
+"""
+Seat inventory updates against a real mongod
+
+mongomock does not implement arrayFilters, so the tiered path of
+seat_update() is only meaningful against MongoDB itself. The server is
+started by pymongo_inmemory (pip install -r tests/requirements.txt), which
+downloads a mongod binary on first use; the tests are skipped when it is
+not installed or mongod cannot be started.
+
+    python -m pytest tests
+"""
+import asyncio
+import uuid
+
+import pytest
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.utils.seats import reserve_seat, seat_update, unreserve_seat
+
+pymongo_inmemory = pytest.importorskip("pymongo_inmemory")
+
+
+@pytest.fixture(scope="module")
+def mongodb_url():
+    try:
+        mongod = pymongo_inmemory.Mongod(None)
+        mongod.start()
+    except Exception as e:
+        pytest.skip(f"mongod is not available: {e}")
+    yield mongod.connection_string
+    mongod.stop()
+
+
+def run(mongodb_url, test):
+    """Run an async test against a fresh database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def main():
+        client = AsyncIOMotorClient(mongodb_url)
+        try:
+            await test(client[f"test_{uuid.uuid4().hex[:8]}"])
+        finally:
+            client.close()
+
+    asyncio.run(main())
+
+
+async def insert_event(db, tiers=None, seats=0) -> ObjectId:
+    event = {"title": "Event", "total_seats": seats, "available_seats": seats}
+    if tiers:
+        event["tiers"] = [{"name": name, "total_seats": n, "available_seats": n} for name, n in tiers.items()]
+        event["total_seats"] = event["available_seats"] = sum(tiers.values())
+    result = await db["events"].insert_one(event)
+    return result.inserted_id
+
+
+async def seats_of(db, event_oid: ObjectId) -> dict:
+    event = await db["events"].find_one({"_id": event_oid})
+    seats = {t["name"]: t["available_seats"] for t in event.get("tiers", [])}
+    seats[None] = event["available_seats"]
+    return seats
+
+
+def test_reserve_takes_the_tier_and_event_counters_together(mongodb_url):
+    async def test(db):
+        event_oid = await insert_event(db, tiers={"VIP": 2, "Standard": 5})
+
+        assert await reserve_seat(db, event_oid, "VIP")
+        assert await seats_of(db, event_oid) == {"VIP": 1, "Standard": 5, None: 6}
+
+        await unreserve_seat(db, event_oid, "VIP")
+        assert await seats_of(db, event_oid) == {"VIP": 2, "Standard": 5, None: 7}
+
+    run(mongodb_url, test)
+
+
+def test_sold_out_tier_is_refused_while_others_have_seats(mongodb_url):
+    async def test(db):
+        event_oid = await insert_event(db, tiers={"VIP": 1, "Standard": 5})
+
+        assert await reserve_seat(db, event_oid, "VIP")
+        assert not await reserve_seat(db, event_oid, "VIP")
+        assert not await reserve_seat(db, event_oid, "Missing")
+        assert await seats_of(db, event_oid) == {"VIP": 0, "Standard": 5, None: 5}
+
+    run(mongodb_url, test)
+
+
+def test_party_needs_all_its_seats_in_the_tier(mongodb_url):
+    async def test(db):
+        event_oid = await insert_event(db, tiers={"VIP": 3, "Standard": 5})
+
+        assert not await reserve_seat(db, event_oid, "VIP", seats=4)
+        assert await reserve_seat(db, event_oid, "VIP", seats=3)
+        assert await seats_of(db, event_oid) == {"VIP": 0, "Standard": 5, None: 5}
+
+    run(mongodb_url, test)
+
+
+def test_concurrent_reservations_never_oversell_a_tier(mongodb_url):
+    async def test(db):
+        event_oid = await insert_event(db, tiers={"VIP": 5, "Standard": 5})
+
+        results = await asyncio.gather(*(reserve_seat(db, event_oid, "VIP") for _ in range(20)))
+        assert results.count(True) == 5
+        assert await seats_of(db, event_oid) == {"VIP": 0, "Standard": 5, None: 5}
+
+    run(mongodb_url, test)
+
+
+def test_bulk_write_matched_count_is_seats_granted(mongodb_url):
+    async def test(db):
+        # The registration batcher's path: one conditional UpdateOne per registration
+        event_oid = await insert_event(db, tiers={"VIP": 3, "Standard": 5})
+
+        result = await db["events"].bulk_write(
+            [UpdateOne(**seat_update(event_oid, -1, "VIP")) for _ in range(5)],
+            ordered=True
+        )
+        assert result.matched_count == 3
+        assert await seats_of(db, event_oid) == {"VIP": 0, "Standard": 5, None: 5}
+
+    run(mongodb_url, test)
+
+
+def test_untiered_event_keeps_a_single_counter(mongodb_url):
+    async def test(db):
+        event_oid = await insert_event(db, seats=2)
+
+        assert await reserve_seat(db, event_oid, seats=2)
+        assert not await reserve_seat(db, event_oid)
+        assert await seats_of(db, event_oid) == {None: 0}
+
+    run(mongodb_url, test)